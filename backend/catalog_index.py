@@ -0,0 +1,160 @@
+"""
+In-memory make/model catalog index for autocomplete.
+
+Search keys (model name, "make model" and make name, normalized to lowercase
+alphanumerics) are kept in one sorted array so a prefix query is a bisect
+plus a short scan. Queries with too few prefix matches fall back to fuzzy
+matching over a trigram inverted index, ranked by Dice similarity.
+The index is immutable; CatalogStore swaps in a new one after each refresh.
+"""
+import asyncio
+import heapq
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from data_service import live_data_service
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# Best-ranked prefix matches kept per query; bounds the cost of very short queries
+MAX_PREFIX_CANDIDATES = 500
+# Sorts after every normalized key character, so query + _KEY_END bounds a prefix range
+_KEY_END = "{"
+MIN_FUZZY_SCORE = 0.35
+
+
+def normalize(text: str) -> str:
+    """Search form of a name: 'CR-V' -> 'crv', 'Land Rover' -> 'landrover'"""
+    return _NON_ALNUM.sub("", text.lower())
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """Immutable prefix and trigram index over catalog entries"""
+
+    def __init__(self, catalog: List[Dict[str, Any]]):
+        # Entry 0..m-1 are makes (model None), followed by one entry per make/model
+        makes = sorted({item["make"] for item in catalog})
+        self.entries: List[Dict[str, Any]] = [{"make": make, "model": None, "years": []} for make in makes]
+        self.entries.extend(
+            {"make": item["make"], "model": item["model"], "years": item.get("years", [])}
+            for item in sorted(catalog, key=lambda item: (item["make"], item["model"]))
+        )
+
+        keyed: List[Tuple[str, int]] = []
+        for entry_id, entry in enumerate(self.entries):
+            if entry["model"] is None:
+                keyed.append((normalize(entry["make"]), entry_id))
+            else:
+                keyed.append((normalize(entry["model"]), entry_id))
+                keyed.append((normalize(entry["make"] + entry["model"]), entry_id))
+        keyed = [(key, entry_id) for key, entry_id in keyed if key]
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._key_entries = [entry_id for _, entry_id in keyed]
+
+        self._grams: List[Set[str]] = [trigrams(key) for key in self._keys]
+        self._postings: Dict[str, List[int]] = {}
+        for key_id, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _prefix_matches(self, query: str, accept: Callable[[int], bool]) -> List[Tuple[int, int]]:
+        """
+        (key length, entry id) of the accepted entries with a key starting with
+        query, shortest keys first. All matches are ranked before the list is
+        cut to MAX_PREFIX_CANDIDATES, so a short query keeps its best matches
+        rather than the alphabetically first ones.
+        """
+        start = bisect_left(self._keys, query)
+        end = bisect_left(self._keys, query + _KEY_END, start)
+        matches = (
+            (len(self._keys[i]), self._key_entries[i]) for i in range(start, end) if accept(self._key_entries[i])
+        )
+        return heapq.nsmallest(MAX_PREFIX_CANDIDATES, matches)
+
+    def _fuzzy_matches(self, query: str) -> List[Tuple[float, int]]:
+        """(Dice similarity, entry id) for keys sharing enough trigrams with query"""
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+        matches = []
+        for key_id, common in shared.items():
+            score = 2 * common / (len(query_grams) + len(self._grams[key_id]))
+            if score >= MIN_FUZZY_SCORE:
+                matches.append((score, self._key_entries[key_id]))
+        matches.sort(key=lambda match: -match[0])
+        return matches
+
+    def search(self, query: str, limit: int = 10, make: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Prefix matches (shortest key first), topped up with fuzzy matches"""
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        make_filter = make.lower() if make else None
+
+        results: List[Dict[str, Any]] = []
+        seen: Set[int] = set()
+
+        def accept(entry_id: int) -> bool:
+            return not make_filter or self.entries[entry_id]["make"].lower() == make_filter
+
+        def add(entry_id: int, match: str, score: float) -> bool:
+            if entry_id in seen or not accept(entry_id):
+                return False
+            seen.add(entry_id)
+            results.append({**self.entries[entry_id], "match": match, "score": round(score, 3)})
+            return len(results) >= limit
+
+        for key_length, entry_id in self._prefix_matches(normalized, accept):
+            if add(entry_id, "prefix", len(normalized) / key_length):
+                return results
+        for score, entry_id in self._fuzzy_matches(normalized):
+            if add(entry_id, "fuzzy", score):
+                return results
+        return results
+
+
+class CatalogStore:
+    """Holds the current catalog index and rebuilds it from the cached NHTSA catalog"""
+
+    def __init__(self):
+        self.index: Optional[CatalogIndex] = None
+        self.built_at: Optional[float] = None
+        self._catalog: Optional[List[Dict[str, Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def refresh_in_background(self) -> None:
+        """Build the index without blocking; the first build may need hundreds of NHTSA calls"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> CatalogIndex:
+        catalog = await live_data_service.get_model_catalog()
+        # Refresh rounds for other datasets leave the catalog untouched
+        if self.index is not None and catalog == self._catalog:
+            return self.index
+        started = time.perf_counter()
+        self.index = CatalogIndex(catalog)
+        self._catalog = catalog
+        self.built_at = time.monotonic()
+        logger.info(f"Catalog index built: {len(self.index)} entries in "
+                    f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        return self.index
+
+
+# Global instance
+catalog_store = CatalogStore()
@@ -0,0 +1,194 @@
+"""
+Background refresher that renews data_cache entries before they expire, so
+requests keep reading the previous value instead of paying for upstream
+NHTSA calls when the hour runs out (stale-while-revalidate)
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from data_service import LiveDataService, data_cache, live_data_service
+from shared_cache import SQLiteDataCache
+
+logger = logging.getLogger(__name__)
+
+DATA_REFRESH_ENABLED = os.getenv("DATA_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Refresh a dataset this many seconds before its data_cache entry expires
+DATA_REFRESH_MARGIN = float(os.getenv("DATA_REFRESH_MARGIN", "300"))
+# How often the scheduler checks for datasets that are due
+DATA_REFRESH_INTERVAL = float(os.getenv("DATA_REFRESH_INTERVAL", "30"))
+# Retry delay after a failed refresh doubles from the base up to the max, with full jitter
+DATA_REFRESH_BACKOFF_BASE = float(os.getenv("DATA_REFRESH_BACKOFF_BASE", "5"))
+DATA_REFRESH_BACKOFF_MAX = float(os.getenv("DATA_REFRESH_BACKOFF_MAX", "600"))
+
+
+@dataclass
+class RefreshState:
+    """Scheduling state of one cached dataset"""
+    due_at: float = 0.0
+    failures: int = 0
+    last_error: Optional[str] = None
+
+
+class DataRefresher:
+    """Periodically renews every dataset LiveDataService has loaded and notifies listeners"""
+
+    def __init__(self, service: LiveDataService, ttl: float, margin: float, interval: float,
+                 backoff_base: float, backoff_max: float):
+        self.service = service
+        self.ttl = ttl
+        # Never refresh more often than half the TTL, whatever the configured margin
+        self.margin = min(margin, ttl / 2)
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.states: Dict[str, RefreshState] = {}
+        self._listeners: List[Callable[[], Awaitable[Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+        # With a shared cache only the lease holder refreshes; the other workers follow
+        self.lease = data_cache.lease("data_refresher", ttl=max(3 * interval, 60)) \
+            if isinstance(data_cache, SQLiteDataCache) else None
+        self.is_leader = self.lease is None
+        self._shared_version: Optional[float] = None
+
+    def add_listener(self, listener: Callable[[], Awaitable[Any]]) -> None:
+        """Register a coroutine function awaited after each round that refreshed something"""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Data refresher started (margin {self.margin:.0f}s, interval {self.interval:.0f}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.lease is not None and self.is_leader:
+            await asyncio.to_thread(self.lease.release)
+
+    def _backoff(self, failures: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (failures - 1)))
+
+    def _due_at(self, cache_key: str) -> float:
+        state = self.states.get(cache_key)
+        if state is not None and state.failures:
+            return state.due_at
+        age = self.service.dataset_age(cache_key)
+        if age is None:
+            return 0.0
+        return time.monotonic() - age + self.ttl - self.margin
+
+    async def _refresh_one(self, cache_key: str) -> bool:
+        state = self.states.setdefault(cache_key, RefreshState())
+        previous = data_cache.get(cache_key)
+        try:
+            await self.service.refresh(cache_key, self.service.loaders[cache_key])
+        except Exception as e:
+            state.failures += 1
+            state.last_error = str(e)
+            delay = self._backoff(state.failures)
+            state.due_at = time.monotonic() + delay
+            # Keep serving the last good value while upstream is failing
+            if previous is not None:
+                await self._restore(cache_key, previous)
+            logger.error(f"Error refreshing {cache_key} (attempt {state.failures}, retrying in {delay:.0f}s): {str(e)}")
+            return False
+        state.failures = 0
+        state.last_error = None
+        return True
+
+    async def _restore(self, cache_key: str, value: Any) -> None:
+        # Renews the entry's expiry; a shared-cache write may wait for other workers
+        if self.lease is not None:
+            await asyncio.to_thread(data_cache.__setitem__, cache_key, value)
+        else:
+            data_cache[cache_key] = value
+
+    async def _notify(self) -> None:
+        for listener in self._listeners:
+            try:
+                await listener()
+            except Exception as e:
+                logger.error(f"Data refresh listener failed: {str(e)}")
+
+    async def _follow(self) -> None:
+        # Rebuild local derived state once the leader has refreshed the shared datasets
+        version = await asyncio.to_thread(data_cache.version)
+        if self._shared_version is not None and version != self._shared_version:
+            await self._notify()
+        self._shared_version = version
+
+    async def refresh_due(self) -> int:
+        """Refresh every dataset that is due; returns how many were renewed"""
+        if self.lease is not None:
+            was_leader, self.is_leader = self.is_leader, await asyncio.to_thread(self.lease.try_acquire)
+            if self.is_leader != was_leader:
+                logger.info(f"Data refresher {'acquired' if self.is_leader else 'lost'} the refresh lease")
+            if not self.is_leader:
+                await self._follow()
+                return 0
+            self.service.adopt_cached_datasets()
+        now = time.monotonic()
+        due = [cache_key for cache_key in list(self.service.loaders) if self._due_at(cache_key) <= now]
+        if not due:
+            return 0
+        results = await asyncio.gather(*(self._refresh_one(cache_key) for cache_key in due))
+        refreshed = sum(results)
+        if refreshed:
+            await self._notify()
+        return refreshed
+
+    async def _run(self) -> None:
+        # The first round runs right away: datasets that failed at startup or are
+        # never loaded on the request path (e.g. the listings scan) are due immediately
+        while True:
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Data refresh round failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def freshness(self) -> Dict[str, Any]:
+        """Age, expiry and refresh status of every dataset"""
+        now = time.monotonic()
+        datasets = {}
+        for cache_key in sorted(self.service.loaders):
+            age = self.service.dataset_age(cache_key)
+            state = self.states.get(cache_key, RefreshState())
+            datasets[cache_key] = {
+                "age_seconds": None if age is None else round(age, 1),
+                "updated_at": None if age is None else (datetime.now() - timedelta(seconds=age)).isoformat(),
+                "cached": cache_key in data_cache,
+                "next_refresh_in": round(max(0.0, self._due_at(cache_key) - now), 1),
+                "consecutive_failures": state.failures,
+                "last_error": state.last_error
+            }
+        return {
+            "refresher_running": self._task is not None and not self._task.done(),
+            "cache_backend": "sqlite" if self.lease is not None else "memory",
+            "refresh_leader": self.is_leader,
+            "ttl_seconds": self.ttl,
+            "refresh_margin_seconds": self.margin,
+            "datasets": datasets
+        }
+
+
+# Global instance
+data_refresher = DataRefresher(
+    live_data_service,
+    ttl=data_cache.ttl,
+    margin=DATA_REFRESH_MARGIN,
+    interval=DATA_REFRESH_INTERVAL,
+    backoff_base=DATA_REFRESH_BACKOFF_BASE,
+    backoff_max=DATA_REFRESH_BACKOFF_MAX
+)
@@ -3,20 +3,185 @@ Live data service for fetching real car market statistics from various APIs
 """
 import httpx
 import asyncio
+import functools
 import logging
-from typing import Dict, List, Any, Optional
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from cachetools import TTLCache
 import json
 
+from listings_aggregator import listings_aggregator
+from listings_store import listings_store
+from metrics import InstrumentedTransport, record_data_cache_lookup
+from shared_cache import SQLiteDataCache
+from vin_service import NHTSA_API_BASE
+
 logger = logging.getLogger(__name__)
 
+DATA_CACHE_TTL = 3600
+# memory: per-process TTLCache | sqlite: one cache shared by all workers on the host
+DATA_CACHE_BACKEND = os.getenv("DATA_CACHE_BACKEND", "memory").lower()
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "car_price_predictor_cache.sqlite"))
+# Longest a shared-cache write waits for another worker's write before failing
+SHARED_CACHE_BUSY_TIMEOUT_MS = int(os.getenv("SHARED_CACHE_BUSY_TIMEOUT_MS", "250"))
+
+def create_data_cache():
+    if DATA_CACHE_BACKEND == "sqlite":
+        return SQLiteDataCache(SHARED_CACHE_PATH, ttl=DATA_CACHE_TTL, busy_timeout_ms=SHARED_CACHE_BUSY_TIMEOUT_MS)
+    if DATA_CACHE_BACKEND != "memory":
+        raise ValueError(f"Unknown DATA_CACHE_BACKEND: {DATA_CACHE_BACKEND}")
+    # Room for the per-make model lists of every legitimate make plus the other datasets
+    return TTLCache(maxsize=256, ttl=DATA_CACHE_TTL)
+
 # Cache for storing API responses (TTL = 1 hour)
-data_cache = TTLCache(maxsize=100, ttl=3600)
+data_cache = create_data_cache()
+
+
+class HostRateLimiter:
+    """
+    Per-host request rate limit (GCRA: each request reserves the next slot,
+    and up to `burst` requests may run ahead of the schedule). Installed as
+    an httpx request event hook, so it paces every call the client makes.
+    """
+
+    def __init__(self, rate: float, burst: int = 5):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._next_slot: Dict[str, float] = {}
+
+    async def acquire(self, host: str) -> None:
+        if self.rate <= 0:
+            return
+        interval = 1 / self.rate
+        now = time.monotonic()
+        slot = max(self._next_slot.get(host, now), now)
+        self._next_slot[host] = slot + interval
+        delay = slot - now - (self.burst - 1) * interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __call__(self, request: httpx.Request) -> None:
+        await self.acquire(request.url.host)
+
+
+async def fan_out(items: List[Any], fetch: Callable[[Any], Awaitable[Any]],
+                  concurrency: int, timeout: float) -> Dict[Any, Any]:
+    """
+    Await fetch(item) for every item with at most `concurrency` in flight and a
+    per-item timeout. Returns {item: result} for the items that succeeded;
+    failures and timeouts are logged and left out instead of failing the rest.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item: Any) -> Any:
+        async with semaphore:
+            return await asyncio.wait_for(fetch(item), timeout)
+
+    results = await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+    succeeded = {}
+    for item, result in zip(items, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.error(f"Fetching {item} timed out after {timeout:.0f}s")
+        elif isinstance(result, BaseException):
+            logger.error(f"Error fetching {item}: {str(result)}")
+        else:
+            succeeded[item] = result
+    return succeeded
+
+# Optional JSON file persisting processed NHTSA datasets so new workers start warm
+DATA_CACHE_PATH = os.getenv("DATA_CACHE_PATH")
+# Bump when the shape of persisted datasets changes; older files are ignored
+DATA_CACHE_FORMAT_VERSION = 1
+# data_cache keys that are persisted (the static datasets are cheap to rebuild)
+PERSISTED_KEY_PREFIX = "nhtsa_"
+
+# Fan-out over all makes: requests in flight, per-host request rate (0 disables) and per-make timeout
+NHTSA_FANOUT_CONCURRENCY = int(os.getenv("NHTSA_FANOUT_CONCURRENCY", "8"))
+NHTSA_RATE_LIMIT = float(os.getenv("NHTSA_RATE_LIMIT", "20"))
+NHTSA_MAKE_TIMEOUT = float(os.getenv("NHTSA_MAKE_TIMEOUT", "15"))
+
+# Model years fetched per make for the autocomplete catalog (current model year backwards)
+CATALOG_MODEL_YEARS = int(os.getenv("CATALOG_MODEL_YEARS", "10"))
+CATALOG_FETCH_CONCURRENCY = int(os.getenv("CATALOG_FETCH_CONCURRENCY", "4"))
+
+# data_sources entry of statistics built without NHTSA data
+FALLBACK_DATA_SOURCE = "Fallback Data"
+
+# Zero-argument coroutine function that fetches a dataset, raising on upstream failure
+Loader = Callable[[], Awaitable[Any]]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight task, so a
+    burst of cache misses makes a single upstream call whose result (or
+    exception) every caller shares
+    """
 
-class LiveDataService:
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, loader: Loader) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(loader())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(future)
+
+    def in_flight(self) -> List[str]:
+        return list(self._inflight)
+
+class DiskCacheTier:
+    """
+    Second cache tier: one JSON file holding every persisted dataset with the
+    wall-clock time it was fetched. Writes go to a temporary file that replaces
+    the old one atomically, so concurrent readers never see a partial file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """{cache_key: {"fetched_at": epoch seconds, "data": payload}}, or {} if missing or unusable"""
+        try:
+            with open(self.path) as f:
+                document = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read data cache file {self.path}: {str(e)}")
+            return {}
+        if document.get("version") != DATA_CACHE_FORMAT_VERSION:
+            logger.warning(f"Ignoring data cache file {self.path} with format version {document.get('version')}")
+            return {}
+        return document.get("datasets", {})
+
+    def save(self, datasets: Dict[str, Dict[str, Any]]) -> None:
+        document = {"version": DATA_CACHE_FORMAT_VERSION, "saved_at": time.time(), "datasets": datasets}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".data_cache.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(document, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class LiveDataService:
+    def __init__(self, api_base: str = NHTSA_API_BASE):
+        self.rate_limiter = HostRateLimiter(NHTSA_RATE_LIMIT)
+        # Same vPIC base URL as the VIN decoder, so a mirror or stand-in server receives all NHTSA traffic
+        self.client = httpx.AsyncClient(base_url=api_base, timeout=30.0, event_hooks={"request": [self.rate_limiter]},
+                                        transport=InstrumentedTransport(httpx.AsyncHTTPTransport(), "live_data"))
         # List of legitimate car manufacturers to filter NHTSA data
         self.legitimate_makes = {
             'ACURA', 'ALFA ROMEO', 'ASTON MARTIN', 'AUDI', 'BENTLEY', 'BMW', 'BUICK',
@@ -28,122 +193,342 @@ class LiveDataService:
             'SAAB', 'SATURN', 'SCION', 'SMART', 'SUZUKI', 'ISUZU', 'PONTIAC', 'OLDSMOBILE',
             'MERCURY', 'HUMMER', 'DAEWOO', 'EAGLE', 'GEO', 'PLYMOUTH'
         }
+        # Loader and last successful fetch time (monotonic) of every cached dataset
+        self.loaders: Dict[str, Loader] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self._single_flight = SingleFlight()
+        # (make, model year) -> model names, kept only for closed model years
+        self._catalog_years: Dict[Tuple[str, int], List[str]] = {}
+        self.disk_tier = DiskCacheTier(DATA_CACHE_PATH) if DATA_CACHE_PATH else None
+        self._disk_lock = asyncio.Lock()
+        self._persist_pending = False
+        if listings_store.enabled or listings_aggregator.enabled:
+            # Not fetched on the request path: the background refresher runs the first scan
+            self.loaders["listings_statistics"] = self._load_listings_statistics
 
     async def close(self):
         await self.client.aclose()
+
+    async def refresh(self, cache_key: str, loader: Loader) -> Any:
+        """
+        Fetch a dataset and (re)store it in data_cache; raises if the loader fails.
+        Concurrent refreshes of the same key share one fetch. The loader is
+        registered either way so the background refresher retries it.
+        """
+        self.loaders[cache_key] = loader
+
+        async def load() -> Any:
+            value = await loader()
+            await self.store(cache_key, value)
+            if self.disk_tier is not None and cache_key.startswith(PERSISTED_KEY_PREFIX):
+                await self._persist()
+            return value
+
+        return await self._single_flight.do(cache_key, load)
+
+    async def store(self, cache_key: str, value: Any) -> None:
+        """Put a freshly fetched dataset in data_cache; shared-cache writes run in a worker thread"""
+        if isinstance(data_cache, SQLiteDataCache):
+            await asyncio.to_thread(self._store_now, cache_key, value)
+        else:
+            self._store_now(cache_key, value)
+
+    def _store_now(self, cache_key: str, value: Any) -> None:
+        data_cache[cache_key] = value
+        self._mark_refreshed(cache_key)
+
+    def _loader_for(self, cache_key: str) -> Optional[Loader]:
+        if cache_key == "nhtsa_makes":
+            return self._fetch_nhtsa_makes
+        if cache_key.startswith("nhtsa_models_"):
+            return functools.partial(self._fetch_nhtsa_models_for_make, cache_key[len("nhtsa_models_"):])
+        if cache_key == "nhtsa_catalog":
+            return self._fetch_model_catalog
+        return None
+
+    def load_persisted(self) -> int:
+        """
+        Seed data_cache from the disk tier at startup. Datasets keep their
+        original fetch time, so the background refresher renews stale ones
+        while they are being served. Returns the number of datasets loaded.
+        """
+        if self.disk_tier is None:
+            return 0
+        now_wall = time.time()
+        loaded = 0
+        for cache_key, entry in self.disk_tier.load().items():
+            loader = self._loader_for(cache_key)
+            if loader is None:
+                continue
+            if cache_key in data_cache:
+                # Already shared by another worker
+                self.loaders[cache_key] = loader
+                continue
+            data_cache[cache_key] = entry["data"]
+            self.loaders[cache_key] = loader
+            self._mark_refreshed(cache_key, max(0.0, now_wall - entry["fetched_at"]))
+            loaded += 1
+        logger.info(f"Loaded {loaded} datasets from {self.disk_tier.path}")
+        return loaded
+
+    def _persisted_datasets(self) -> Dict[str, Dict[str, Any]]:
+        now_wall = time.time()
+        datasets = {}
+        for cache_key in list(self.loaders):
+            age = self.dataset_age(cache_key)
+            if age is None or not cache_key.startswith(PERSISTED_KEY_PREFIX):
+                continue
+            value = data_cache.get(cache_key)
+            if value is not None:
+                datasets[cache_key] = {"fetched_at": now_wall - age, "data": value}
+        return datasets
+
+    async def _persist(self) -> None:
+        # One writer at a time, so an older snapshot never replaces a newer one.
+        # Refreshes that land while a write is running are folded into one more write.
+        self._persist_pending = True
+        if self._disk_lock.locked():
+            return
+        async with self._disk_lock:
+            while self._persist_pending:
+                self._persist_pending = False
+                try:
+                    await asyncio.to_thread(self.disk_tier.save, self._persisted_datasets())
+                except OSError as e:
+                    logger.error(f"Could not write data cache file {self.disk_tier.path}: {str(e)}")
+
+    def _mark_refreshed(self, cache_key: str, age: float = 0.0) -> None:
+        self.refreshed_at[cache_key] = time.monotonic() - age
+        if isinstance(data_cache, SQLiteDataCache):
+            data_cache.mark_fetched(cache_key, time.time() - age)
+
+    def dataset_age(self, cache_key: str) -> Optional[float]:
+        """Seconds since the dataset was last fetched successfully, by any worker when the cache is shared"""
+        if isinstance(data_cache, SQLiteDataCache):
+            fetched_at = data_cache.fetched_at(cache_key)
+            return None if fetched_at is None else max(0.0, time.time() - fetched_at)
+        refreshed_at = self.refreshed_at.get(cache_key)
+        return None if refreshed_at is None else time.monotonic() - refreshed_at
+
+    def _cached(self, cache_key: str) -> Any:
+        """The cached dataset (None on a miss), counted in the data_cache metrics"""
+        value = data_cache.get(cache_key)
+        record_data_cache_lookup(cache_key, value is not None)
+        return value
+
+    def adopt_cached_datasets(self) -> None:
+        """Register loaders for datasets another worker put in the shared cache"""
+        for cache_key in list(data_cache):
+            if cache_key not in self.loaders:
+                loader = self._loader_for(cache_key)
+                if loader is not None:
+                    self.loaders[cache_key] = loader
     
     async def get_nhtsa_makes(self) -> List[Dict[str, Any]]:
         """Fetch all vehicle makes from NHTSA API and filter for legitimate car manufacturers"""
         cache_key = "nhtsa_makes"
-        if cache_key in data_cache:
-            return data_cache[cache_key]
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            url = "https://vpic.nhtsa.dot.gov/api/vehicles/getallmakes?format=json"
-            response = await self.client.get(url)
-            response.raise_for_status()
-
-            data = response.json()
-            all_makes = data.get('Results', [])
-
-            # Filter for legitimate car manufacturers only
-            legitimate_makes = []
-            for make in all_makes:
-                make_name = make.get('Make_Name', '').upper().strip()
-                if make_name in self.legitimate_makes:
-                    legitimate_makes.append(make_name)
-
-            # Remove duplicates and sort
-            legitimate_makes = sorted(list(set(legitimate_makes)))
-
-            # Create realistic market data based on actual market share
-            market_data = self._get_realistic_market_data()
-
-            # Process makes with realistic data
-            processed_makes = []
-            for make_name in legitimate_makes[:20]:  # Top 20 legitimate makes
-                # Get market data for this make or use default
-                make_data = market_data.get(make_name, {
-                    "count": 25000,
-                    "avg_price": 20000,
-                    "percentage": 2.0
-                })
+            return await self.refresh(cache_key, self._fetch_nhtsa_makes)
+        except Exception as e:
+            logger.error(f"Error fetching NHTSA makes: {str(e)}")
+            return self._get_fallback_makes()
 
-                processed_makes.append({
-                    "make": make_name.title(),  # Proper case formatting
-                    "count": make_data["count"],
-                    "avg_price": make_data["avg_price"],
-                    "percentage": make_data["percentage"]
-                })
+    async def _fetch_nhtsa_makes(self) -> List[Dict[str, Any]]:
+        url = "/vehicles/getallmakes?format=json"
+        response = await self.client.get(url)
+        response.raise_for_status()
 
-            # Sort by count (popularity) descending
-            processed_makes.sort(key=lambda x: x["count"], reverse=True)
+        data = response.json()
+        all_makes = data.get('Results', [])
 
-            data_cache[cache_key] = processed_makes
-            return processed_makes
+        # Filter for legitimate car manufacturers only
+        legitimate_makes = []
+        for make in all_makes:
+            make_name = make.get('Make_Name', '').upper().strip()
+            if make_name in self.legitimate_makes:
+                legitimate_makes.append(make_name)
 
-        except Exception as e:
-            logger.error(f"Error fetching NHTSA makes: {str(e)}")
-            return self._get_fallback_makes()
+        # Remove duplicates and sort
+        legitimate_makes = sorted(list(set(legitimate_makes)))
+
+        # Create realistic market data based on actual market share
+        market_data = self._get_realistic_market_data()
+
+        # Process makes with realistic data
+        processed_makes = []
+        for make_name in legitimate_makes:
+            # Get market data for this make or use default
+            make_data = market_data.get(make_name, {
+                "count": 25000,
+                "avg_price": 20000,
+                "percentage": 2.0
+            })
+
+            processed_makes.append({
+                "make": make_name.title(),  # Proper case formatting
+                "count": make_data["count"],
+                "avg_price": make_data["avg_price"],
+                "percentage": make_data["percentage"]
+            })
+
+        # Sort by count (popularity) descending
+        processed_makes.sort(key=lambda x: x["count"], reverse=True)
+        return processed_makes
     
     async def get_nhtsa_models_for_make(self, make_name: str) -> List[Dict[str, Any]]:
         """Fetch models for a specific make from NHTSA API with realistic filtering"""
         cache_key = f"nhtsa_models_{make_name}"
-        if cache_key in data_cache:
-            return data_cache[cache_key]
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            # Use the properly formatted make name for API call
-            api_make_name = make_name.upper().replace(' ', '%20')
-            url = f"https://vpic.nhtsa.dot.gov/api/vehicles/getmodelsformake/{api_make_name}?format=json"
-            response = await self.client.get(url)
-            response.raise_for_status()
-
-            data = response.json()
-            models = data.get('Results', [])
-
-            # Get realistic model data for this make
-            realistic_models = self._get_realistic_model_data(make_name.upper())
-
-            # Process models with realistic data
-            processed_models = []
-            model_names_seen = set()
-
-            for model in models:
-                model_name = model.get('Model_Name', '').strip()
-                if model_name and model_name not in model_names_seen:
-                    model_names_seen.add(model_name)
-
-                    # Get realistic data for this model or use default
-                    model_data = realistic_models.get(model_name.upper(), {
-                        "count": 5000,
-                        "avg_price": 22000
-                    })
-
-                    processed_models.append({
-                        "model": model_name,
-                        "make": make_name.title(),
-                        "count": model_data["count"],
-                        "avg_price": model_data["avg_price"]
-                    })
-
-            # Sort by popularity and take top 10
-            processed_models.sort(key=lambda x: x["count"], reverse=True)
-            processed_models = processed_models[:10]
-
-            data_cache[cache_key] = processed_models
-            return processed_models
-
+            return await self.refresh(cache_key, functools.partial(self._fetch_nhtsa_models_for_make, make_name))
         except Exception as e:
             logger.error(f"Error fetching NHTSA models for {make_name}: {str(e)}")
             return self._get_fallback_models_for_make(make_name)
+
+    async def _fetch_nhtsa_models_for_make(self, make_name: str) -> List[Dict[str, Any]]:
+        # Use the properly formatted make name for API call
+        api_make_name = make_name.upper().replace(' ', '%20')
+        url = f"/vehicles/getmodelsformake/{api_make_name}?format=json"
+        response = await self.client.get(url)
+        response.raise_for_status()
+
+        data = response.json()
+        models = data.get('Results', [])
+
+        # Get realistic model data for this make
+        realistic_models = self._get_realistic_model_data(make_name.upper())
+
+        # Process models with realistic data
+        processed_models = []
+        model_names_seen = set()
+
+        for model in models:
+            model_name = model.get('Model_Name', '').strip()
+            if model_name and model_name not in model_names_seen:
+                model_names_seen.add(model_name)
+
+                # Get realistic data for this model or use default
+                model_data = realistic_models.get(model_name.upper(), {
+                    "count": 5000,
+                    "avg_price": 22000
+                })
+
+                processed_models.append({
+                    "model": model_name,
+                    "make": make_name.title(),
+                    "count": model_data["count"],
+                    "avg_price": model_data["avg_price"]
+                })
+
+        # Sort by popularity and take top 10
+        processed_models.sort(key=lambda x: x["count"], reverse=True)
+        processed_models = processed_models[:10]
+        return processed_models
     
+    async def get_model_catalog(self) -> List[Dict[str, Any]]:
+        """Every make/model with the recent model years NHTSA lists it for"""
+        cache_key = "nhtsa_catalog"
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            return await self.refresh(cache_key, self._fetch_model_catalog)
+        except Exception as e:
+            logger.error(f"Error fetching NHTSA model catalog: {str(e)}")
+            return self._get_fallback_catalog()
+
+    async def _fetch_model_catalog(self) -> List[Dict[str, Any]]:
+        makes = sorted(self.legitimate_makes)
+        # The first fetch costs each make one model list plus one call per model
+        # year; later refreshes reuse the closed model years
+        results = await fan_out(makes, self._fetch_catalog_for_make, CATALOG_FETCH_CONCURRENCY,
+                                timeout=NHTSA_MAKE_TIMEOUT * (1 + CATALOG_MODEL_YEARS))
+        if not results:
+            raise RuntimeError("Catalog fetch failed for every make")
+        return [entry for make_name in makes for entry in results.get(make_name, [])]
+
+    async def _fetch_catalog_for_make(self, make_name: str) -> List[Dict[str, Any]]:
+        api_make_name = make_name.replace(' ', '%20')
+        response = await self.client.get(
+            f"/vehicles/getmodelsformake/{api_make_name}?format=json")
+        response.raise_for_status()
+        model_years: Dict[str, set] = {}
+        for model in response.json().get('Results', []):
+            model_name = model.get('Model_Name', '').strip()
+            if model_name:
+                model_years.setdefault(model_name, set())
+
+        # Model years before the current calendar year no longer change, so
+        # hourly refreshes only re-fetch the current and next model year
+        this_year = datetime.now().year
+        for year in range(this_year + 1, this_year + 1 - CATALOG_MODEL_YEARS, -1):
+            year_models = self._catalog_years.get((make_name, year))
+            if year_models is None:
+                url = (f"/vehicles/getmodelsformakeyear/"
+                       f"make/{api_make_name}/modelyear/{year}?format=json")
+                try:
+                    response = await self.client.get(url)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    logger.warning(f"Skipping {make_name} {year} in catalog: {str(e)}")
+                    continue
+                year_models = [model.get('Model_Name', '').strip() for model in response.json().get('Results', [])]
+                year_models = [model_name for model_name in year_models if model_name]
+                if year < this_year:
+                    self._catalog_years[(make_name, year)] = year_models
+            for model_name in year_models:
+                model_years.setdefault(model_name, set()).add(year)
+
+        return [
+            {"make": make_name.title(), "model": model_name, "years": sorted(years)}
+            for model_name, years in model_years.items()
+        ]
+
+    async def _load_listings_statistics(self) -> Dict[str, Any]:
+        # A prebuilt column store wins over scanning the raw listings
+        if listings_store.enabled:
+            return await asyncio.to_thread(listings_store.query)
+        # Only listings appended since the previous pass are read
+        await asyncio.to_thread(listings_aggregator.update)
+        return listings_aggregator.report()
+
+    def listings_statistics(self) -> Optional[Dict[str, Any]]:
+        """Aggregates over the listings dataset, or None until the first scan has finished"""
+        listings = self._cached("listings_statistics")
+        return listings if listings and listings.get("rows") else None
+
+    def listings_overview(self, listings: Dict[str, Any]) -> Dict[str, Any]:
+        """Statistics fields computed from real listings, replacing the built-in market figures"""
+        makes = [make for make in listings["makes"] if make["make"].upper() in self.legitimate_makes]
+        make_names = {make["make"] for make in makes}
+        return {
+            "popular_makes": makes,
+            "popular_models": [model for model in listings["models"] if model["make"] in make_names][:10],
+            "body_types": listings["body_types"],
+            "fuel_types": listings["fuel_types"],
+            "year_trends": listings["year_trends"][:10],
+            "price_ranges": listings["price_ranges"],
+            "mileage_distribution": listings["mileage_distribution"],
+            "total_listings": listings["rows"]
+        }
+
     async def get_vehicle_types(self) -> List[Dict[str, Any]]:
         """Get vehicle type statistics"""
         cache_key = "vehicle_types"
-        if cache_key in data_cache:
-            return data_cache[cache_key]
-        
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
+        return await self.refresh(cache_key, self._load_vehicle_types)
+
+    async def _load_vehicle_types(self) -> List[Dict[str, Any]]:
         # For now, return enhanced static data with some real-world proportions
         vehicle_types = [
             {"type": "Sedan", "count": 567890, "percentage": 28.4, "avg_price": 18200},
@@ -155,16 +540,17 @@ class LiveDataService:
             {"type": "Minivan", "count": 87654, "percentage": 4.4, "avg_price": 21200},
             {"type": "Van", "count": 45678, "percentage": 2.3, "avg_price": 25600}
         ]
-        
-        data_cache[cache_key] = vehicle_types
         return vehicle_types
     
     async def get_fuel_type_statistics(self) -> List[Dict[str, Any]]:
         """Get fuel type statistics with some real market trends"""
         cache_key = "fuel_types"
-        if cache_key in data_cache:
-            return data_cache[cache_key]
-        
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
+        return await self.refresh(cache_key, self._load_fuel_type_statistics)
+
+    async def _load_fuel_type_statistics(self) -> List[Dict[str, Any]]:
         # Based on real market trends as of 2024
         fuel_types = [
             {"type": "Gasoline", "count": 1654321, "percentage": 82.7, "avg_price": 19200},
@@ -174,16 +560,17 @@ class LiveDataService:
             {"type": "Flex Fuel Vehicle", "count": 12345, "percentage": 0.6, "avg_price": 18500},
             {"type": "Compressed Natural Gas", "count": 2345, "percentage": 0.1, "avg_price": 21000}
         ]
-        
-        data_cache[cache_key] = fuel_types
         return fuel_types
     
     async def get_year_trends(self) -> List[Dict[str, Any]]:
         """Get year-over-year trends with depreciation patterns"""
         cache_key = "year_trends"
-        if cache_key in data_cache:
-            return data_cache[cache_key]
-        
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
+        return await self.refresh(cache_key, self._load_year_trends)
+
+    async def _load_year_trends(self) -> List[Dict[str, Any]]:
         current_year = datetime.now().year
         year_trends = []
         
@@ -200,8 +587,6 @@ class LiveDataService:
                 "avg_price": round(price, 0),
                 "avg_mileage": 15000 * (i + 1)  # 15k miles per year
             })
-        
-        data_cache[cache_key] = year_trends
         return year_trends
 
     def _get_realistic_market_data(self) -> Dict[str, Dict[str, Any]]:
@@ -299,6 +684,14 @@ class LiveDataService:
         }
         return fallback_models.get(make_name, [])
 
+    def _get_fallback_catalog(self) -> List[Dict[str, Any]]:
+        """Catalog of the makes and models we have market data for, when NHTSA is unavailable"""
+        catalog = []
+        for make_name in sorted(self.legitimate_makes):
+            for model_name in self._get_realistic_model_data(make_name):
+                catalog.append({"make": make_name.title(), "model": model_name.title(), "years": []})
+        return catalog
+
     def _get_fallback_makes(self) -> List[Dict[str, Any]]:
         """Fallback data when API is unavailable"""
         return [
@@ -316,8 +709,65 @@ class LiveDataService:
 
 # Global instance
 live_data_service = LiveDataService()
+_statistics_flight = SingleFlight()
 
 async def get_live_statistics() -> Dict[str, Any]:
+    """Get comprehensive live statistics; concurrent callers share one build"""
+    return await _statistics_flight.do("live_statistics", _build_live_statistics)
+
+async def get_cached_statistics() -> Dict[str, Any]:
+    """
+    Statistics from the datasets already in data_cache (loaded from the disk
+    tier or shared by another worker), with fallback data for the rest.
+    Never calls NHTSA, so the first snapshot is ready at startup without network.
+    """
+    makes = live_data_service._cached("nhtsa_makes")
+    fallback = makes is None
+    if fallback:
+        makes = live_data_service._get_fallback_makes()
+    all_models = []
+    for make in makes:
+        models = live_data_service._cached(f"nhtsa_models_{make['make']}")
+        all_models.extend(models if models is not None else live_data_service._get_fallback_models_for_make(make["make"]))
+    return _compose_statistics(
+        makes, all_models,
+        await live_data_service.get_vehicle_types(),
+        await live_data_service.get_fuel_type_statistics(),
+        await live_data_service.get_year_trends(),
+        fallback
+    )
+
+def _compose_statistics(makes: List[Dict[str, Any]], all_models: List[Dict[str, Any]],
+                        vehicle_types: List[Dict[str, Any]], fuel_types: List[Dict[str, Any]],
+                        year_trends: List[Dict[str, Any]], fallback: bool) -> Dict[str, Any]:
+    """
+    The statistics dict served by the snapshot, from its source datasets;
+    fallback marks makes that come from the built-in data because NHTSA failed
+    """
+    # Sort models by count and take top 10
+    popular_models = sorted(all_models, key=lambda x: x["count"], reverse=True)[:10]
+
+    statistics = {
+        "popular_makes": makes,
+        "popular_models": popular_models,
+        "body_types": vehicle_types,
+        "fuel_types": fuel_types,
+        "year_trends": year_trends,
+        "last_updated": datetime.now().isoformat(),
+        "data_sources": [FALLBACK_DATA_SOURCE] if fallback else [
+            "NHTSA Vehicle API",
+            "Market Analysis",
+            "Industry Reports"
+        ]
+    }
+
+    listings = live_data_service.listings_statistics()
+    if listings:
+        statistics.update(live_data_service.listings_overview(listings))
+        statistics["data_sources"] = [FALLBACK_DATA_SOURCE if fallback else "NHTSA Vehicle API", "Used Car Listings"]
+    return statistics
+
+async def _build_live_statistics() -> Dict[str, Any]:
     """Get comprehensive live statistics from multiple sources"""
     try:
         # Fetch data from multiple sources concurrently
@@ -330,35 +780,17 @@ async def get_live_statistics() -> Dict[str, Any]:
             makes_task, vehicle_types_task, fuel_types_task, year_trends_task
         )
         
-        # Get top models for top makes
-        top_makes = makes[:5]
-        models_tasks = [
-            live_data_service.get_nhtsa_models_for_make(make["make"]) 
-            for make in top_makes
-        ]
-        models_results = await asyncio.gather(*models_tasks)
-        
-        # Flatten models list
-        all_models = []
-        for models in models_results:
-            all_models.extend(models)
-        
-        # Sort models by count and take top 10
-        popular_models = sorted(all_models, key=lambda x: x["count"], reverse=True)[:10]
+        # Get top models for every make; slow or failing makes are left out
+        make_names = [make["make"] for make in makes]
+        models_results = await fan_out(
+            make_names, live_data_service.get_nhtsa_models_for_make,
+            NHTSA_FANOUT_CONCURRENCY, NHTSA_MAKE_TIMEOUT
+        )
         
-        return {
-            "popular_makes": makes,
-            "popular_models": popular_models,
-            "body_types": vehicle_types,
-            "fuel_types": fuel_types,
-            "year_trends": year_trends,
-            "last_updated": datetime.now().isoformat(),
-            "data_sources": [
-                "NHTSA Vehicle API",
-                "Market Analysis",
-                "Industry Reports"
-            ]
-        }
+        all_models = [model for make_name in make_names for model in models_results.get(make_name, [])]
+        # get_nhtsa_makes answers with fallback makes when NHTSA fails
+        fallback = "nhtsa_makes" not in data_cache
+        return _compose_statistics(makes, all_models, vehicle_types, fuel_types, year_trends, fallback)
         
     except Exception as e:
         logger.error(f"Error getting live statistics: {str(e)}")
@@ -370,6 +802,6 @@ async def get_live_statistics() -> Dict[str, Any]:
             "fuel_types": await live_data_service.get_fuel_type_statistics(),
             "year_trends": await live_data_service.get_year_trends(),
             "last_updated": datetime.now().isoformat(),
-            "data_sources": ["Fallback Data"],
+            "data_sources": [FALLBACK_DATA_SOURCE],
             "error": "Live data temporarily unavailable"
         }
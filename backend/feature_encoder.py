@@ -0,0 +1,135 @@
+"""
+Feature definitions shared by the model-backed predictors and a precompiled
+encoder that turns prediction requests into float32 model rows
+"""
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Brands flagged as luxury in the training notebook
+LUXURY_BRANDS = {
+    "BMW", "Mercedes-Benz", "Audi", "Lexus", "Acura", "Infiniti",
+    "Cadillac", "Lincoln", "Porsche", "Jaguar", "Land Rover", "Volvo"
+}
+# Columns one-hot encoded (as "<column>_<value>") in the training notebook
+ONEHOT_COLUMNS = ("body_type", "fuel_type", "transmission", "wheel_system", "listing_color")
+# Reference year used for car_age in the training notebook
+TRAINING_REFERENCE_YEAR = 2025
+
+
+def _derived_features() -> Dict[str, Callable[[Any], Any]]:
+    """Engineered features from the training notebook, computed from request fields"""
+
+    def car_age(req):
+        return TRAINING_REFERENCE_YEAR - req.year
+
+    def mileage_per_year(req):
+        age = car_age(req)
+        return req.mileage / age if age else None
+
+    def fuel_efficiency_combined(req):
+        if req.city_fuel_economy is None or req.highway_fuel_economy is None:
+            return None
+        return (req.city_fuel_economy + req.highway_fuel_economy) / 2
+
+    def power_per_displacement(req):
+        if not req.horsepower or not req.engine_displacement:
+            return None
+        return req.horsepower / req.engine_displacement
+
+    return {
+        "car_age": car_age,
+        "mileage_per_year": mileage_per_year,
+        "fuel_efficiency_combined": fuel_efficiency_combined,
+        "power_per_displacement": power_per_displacement,
+        "is_luxury_brand": lambda req: req.make_name in LUXURY_BRANDS,
+        "high_mileage": lambda req: req.mileage > 100000,
+    }
+
+
+DERIVED_FEATURES = _derived_features()
+
+
+def raw_feature_getter(feature_name: str) -> Callable[[Any], Any]:
+    """
+    Build a function extracting one model feature from a request.
+    Handles engineered features, one-hot columns and plain request fields;
+    features the request doesn't carry resolve to None.
+    """
+    if feature_name in DERIVED_FEATURES:
+        return DERIVED_FEATURES[feature_name]
+
+    for column in ONEHOT_COLUMNS:
+        if feature_name.startswith(column + "_"):
+            category = feature_name[len(column) + 1:]
+            return lambda req: getattr(req, column, None) == category
+
+    return lambda req: getattr(req, feature_name, None)
+
+
+class FeatureEncoder:
+    """
+    Precompiled request -> float32 row encoder.
+
+    Column order is fixed at construction and categorical columns are mapped
+    through lookup tables built once from the model's category lists, so
+    encoding is a single list comprehension over compiled getters written
+    into preallocated buffers. No DataFrame is built on the request path.
+
+    The returned arrays are views of the encoder's own buffers and are only
+    valid until the next encode call on the same thread; callers score them
+    immediately. Each thread gets its own buffers, so batches scored in worker
+    threads never overwrite each other.
+    """
+
+    def __init__(self, feature_names: Sequence[str], categories: Optional[Dict[str, List[str]]] = None,
+                 batch_capacity: int = 1024):
+        categories = categories or {}
+        self.feature_names = list(feature_names)
+        self.category_tables = {
+            name: {value: float(code) for code, value in enumerate(values)}
+            for name, values in categories.items()
+        }
+        self._getters = [self._compile_column(name) for name in self.feature_names]
+        self.batch_capacity = batch_capacity
+        self._buffers = threading.local()
+
+    def _thread_buffers(self) -> threading.local:
+        buffers = self._buffers
+        if not hasattr(buffers, "row"):
+            buffers.row = np.empty(len(self.feature_names), dtype=np.float32)
+            buffers.batch = np.empty((self.batch_capacity, len(self.feature_names)), dtype=np.float32)
+        return buffers
+
+    def _compile_column(self, feature_name: str) -> Callable[[Any], float]:
+        raw = raw_feature_getter(feature_name)
+        table = self.category_tables.get(feature_name)
+        if table is not None:
+            # Unseen categories encode as NaN, like a missing value
+            return lambda req: table.get(raw(req), math.nan)
+
+        def numeric(req):
+            value = raw(req)
+            return math.nan if value is None else float(value)
+        return numeric
+
+    def encode(self, request: Any) -> np.ndarray:
+        """Encode one request into this thread's row buffer"""
+        row = self._thread_buffers().row
+        row[:] = [getter(request) for getter in self._getters]
+        return row
+
+    def encode_batch(self, requests: Sequence[Any]) -> np.ndarray:
+        """Encode requests into this thread's batch buffer, growing it if needed"""
+        buffers = self._thread_buffers()
+        n = len(requests)
+        if n > buffers.batch.shape[0]:
+            capacity = 1 << (n - 1).bit_length()
+            buffers.batch = np.empty((capacity, len(self.feature_names)), dtype=np.float32)
+        batch = buffers.batch[:n]
+        getters = self._getters
+        for i, request in enumerate(requests):
+            batch[i] = [getter(request) for getter in getters]
+        return batch
@@ -0,0 +1,400 @@
+"""
+Incremental aggregation engine over the used-car listings dataset (the
+CarGurus crawl the model was trained on, 2.8M+ rows).
+
+Listings are read in chunks as columnar NumPy arrays, either from CSV or,
+when pyarrow is installed, from Parquet. Each chunk is folded into
+per-make, per-model, per-body, per-fuel and per-year count/price/mileage
+sums, plus fixed-bin price and mileage histograms, using np.unique and
+np.bincount, with no per-row Python work beyond CSV parsing.
+
+The engine remembers how far it has read every source: a CSV file is
+resumed from the byte offset of its last complete record, and a Parquet
+file is read once. Rows appended to a CSV, or new files dropped into the
+listings directory, are folded in without rescanning what was already
+aggregated.
+
+Aggregate a dataset from the command line with:
+    python listings_aggregator.py used_cars_data.csv
+"""
+import csv
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# CSV file or directory of .csv / .parquet files with the listings dataset
+LISTINGS_PATH = os.getenv("LISTINGS_PATH")
+LISTINGS_CHUNK_ROWS = int(os.getenv("LISTINGS_CHUNK_ROWS", "200000"))
+
+CATEGORY_COLUMNS = ("make_name", "model_name", "body_type", "fuel_type")
+NUMERIC_COLUMNS = ("year", "price", "mileage")
+LISTING_COLUMNS = CATEGORY_COLUMNS + NUMERIC_COLUMNS
+
+# Histogram bins matching the price_ranges / mileage_distribution buckets of the statistics endpoints
+PRICE_BIN_EDGES = np.array([1000, 5000, 10000, 15000, 20000, 30000, 50000, 75000], dtype=np.float64)
+PRICE_BIN_LABELS = [
+    "$1,000 - $5,000", "$5,000 - $10,000", "$10,000 - $15,000", "$15,000 - $20,000",
+    "$20,000 - $30,000", "$30,000 - $50,000", "$50,000 - $75,000", "$75,000+"
+]
+MILEAGE_BIN_EDGES = np.array([0, 25000, 50000, 75000, 100000, 125000, 150000, 175000], dtype=np.float64)
+MILEAGE_BIN_LABELS = [
+    "0 - 25,000", "25,000 - 50,000", "50,000 - 75,000", "75,000 - 100,000",
+    "100,000 - 125,000", "125,000 - 150,000", "150,000 - 175,000", "175,000+"
+]
+
+Chunk = Dict[str, np.ndarray]
+
+
+def _to_float(values: Sequence[str]) -> np.ndarray:
+    """Parse numeric strings, with empty or malformed cells as NaN"""
+    out = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except ValueError:
+            out[i] = np.nan
+    return out
+
+
+def iter_csv_chunks(path: str, offset: int, chunk_rows: int,
+                    columns: Sequence[str] = LISTING_COLUMNS, final: bool = False) -> Iterator[tuple]:
+    """
+    Yield (chunk, end_offset) for the complete records of a CSV file after
+    byte offset (0 = start, header included). Records may span lines inside
+    quotes; a record is complete once its quote count is even, so the last
+    record counts with or without a trailing newline. A trailing record with
+    unbalanced quotes (still being appended) is left for the next pass,
+    unless final is set for a one-shot read of the whole file.
+    Columns other than CATEGORY_COLUMNS are parsed as numbers.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        positions = {name: header.index(name) for name in columns if name in header}
+        missing = set(("make_name", "price")) - set(positions)
+        if missing:
+            raise ValueError(f"{path} is missing required columns: {sorted(missing)}")
+        if offset:
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                # The previous pass ended on a last record without a newline. Bytes
+                # appended to that same line belong to a record already aggregated.
+                continuation = f.readline()
+                if continuation.strip():
+                    logger.warning(f"{path}: skipping {len(continuation)} bytes appended to the "
+                                   f"unterminated record at byte {offset}")
+
+        records: List[str] = []
+        pending = b""
+        end_offset = f.tell()
+        for line in f:
+            pending += line
+            if pending.count(b'"') % 2 or not pending.endswith(b"\n"):
+                continue
+            records.append(pending.decode("utf-8"))
+            pending = b""
+            if len(records) >= chunk_rows:
+                end_offset = f.tell()
+                yield _parse_csv_records(records, positions), end_offset
+                records = []
+        if pending and (final or not pending.count(b'"') % 2):
+            records.append(pending.decode("utf-8"))
+            pending = b""
+        if records:
+            end_offset = f.tell() - len(pending)
+            yield _parse_csv_records(records, positions), end_offset
+
+
+def _parse_csv_records(records: List[str], positions: Dict[str, int]) -> Chunk:
+    columns: Dict[str, List[str]] = {name: [] for name in positions}
+    width = max(positions.values()) + 1
+    for row in csv.reader(records):
+        if not row:
+            continue
+        if len(row) < width:
+            # Malformed row: kept as an empty row so it is counted as skipped
+            row = [""] * width
+        for name, position in positions.items():
+            columns[name].append(row[position])
+    chunk: Chunk = {}
+    for name, values in columns.items():
+        if name in CATEGORY_COLUMNS:
+            chunk[name] = np.array(values, dtype=object)
+        else:
+            chunk[name] = _to_float(values)
+    return chunk
+
+
+def iter_parquet_chunks(path: str, chunk_rows: int, columns: Sequence[str] = LISTING_COLUMNS) -> Iterator[Chunk]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Reading Parquet listings requires the pyarrow package") from e
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [name for name in columns if name in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk: Chunk = {}
+        for name in columns:
+            column = batch.column(name)
+            if name in CATEGORY_COLUMNS:
+                chunk[name] = np.array(column.fill_null("").to_pylist(), dtype=object)
+            else:
+                chunk[name] = column.cast("float64").to_numpy(zero_copy_only=False)
+        yield chunk
+
+
+def bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Histogram bin of each value; out-of-range values land in the first or the open-ended last bin"""
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 1)
+
+
+def group_summary(keys: Sequence[Any], count: np.ndarray, price_sum: np.ndarray,
+                  total: int, label: str) -> List[Dict[str, Any]]:
+    """Groups by descending count, skipping empty keys and groups"""
+    groups = []
+    for code in np.argsort(-count, kind="stable"):
+        key, group_count = keys[code], int(count[code])
+        if key == "" or not group_count:
+            continue
+        groups.append({
+            label: key,
+            "count": group_count,
+            "percentage": round(100 * group_count / total, 1),
+            "avg_price": round(price_sum[code] / group_count)
+        })
+    return groups
+
+
+def model_summary(pairs: Sequence[tuple], count: np.ndarray, price_sum: np.ndarray) -> List[Dict[str, Any]]:
+    """(make, model) groups by descending count"""
+    groups = []
+    for code in np.argsort(-count, kind="stable"):
+        (make, model), group_count = pairs[code], int(count[code])
+        if model == "" or not group_count:
+            continue
+        groups.append({"model": model, "make": make, "count": group_count,
+                       "avg_price": round(price_sum[code] / group_count)})
+    return groups
+
+
+def year_summary(years: Sequence[int], count: np.ndarray, price_sum: np.ndarray,
+                 mileage_sum: np.ndarray, mileage_count: np.ndarray) -> List[Dict[str, Any]]:
+    """Per-year trends, newest first"""
+    trends = []
+    for code in np.argsort([-year for year in years], kind="stable"):
+        year_count, year_mileage_count = int(count[code]), int(mileage_count[code])
+        if not year_count:
+            continue
+        trends.append({
+            "year": int(years[code]),
+            "count": year_count,
+            "avg_price": round(price_sum[code] / year_count),
+            "avg_mileage": round(mileage_sum[code] / year_mileage_count) if year_mileage_count else None
+        })
+    return trends
+
+
+def histogram_summary(total: int, price_hist: np.ndarray, mileage_hist: np.ndarray,
+                      mileage_hist_price_sum: np.ndarray) -> Dict[str, List[Dict[str, Any]]]:
+    mileage_total = int(mileage_hist.sum())
+    return {
+        "price_ranges": [
+            {"range": label, "count": count, "percentage": round(100 * count / total, 1)}
+            for label, count in zip(PRICE_BIN_LABELS, price_hist.tolist())
+        ],
+        "mileage_distribution": [
+            {
+                "range": label, "count": count,
+                "percentage": round(100 * count / mileage_total, 1) if mileage_total else 0.0,
+                "avg_price": round(price_sum / count) if count else None
+            }
+            for label, count, price_sum in zip(MILEAGE_BIN_LABELS, mileage_hist.tolist(),
+                                               mileage_hist_price_sum.tolist())
+        ]
+    }
+
+
+class GroupAggregate:
+    """Count and price/mileage sums per group, with group codes assigned as new keys appear"""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+        self.keys: List[Any] = []
+        self.count = np.zeros(0, dtype=np.int64)
+        self.price_sum = np.zeros(0, dtype=np.float64)
+        self.mileage_sum = np.zeros(0, dtype=np.float64)
+        self.mileage_count = np.zeros(0, dtype=np.int64)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """Group codes for a column, looking up each distinct value once"""
+        uniques, inverse = np.unique(values, return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques.tolist()):
+            code = self.codes.get(key)
+            if code is None:
+                code = self.codes[key] = len(self.keys)
+                self.keys.append(key)
+            mapping[i] = code
+        return mapping[inverse]
+
+    def add(self, codes: np.ndarray, price: np.ndarray, mileage: np.ndarray) -> None:
+        size = len(self.keys)
+        has_mileage = ~np.isnan(mileage)
+        self.count = self._grow(self.count, size) + np.bincount(codes, minlength=size)
+        self.price_sum = self._grow(self.price_sum, size) + np.bincount(codes, weights=price, minlength=size)
+        self.mileage_sum = self._grow(self.mileage_sum, size) + np.bincount(
+            codes[has_mileage], weights=mileage[has_mileage], minlength=size)
+        self.mileage_count = self._grow(self.mileage_count, size) + np.bincount(
+            codes[has_mileage], minlength=size)
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        if len(array) >= size:
+            return array
+        return np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)])
+
+
+class ListingsAggregator:
+    """Running aggregates over every listing read so far"""
+
+    def __init__(self, path: Optional[str], chunk_rows: int = LISTINGS_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.skipped_rows = 0
+        self.updated_at: Optional[float] = None
+        # Per source: resume byte offset of a CSV file, or -1 once a Parquet file has been read
+        self.sources: Dict[str, int] = {}
+        self.makes = GroupAggregate()
+        self.model_names = GroupAggregate()
+        self.models = GroupAggregate()
+        self.bodies = GroupAggregate()
+        self.fuels = GroupAggregate()
+        self.years = GroupAggregate()
+        self.price_hist = np.zeros(len(PRICE_BIN_LABELS), dtype=np.int64)
+        self.mileage_hist = np.zeros(len(MILEAGE_BIN_LABELS), dtype=np.int64)
+        self.mileage_hist_price_sum = np.zeros(len(MILEAGE_BIN_LABELS), dtype=np.float64)
+        # update() runs in a worker thread while the event loop reads reports
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _source_files(self) -> List[str]:
+        if os.path.isdir(self.path):
+            return sorted(
+                os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.endswith((".csv", ".parquet"))
+            )
+        return [self.path]
+
+    def update(self) -> int:
+        """Fold listings added since the last pass into the aggregates; returns rows added"""
+        started = time.perf_counter()
+        added = 0
+        for path in self._source_files():
+            offset = self.sources.get(path, 0)
+            if path.endswith(".parquet"):
+                if offset < 0:
+                    continue
+                for chunk in iter_parquet_chunks(path, self.chunk_rows):
+                    added += self.add_chunk(chunk)
+                self.sources[path] = -1
+            else:
+                if offset and os.path.getsize(path) < offset:
+                    logger.warning(f"{path} shrank since the last pass; aggregates may double count if it was rewritten")
+                    offset = 0
+                for chunk, end_offset in iter_csv_chunks(path, offset, self.chunk_rows):
+                    added += self.add_chunk(chunk)
+                    self.sources[path] = end_offset
+        if added:
+            self.updated_at = time.time()
+            logger.info(f"Aggregated {added} new listings in {time.perf_counter() - started:.1f}s "
+                        f"({self.rows} total)")
+        return added
+
+    def add_chunk(self, chunk: Chunk) -> int:
+        """Aggregate one columnar chunk; rows without a positive price or a make are skipped"""
+        price = chunk["price"]
+        keep = (price > 0) & (chunk["make_name"] != "")
+        n = int(keep.sum())
+        self.skipped_rows += len(price) - n
+        if not n:
+            return 0
+
+        price = price[keep]
+        mileage = chunk["mileage"][keep] if "mileage" in chunk else np.full(n, np.nan)
+        missing = np.full(n, "", dtype=object)
+
+        def column(name: str) -> np.ndarray:
+            return chunk[name][keep] if name in chunk else missing
+
+        with self._lock:
+            make_codes = self.makes.encode(column("make_name"))
+            self.makes.add(make_codes, price, mileage)
+            # Models are grouped per make: (make code, model name code) packed into one int64
+            model_name_codes = self.model_names.encode(column("model_name"))
+            model_codes = self.models.encode((make_codes << 32) | model_name_codes)
+            self.models.add(model_codes, price, mileage)
+            self.bodies.add(self.bodies.encode(column("body_type")), price, mileage)
+            self.fuels.add(self.fuels.encode(column("fuel_type")), price, mileage)
+            if "year" in chunk:
+                year = chunk["year"][keep]
+                has_year = ~np.isnan(year)
+                self.years.add(self.years.encode(year[has_year].astype(np.int64)),
+                               price[has_year], mileage[has_year])
+
+            self.price_hist += np.bincount(bin_index(price, PRICE_BIN_EDGES), minlength=len(PRICE_BIN_LABELS))
+            has_mileage = ~np.isnan(mileage)
+            mileage_bins = bin_index(mileage[has_mileage], MILEAGE_BIN_EDGES)
+            self.mileage_hist += np.bincount(mileage_bins, minlength=len(MILEAGE_BIN_LABELS))
+            self.mileage_hist_price_sum += np.bincount(mileage_bins, weights=price[has_mileage],
+                                                       minlength=len(MILEAGE_BIN_LABELS))
+            self.rows += n
+        return n
+
+    def report(self) -> Dict[str, Any]:
+        """JSON-serializable aggregates in the shapes the statistics endpoints use"""
+        with self._lock:
+            if not self.rows:
+                return {"rows": 0}
+            model_pairs = [
+                (self.makes.keys[packed >> 32], self.model_names.keys[packed & 0xFFFFFFFF])
+                for packed in self.models.keys
+            ]
+            return {
+                "rows": self.rows,
+                "skipped_rows": self.skipped_rows,
+                "updated_at": self.updated_at,
+                "makes": group_summary(self.makes.keys, self.makes.count, self.makes.price_sum, self.rows, "make"),
+                "models": model_summary(model_pairs, self.models.count, self.models.price_sum),
+                "body_types": group_summary(self.bodies.keys, self.bodies.count, self.bodies.price_sum, self.rows, "type"),
+                "fuel_types": group_summary(self.fuels.keys, self.fuels.count, self.fuels.price_sum, self.rows, "type"),
+                "year_trends": year_summary(self.years.keys, self.years.count, self.years.price_sum,
+                                            self.years.mileage_sum, self.years.mileage_count),
+                **histogram_summary(self.rows, self.price_hist, self.mileage_hist, self.mileage_hist_price_sum)
+            }
+
+
+# Global instance
+listings_aggregator = ListingsAggregator(LISTINGS_PATH)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        sys.exit("usage: python listings_aggregator.py LISTINGS.csv|LISTINGS_DIR")
+    aggregator = ListingsAggregator(sys.argv[1])
+    aggregator.update()
+    report = aggregator.report()
+    print(json.dumps({key: value[:10] if isinstance(value, list) else value for key, value in report.items()}, indent=2))
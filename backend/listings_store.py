@@ -0,0 +1,429 @@
+"""
+Column-oriented on-disk store of the listings dataset, for filtered statistics.
+
+The conversion CLI turns the listings CSV/Parquet files into a directory of
+raw little-endian NumPy column files plus a meta.json:
+
+    price.bin       float32
+    mileage.bin     float32 (NaN when unknown)
+    horsepower.bin  float32 (NaN when unknown)
+    year.bin        int16   (0 when unknown)
+    make.bin        uint16  dictionary codes into meta["dictionaries"]["make"]
+    model.bin       uint32  dictionary codes into meta["dictionaries"]["model"]
+    body.bin        uint16
+    fuel.bin        uint16
+
+Code 0 of every dictionary is the empty string. The columns are opened with
+np.memmap, so a query reads pages straight from the OS page cache: nothing is
+loaded at startup and every worker process shares the same pages. Queries
+scan fixed-size blocks, so their temporaries are bounded by the block size
+whatever the dataset size.
+
+Build a store with:
+    python listings_store.py used_cars_data.csv /data/listings_store
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+from listings_aggregator import (
+    LISTING_COLUMNS, LISTINGS_CHUNK_ROWS, MILEAGE_BIN_EDGES, MILEAGE_BIN_LABELS, PRICE_BIN_EDGES, PRICE_BIN_LABELS,
+    GroupAggregate, bin_index, group_summary, histogram_summary, iter_csv_chunks, iter_parquet_chunks,
+    model_summary, year_summary
+)
+
+logger = logging.getLogger(__name__)
+
+# Directory written by `python listings_store.py SOURCE STORE_DIR`
+LISTINGS_STORE_PATH = os.getenv("LISTINGS_STORE_PATH")
+
+STORE_FORMAT_VERSION = 1
+COLUMN_DTYPES = {
+    "price": "<f4",
+    "mileage": "<f4",
+    "horsepower": "<f4",
+    "year": "<i2",
+    "make": "<u2",
+    "model": "<u4",
+    "body": "<u2",
+    "fuel": "<u2",
+}
+# Dictionary-encoded columns and the listing field each one is built from
+CATEGORY_SOURCES = {"make": "make_name", "model": "model_name", "body": "body_type", "fuel": "fuel_type"}
+# Listing fields read from the source files
+STORE_SOURCE_COLUMNS = LISTING_COLUMNS + ("horsepower",)
+# Rows per query block; bounds the memory a query allocates
+QUERY_BLOCK_ROWS = 1 << 20
+
+
+def build_store(source: str, store_dir: str, chunk_rows: int = LISTINGS_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Convert a listings CSV/Parquet file, or a directory of them, into a
+    column store. Rows are filtered like ListingsAggregator (positive price
+    and a make). The store is written next to store_dir and swapped in once
+    complete, so readers never see a partial store.
+    """
+    if os.path.isdir(source):
+        files = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.endswith((".csv", ".parquet"))
+        )
+    else:
+        files = [source]
+
+    started = time.perf_counter()
+    building = f"{store_dir.rstrip(os.sep)}.building-{os.getpid()}"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    encoders = {name: GroupAggregate() for name in CATEGORY_SOURCES}
+    for encoder in encoders.values():
+        encoder.encode(np.array([""], dtype=object))
+    outputs = {name: open(os.path.join(building, f"{name}.bin"), "wb") for name in COLUMN_DTYPES}
+    rows = 0
+    skipped_rows = 0
+    try:
+        for path in files:
+            if path.endswith(".parquet"):
+                chunks = iter_parquet_chunks(path, chunk_rows, STORE_SOURCE_COLUMNS)
+            else:
+                chunks = _read_whole_csv(path, chunk_rows)
+            for chunk in chunks:
+                price = chunk["price"]
+                keep = (price > 0) & (chunk["make_name"] != "")
+                n = int(keep.sum())
+                skipped_rows += len(price) - n
+                if not n:
+                    continue
+                columns = {
+                    "price": price[keep],
+                    "mileage": chunk["mileage"][keep] if "mileage" in chunk else np.full(n, np.nan),
+                    "horsepower": chunk["horsepower"][keep] if "horsepower" in chunk else np.full(n, np.nan),
+                    "year": np.nan_to_num(chunk["year"][keep], nan=0.0) if "year" in chunk else np.zeros(n),
+                }
+                for name, field in CATEGORY_SOURCES.items():
+                    values = chunk[field][keep] if field in chunk else np.full(n, "", dtype=object)
+                    columns[name] = encoders[name].encode(values)
+                for name, dtype in COLUMN_DTYPES.items():
+                    outputs[name].write(columns[name].astype(dtype).tobytes())
+                rows += n
+    except BaseException:
+        for output in outputs.values():
+            output.close()
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    for output in outputs.values():
+        output.close()
+
+    for name, encoder in encoders.items():
+        if len(encoder.keys) > np.iinfo(np.dtype(COLUMN_DTYPES[name])).max:
+            shutil.rmtree(building)
+            raise ValueError(f"Too many distinct {name} values for a {COLUMN_DTYPES[name]} column")
+    for name, dtype in COLUMN_DTYPES.items():
+        written = os.path.getsize(os.path.join(building, f"{name}.bin")) // np.dtype(dtype).itemsize
+        if written != rows:
+            shutil.rmtree(building)
+            raise ValueError(f"Listings store column {name} has {written} rows, expected {rows}")
+    meta = {
+        "version": STORE_FORMAT_VERSION,
+        "rows": rows,
+        "skipped_rows": skipped_rows,
+        "built_at": time.time(),
+        "sources": files,
+        "columns": COLUMN_DTYPES,
+        "dictionaries": {name: encoder.keys for name, encoder in encoders.items()},
+    }
+    with open(os.path.join(building, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # Swap the new store in; readers still mapping the old files keep their pages
+    previous = f"{store_dir.rstrip(os.sep)}.previous-{os.getpid()}"
+    if os.path.exists(store_dir):
+        os.rename(store_dir, previous)
+    os.rename(building, store_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    logger.info(f"Built listings store {store_dir}: {rows} rows in {time.perf_counter() - started:.1f}s")
+    return meta
+
+
+def _read_whole_csv(path: str, chunk_rows: int) -> Iterator[Dict[str, np.ndarray]]:
+    """Every record of a CSV file, including an unterminated last one; raises if any bytes were left unread"""
+    end_offset = None
+    for chunk, end_offset in iter_csv_chunks(path, 0, chunk_rows, STORE_SOURCE_COLUMNS, final=True):
+        yield chunk
+    size = os.path.getsize(path)
+    if end_offset is not None and end_offset != size:
+        raise ValueError(f"Read {path} only up to byte {end_offset} of {size}")
+
+
+class ListingsStore:
+    """Read-only, memory-mapped view of a column store, reopened when it is rebuilt"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.meta: Optional[Dict[str, Any]] = None
+        self.columns: Dict[str, np.ndarray] = {}
+        self._make_codes: Dict[str, int] = {}
+        self._meta_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def version(self) -> Optional[float]:
+        """Build time of the open store; changes whenever it is rebuilt"""
+        return self.meta["built_at"] if self.meta else None
+
+    def open(self) -> bool:
+        """Map the store's columns, or remap them if the store was rebuilt; returns whether a store is open"""
+        meta_path = os.path.join(self.path, "meta.json")
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return self.meta is not None
+        with self._lock:
+            if mtime == self._meta_mtime:
+                return True
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != STORE_FORMAT_VERSION:
+                logger.error(f"Ignoring listings store {self.path} with format version {meta.get('version')}")
+                return self.meta is not None
+            columns = {}
+            for name, dtype in meta["columns"].items():
+                # np.memmap rejects empty files
+                columns[name] = np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r") \
+                    if meta["rows"] else np.zeros(0, dtype=dtype)
+            self.meta, self.columns, self._meta_mtime = meta, columns, mtime
+            self._make_codes = {make.lower(): code for code, make in enumerate(meta["dictionaries"]["make"])}
+            logger.info(f"Opened listings store {self.path} ({meta['rows']} rows)")
+            return True
+
+    def query(self, make: Optional[str] = None, year_min: Optional[int] = None,
+              year_max: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Aggregates over the listings matching the filters, in the same shape
+        as ListingsAggregator.report(). The make filter is case-insensitive.
+        Rows without a year are excluded as soon as a year bound is given.
+        """
+        if not self.open():
+            return {"rows": 0}
+        meta, columns = self.meta, self.columns
+        make_code = None
+        if make is not None:
+            make_code = self._make_codes.get(make.strip().lower())
+            if not make_code:
+                return {"rows": 0}
+
+        dictionaries = meta["dictionaries"]
+        n_makes, n_models = len(dictionaries["make"]), len(dictionaries["model"])
+        n_bodies, n_fuels = len(dictionaries["body"]), len(dictionaries["fuel"])
+        year_low, year_high = 1900, 2100
+        n_years = year_high - year_low + 1
+        totals = {
+            "make": np.zeros((2, n_makes)),
+            "model": np.zeros((2, n_makes * n_models)),
+            "body": np.zeros((2, n_bodies)),
+            "fuel": np.zeros((2, n_fuels)),
+            # count, price sum, mileage sum, mileage count
+            "year": np.zeros((4, n_years)),
+        }
+        price_hist = np.zeros(len(PRICE_BIN_LABELS), dtype=np.int64)
+        mileage_hist = np.zeros(len(MILEAGE_BIN_LABELS), dtype=np.int64)
+        mileage_hist_price_sum = np.zeros(len(MILEAGE_BIN_LABELS))
+        rows = 0
+
+        for start in range(0, meta["rows"], QUERY_BLOCK_ROWS):
+            block = slice(start, start + QUERY_BLOCK_ROWS)
+            year = columns["year"][block]
+            mask = None
+            if make_code is not None:
+                mask = columns["make"][block] == make_code
+            if year_min is not None or year_max is not None:
+                in_range = (year >= (year_min if year_min is not None else year_low)) & \
+                           (year <= (year_max if year_max is not None else year_high))
+                mask = in_range if mask is None else mask & in_range
+
+            def column(name: str) -> np.ndarray:
+                values = columns[name][block]
+                return values if mask is None else values[mask]
+
+            price = column("price").astype(np.float64)
+            if not len(price):
+                continue
+            rows += len(price)
+            mileage = column("mileage").astype(np.float64)
+            makes = column("make").astype(np.int64)
+            for name, codes, size in (
+                ("make", makes, n_makes),
+                ("model", makes * n_models + column("model"), n_makes * n_models),
+                ("body", column("body"), n_bodies),
+                ("fuel", column("fuel"), n_fuels),
+            ):
+                totals[name][0] += np.bincount(codes, minlength=size)
+                totals[name][1] += np.bincount(codes, weights=price, minlength=size)
+
+            years = column("year").astype(np.int64)
+            has_year = (years >= year_low) & (years <= year_high)
+            year_codes = years[has_year] - year_low
+            year_mileage = mileage[has_year]
+            has_mileage = ~np.isnan(year_mileage)
+            totals["year"][0] += np.bincount(year_codes, minlength=n_years)
+            totals["year"][1] += np.bincount(year_codes, weights=price[has_year], minlength=n_years)
+            totals["year"][2] += np.bincount(year_codes[has_mileage], weights=year_mileage[has_mileage],
+                                             minlength=n_years)
+            totals["year"][3] += np.bincount(year_codes[has_mileage], minlength=n_years)
+
+            price_hist += np.bincount(bin_index(price, PRICE_BIN_EDGES), minlength=len(PRICE_BIN_LABELS))
+            has_mileage = ~np.isnan(mileage)
+            mileage_bins = bin_index(mileage[has_mileage], MILEAGE_BIN_EDGES)
+            mileage_hist += np.bincount(mileage_bins, minlength=len(MILEAGE_BIN_LABELS))
+            mileage_hist_price_sum += np.bincount(mileage_bins, weights=price[has_mileage],
+                                                  minlength=len(MILEAGE_BIN_LABELS))
+
+        if not rows:
+            return {"rows": 0}
+        make_names, model_names = dictionaries["make"], dictionaries["model"]
+        model_pairs = _ModelPairs(make_names, model_names)
+        return {
+            "rows": rows,
+            "skipped_rows": meta["skipped_rows"],
+            "updated_at": meta["built_at"],
+            "makes": group_summary(make_names, *totals["make"], rows, "make"),
+            "models": model_summary(model_pairs, *totals["model"]),
+            "body_types": group_summary(dictionaries["body"], *totals["body"], rows, "type"),
+            "fuel_types": group_summary(dictionaries["fuel"], *totals["fuel"], rows, "type"),
+            "year_trends": year_summary(range(year_low, year_high + 1), *totals["year"]),
+            **histogram_summary(rows, price_hist, mileage_hist, mileage_hist_price_sum)
+        }
+
+
+class _ModelPairs:
+    """(make, model) name of a packed make * n_models + model code, without materializing every pair"""
+
+    def __init__(self, make_names: list, model_names: list):
+        self.make_names = make_names
+        self.model_names = model_names
+
+    def __getitem__(self, code: int) -> tuple:
+        make_code, model_code = divmod(int(code), len(self.model_names))
+        return self.make_names[make_code], self.model_names[model_code]
+
+
+def save_arrays(path: str, **arrays: Any) -> None:
+    """Atomically write arrays as an .npz file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".artifact-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class StoreArtifact:
+    """
+    Structure derived from the store (e.g. the statistics cube), built once
+    per store version and saved as a file inside the store directory, so
+    other workers and restarts load it instead of rebuilding it
+    """
+
+    def __init__(self, store: ListingsStore, filename: str,
+                 build: Callable[[ListingsStore], Any], load: Callable[[str, ListingsStore], Optional[Any]]):
+        self.store = store
+        self.filename = filename
+        self._build = build
+        self._load = load
+        self.artifact: Any = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.store.enabled
+
+    def current(self) -> Optional[Any]:
+        """The artifact of the current store version (blocking: may build it); None without a store"""
+        if not self.enabled or not self.store.open() or not self.store.meta["rows"]:
+            return None
+        with self._lock:
+            if self.artifact is not None and self.artifact.version == self.store.version:
+                return self.artifact
+            path = os.path.join(self.store.path, self.filename)
+            artifact = self._load(path, self.store)
+            if artifact is None:
+                with _exclusive(f"{path}.lock"):
+                    # Another worker may have built it while we waited for the lock
+                    artifact = self._load(path, self.store)
+                    if artifact is None:
+                        artifact = self._build(self.store)
+                        try:
+                            artifact.save(path)
+                        except OSError as e:
+                            logger.warning(f"Could not save {path}: {str(e)}")
+            self.artifact = artifact
+            return artifact
+
+    def build_in_background(self) -> None:
+        """Load or build the artifact of the open store version in a worker thread, without blocking the caller"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._build_in_thread())
+
+    async def _build_in_thread(self) -> None:
+        try:
+            await asyncio.to_thread(self.current)
+        except Exception as e:
+            logger.error(f"Failed to build {self.filename}: {str(e)}")
+
+    def ready(self) -> Optional[Any]:
+        """The artifact if it is already built for the open store version; never blocks"""
+        artifact = self.artifact
+        if artifact is None or artifact.version != self.store.version:
+            return None
+        return artifact
+
+    @property
+    def pending(self) -> bool:
+        """An open store has listings but its artifact is not built or loaded yet"""
+        meta = self.store.meta
+        return self.enabled and meta is not None and meta["rows"] > 0 and self.ready() is None
+
+
+@contextmanager
+def _exclusive(lock_path: str) -> Iterator[None]:
+    """Cross-process lock, so one worker builds an artifact while the others wait and load it"""
+    try:
+        lock_file = open(lock_path, "a")
+    except OSError:
+        # Read-only store directory: the artifact cannot be saved for the others anyway
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# Global instance
+listings_store = ListingsStore(LISTINGS_STORE_PATH)
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        sys.exit("usage: python listings_store.py LISTINGS.csv|LISTINGS_DIR STORE_DIR")
+    built = build_store(sys.argv[1], sys.argv[2])
+    print(json.dumps({key: value for key, value in built.items() if key != "dictionaries"}, indent=2))
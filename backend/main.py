@@ -1,14 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationError, validator
 from typing import Optional, List, Dict, Any
-# Removed pandas, numpy, and CatBoost dependencies - using mock predictions
 import logging
 from datetime import datetime
+import asyncio
 import os
-import random
+import time
+import csv
+import json
 import httpx
-from data_service import get_live_statistics, live_data_service
+from data_service import live_data_service
+from data_refresher import DATA_REFRESH_ENABLED, data_refresher
+from prediction_service import predictor, timed_predict
+from prediction_cache import prediction_cache
+from prediction_intervals import interval_table
+from vin_service import vin_decoder
+from statistics_service import statistics_store
+from catalog_index import catalog_store
+from listings_store import listings_store
+from statistics_cube import DIMENSIONS, cube_store
+from price_sketches import sketch_store
+from comparables_index import comparables_store
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,61 +43,62 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Global model variable
-model = None
-
-# Mock prediction service (no actual ML model)
-def generate_mock_prediction(make: str, model_name: str, year: int, mileage: int, **kwargs) -> float:
+# Outermost, so CORS handling and errors are measured too
+app.add_middleware(MetricsMiddleware)
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "500"))
+MAX_VIN_BATCH_SIZE = int(os.getenv("MAX_VIN_BATCH_SIZE", "1000"))
+# A CSV upload record with an open quote stops absorbing lines past this size
+MAX_CSV_RECORD_CHARS = 65536
+# Longest single upload line buffered while waiting for its newline; longer uploads get a 413
+MAX_UPLOAD_LINE_BYTES = MAX_CSV_RECORD_CHARS
+
+def build_confidence_interval(predicted_price: float, make_name: str) -> dict:
     """
-    Generate realistic mock car price predictions based on basic logic
-    This replaces the CatBoost model with a simple estimation algorithm
+    Conformal interval from the calibrated table (PREDICTION_INTERVALS_PATH),
+    or ±15% when no table is configured
     """
-    # Base prices by make (rough estimates)
-    base_prices = {
-        "Toyota": 25000, "Honda": 24000, "Ford": 28000, "Chevrolet": 26000,
-        "BMW": 45000, "Mercedes-Benz": 50000, "Audi": 42000, "Lexus": 40000,
-        "Nissan": 23000, "Hyundai": 22000, "Kia": 21000, "Mazda": 24000,
-        "Subaru": 26000, "Volkswagen": 27000, "Acura": 35000, "Infiniti": 38000,
-        "Cadillac": 48000, "Lincoln": 45000, "Porsche": 75000, "Jaguar": 55000,
-        "Land Rover": 60000, "Volvo": 40000, "Tesla": 55000, "Genesis": 45000
+    if interval_table is not None:
+        return interval_table.interval(make_name, predicted_price)
+    confidence_margin = predicted_price * 0.15
+    return {
+        "lower": float(max(1000, predicted_price - confidence_margin)),
+        "upper": float(predicted_price + confidence_margin),
+        "confidence_level": 0.68  # Approximately 1 standard deviation
     }
 
-    # Get base price for make
-    base_price = base_prices.get(make, 25000)
-
-    # Adjust for year (depreciation)
-    current_year = 2024
-    age = current_year - year
-    depreciation_factor = max(0.3, 1 - (age * 0.08))  # 8% per year, minimum 30% of original
-
-    # Adjust for mileage
-    mileage_factor = max(0.4, 1 - (mileage / 200000))  # Depreciate based on mileage
-
-    # Calculate estimated price
-    estimated_price = base_price * depreciation_factor * mileage_factor
-
-    # Add some randomness for realism (±10%)
-    import random
-    random_factor = random.uniform(0.9, 1.1)
-    estimated_price *= random_factor
-
-    # Ensure minimum price
-    estimated_price = max(estimated_price, 3000)
-
-    return round(estimated_price, 2)
-
 # Application startup
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up CarInsight Pro API...")
-    logger.info("Mock prediction service initialized")
+    try:
+        predictor.load()
+        predictor.warmup()
+    except Exception as e:
+        logger.error(f"Failed to load {predictor.name} predictor: {str(e)}")
+        raise
+    logger.info(f"Prediction service initialized ({predictor.name})")
+    # Serve the last persisted NHTSA data immediately, even without network
+    live_data_service.load_persisted()
+    await statistics_store.seed()
+    statistics_store.refresh_in_background()
+    # Rebuild the statistics snapshot whenever the refresher renews its inputs
+    data_refresher.add_listener(statistics_store.refresh)
+    data_refresher.add_listener(catalog_store.refresh)
+    catalog_store.refresh_in_background()
+    if comparables_store.enabled:
+        comparables_store.build_in_background()
+    if DATA_REFRESH_ENABLED:
+        data_refresher.start()
     logger.info("API startup completed successfully")
 
 # Cleanup on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
+    await data_refresher.stop()
     await live_data_service.close()
+    await vin_decoder.close()
 
 class CarPredictionRequest(BaseModel):
     # Basic car information
@@ -137,6 +153,24 @@ class CarPredictionResponse(BaseModel):
     confidence_interval: dict = Field(..., description="Price range estimate")
     model_info: dict = Field(..., description="Model performance metrics")
 
+class BatchPredictionRequest(BaseModel):
+    vehicles: List[Any] = Field(..., description="Vehicles to price, each matching the /predict request schema")
+
+class BatchPredictionResult(BaseModel):
+    index: int = Field(..., description="Position of the vehicle in the request")
+    success: bool = Field(..., description="Whether the vehicle was priced")
+    predicted_price: Optional[float] = Field(None, description="Predicted car price in USD")
+    confidence_interval: Optional[dict] = Field(None, description="Price range estimate")
+    errors: Optional[List[dict]] = Field(None, description="Validation errors for this vehicle")
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchPredictionResult] = Field(..., description="Per-vehicle results in request order")
+    total: int = Field(..., description="Number of vehicles received")
+    succeeded: int = Field(..., description="Number of vehicles priced")
+    failed: int = Field(..., description="Number of vehicles rejected by validation")
+    latency_ms: float = Field(..., description="Model scoring time per vehicle in milliseconds")
+    model_info: dict = Field(..., description="Model performance metrics")
+
 class VinLookupRequest(BaseModel):
     vin: str = Field(..., description="17-character VIN number", min_length=17, max_length=17)
 
@@ -152,6 +186,12 @@ class VinLookupResponse(BaseModel):
     engine_cylinders: Optional[str] = Field(None, description="Number of cylinders")
     success: bool = Field(..., description="Whether VIN lookup was successful")
     message: str = Field(..., description="Status message")
+
+class VinBatchLookupRequest(BaseModel):
+    vins: List[str] = Field(..., description="17-character VIN numbers")
+
+class VinBatchLookupResponse(BaseModel):
+    results: List[VinLookupResponse] = Field(..., description="Per-VIN results in request order")
     
 # Removed get_season function - no longer needed
 
@@ -159,60 +199,327 @@ class VinLookupResponse(BaseModel):
 
 @app.get("/")
 async def root():
-    return {"message": "CarInsight Pro API", "status": "running", "service": "mock_predictions"}
+    return {"message": "CarInsight Pro API", "status": "running", "service": predictor.name}
 
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
-        "service": "mock_predictions",
+        "service": predictor.name,
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Request, NHTSA and data_cache metrics of this worker in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.post("/predict", response_model=CarPredictionResponse)
-async def predict_car_price(request: CarPredictionRequest):
+async def predict_car_price(request: CarPredictionRequest, response: Response):
     """
-    Predict car price using mock estimation algorithm
+    Predict car price using the configured predictor
     """
 
     try:
-        # Generate mock prediction using simple algorithm
-        predicted_price = generate_mock_prediction(
-            make=request.make_name,
-            model_name=request.model_name,
-            year=request.year,
-            mileage=request.mileage,
-            horsepower=request.horsepower,
-            engine_displacement=request.engine_displacement
+        cache_key = prediction_cache.key_for(request)
+        predicted_price = prediction_cache.get(cache_key)
+        if predicted_price is None:
+            prices, latency_ms = timed_predict(predictor, [request])
+            predicted_price = float(prices[0])
+            prediction_cache.set(cache_key, predicted_price)
+            response.headers["Server-Timing"] = f"predict;dur={latency_ms:.3f}"
+        else:
+            latency_ms = 0.0
+            response.headers["Server-Timing"] = 'cache;desc="hit"'
+
+        result = CarPredictionResponse(
+            predicted_price=predicted_price,
+            confidence_interval=build_confidence_interval(predicted_price, request.make_name),
+            model_info=predictor.model_info
         )
 
-        # Calculate confidence interval (±15% for mock predictions)
-        confidence_margin = predicted_price * 0.15
-        confidence_lower = max(1000, predicted_price - confidence_margin)
-        confidence_upper = predicted_price + confidence_margin
-
-        response = CarPredictionResponse(
-            predicted_price=float(predicted_price),
-            confidence_interval={
-                "lower": float(confidence_lower),
-                "upper": float(confidence_upper),
-                "confidence_level": 0.68  # Approximately 1 standard deviation
-            },
-            model_info={
-                "model_type": "Mock Prediction Service",
-                "algorithm": "Rule-based estimation",
-                "accuracy": "Demonstration purposes",
-                "note": "Replace with actual ML model for production"
-            }
-        )
-
-        logger.info(f"Prediction made: ${predicted_price:.2f} for {request.year} {request.make_name} {request.model_name}")
-        return response
+        logger.info(f"Prediction made: ${predicted_price:.2f} for {request.year} {request.make_name} {request.model_name} in {latency_ms:.3f}ms")
+        return result
 
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/comparables")
+async def find_comparables(request: CarPredictionRequest, limit: int = Query(10, ge=1, le=100)):
+    """
+    The listings most similar to the vehicle (same make; nearest year,
+    mileage, horsepower and model tier) with their asking prices
+    """
+    if not comparables_store.enabled:
+        raise HTTPException(status_code=503, detail="Comparables require the listings store (LISTINGS_STORE_PATH)")
+    try:
+        # Pick up a rebuilt store; its index is built in the background
+        await asyncio.to_thread(listings_store.open)
+        index = comparables_store.ready()
+        if index is None:
+            comparables_store.build_in_background()
+            # The previous version's index keeps its own columns, so it can answer meanwhile
+            index = comparables_store.artifact
+        if index is None:
+            raise HTTPException(status_code=503, detail="Comparables index is not built yet",
+                                headers={"Retry-After": "5"})
+        started = time.perf_counter()
+        result = await asyncio.to_thread(
+            index.search, request.make_name, request.model_name, request.year,
+            request.mileage, request.horsepower, limit
+        )
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"No listings of make {request.make_name} to compare against")
+        return {**result, "query_ms": round((time.perf_counter() - started) * 1000, 3)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding comparables: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to find comparable listings")
+
+def validate_prediction_rows(rows: List[Any]):
+    """
+    Validate raw rows against CarPredictionRequest.
+    Rows that failed to parse upstream are passed in as exceptions.
+    Returns (valid requests with their positions, {position: errors}).
+    """
+    valid = []
+    errors = {}
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            errors[index] = [{"loc": [], "msg": str(row), "type": "parse_error"}]
+            continue
+        try:
+            valid.append((index, CarPredictionRequest.model_validate(row)))
+        except ValidationError as e:
+            errors[index] = [
+                {"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]}
+                for err in e.errors()
+            ]
+    return valid, errors
+
+def score_prediction_rows(rows: List[Any], start_index: int = 0):
+    """
+    Validate and price a chunk of raw rows in one vectorized pass.
+    Returns (results in input order numbered from start_index, scoring latency per row in ms).
+    """
+    valid, errors = validate_prediction_rows(rows)
+
+    prices, latency_ms = timed_predict(predictor, [req for _, req in valid])
+
+    results = [
+        BatchPredictionResult(index=start_index + index, success=False, errors=row_errors)
+        for index, row_errors in errors.items()
+    ]
+    for (index, req), price in zip(valid, prices.tolist()):
+        results.append(BatchPredictionResult(
+            index=start_index + index,
+            success=True,
+            predicted_price=price,
+            confidence_interval=build_confidence_interval(price, req.make_name)
+        ))
+    results.sort(key=lambda result: result.index)
+    return results, latency_ms
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_car_prices_batch(request: BatchPredictionRequest, response: Response):
+    """
+    Predict prices for many vehicles in one call.
+    Invalid vehicles are reported per row and do not fail the batch.
+    """
+    if len(request.vehicles) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {MAX_BATCH_SIZE} vehicles")
+
+    try:
+        # Up to MAX_BATCH_SIZE rows are validated and scored off the event loop
+        results, latency_ms = await asyncio.to_thread(score_prediction_rows, request.vehicles)
+        succeeded = sum(1 for result in results if result.success)
+        response.headers["Server-Timing"] = f"predict;dur={latency_ms:.3f}"
+
+        logger.info(f"Batch prediction made: {succeeded} priced, {len(results) - succeeded} rejected, {latency_ms:.3f}ms per vehicle")
+        return BatchPredictionResponse(
+            results=results,
+            total=len(results),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            latency_ms=latency_ms,
+            model_info=predictor.model_info
+        )
+
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints that read the request body while streaming.
+    The stock response listens for disconnects on receive(), which would steal
+    body chunks from request.stream(); here the body iterator owns receive()
+    and a disconnect surfaces as ClientDisconnect from the upload stream.
+
+    The status line is held back until the first body chunk, so an
+    HTTPException raised before any result was produced becomes a plain
+    error response. Once results have been sent, the stream ends with an
+    {"error", "status_code"} line instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+    async def stream_response(self, send) -> None:
+        started = False
+        try:
+            async for chunk in self.body_iterator:
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode(self.charset)
+                if not started:
+                    await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+                    started = True
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        except HTTPException as e:
+            if not started:
+                error = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+                await send({"type": "http.response.start", "status": error.status_code, "headers": error.raw_headers})
+                await send({"type": "http.response.body", "body": error.body})
+                return
+            line = json.dumps({"error": e.detail, "status_code": e.status_code}) + "\n"
+            await send({"type": "http.response.body", "body": line.encode(), "more_body": True})
+        if not started:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def upload_line_too_long() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload line exceeds {MAX_UPLOAD_LINE_BYTES} bytes")
+
+async def iter_upload_lines(request: Request):
+    """
+    Yield the request body line by line as it arrives, without buffering the
+    whole upload. A line longer than MAX_UPLOAD_LINE_BYTES fails the upload with a 413.
+    """
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if len(line) > MAX_UPLOAD_LINE_BYTES:
+                raise upload_line_too_long()
+            yield line
+        if len(pending) > MAX_UPLOAD_LINE_BYTES:
+            raise upload_line_too_long()
+    if pending:
+        yield pending
+
+async def iter_upload_rows(request: Request, upload_format: str):
+    """
+    Parse NDJSON lines or CSV records into raw row dicts; unparseable ones are
+    yielded as exceptions. A CSV record continues on the next line while it has
+    an open quote, so quoted fields may contain newlines.
+    """
+    header = None
+    pending = None
+    async for line in iter_upload_lines(request):
+        text = line.decode("utf-8", errors="replace")
+        if upload_format == "csv":
+            pending = text if pending is None else f"{pending}\n{text}"
+            if pending.count('"') % 2:
+                if len(pending) <= MAX_CSV_RECORD_CHARS:
+                    continue
+                yield ValueError(f"Unterminated quoted field in a record longer than {MAX_CSV_RECORD_CHARS} characters")
+                pending = None
+                continue
+            text, pending = pending.strip(), None
+        else:
+            text = text.strip()
+        if not text:
+            continue
+        if upload_format == "csv":
+            values = next(csv.reader([text]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield ValueError(f"Expected {len(header)} columns, got {len(values)}")
+                continue
+            # Empty CSV cells are treated as missing optional fields
+            yield {name: value for name, value in zip(header, values) if value != ""}
+        else:
+            try:
+                yield json.loads(text)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON: {e.msg}")
+    if pending is not None and pending.strip():
+        yield ValueError("Unterminated quoted field at the end of the upload")
+
+@app.post("/predict/stream")
+async def predict_car_prices_stream(request: Request, format: Optional[str] = None):
+    """
+    Price an NDJSON or CSV inventory upload incrementally.
+    Rows are validated and scored in chunks and results are streamed back as NDJSON
+    while the upload is still arriving, so memory stays flat regardless of file size.
+    """
+    upload_format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if upload_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    async def stream_results():
+        chunk = []
+        start_index = 0
+        async for row in iter_upload_rows(request, upload_format):
+            chunk.append(row)
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                results, _ = await asyncio.to_thread(score_prediction_rows, chunk, start_index)
+                for result in results:
+                    yield result.model_dump_json() + "\n"
+                start_index += len(chunk)
+                chunk = []
+        if chunk:
+            results, _ = await asyncio.to_thread(score_prediction_rows, chunk, start_index)
+            for result in results:
+                yield result.model_dump_json() + "\n"
+        logger.info(f"Streamed predictions for {start_index + len(chunk)} rows")
+
+    return UploadStreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def build_vin_response(vin: str, vin_data: Dict[str, Any]) -> VinLookupResponse:
+    """Build the lookup response for decoded VIN fields"""
+    # Check if we got essential information
+    if not vin_data.get('make_name') or not vin_data.get('model_name'):
+        return VinLookupResponse(
+            vin=vin,
+            make_name=vin_data.get('make_name', 'Unknown'),
+            model_name=vin_data.get('model_name', 'Unknown'),
+            year=vin_data.get('year', 2020),
+            body_type=vin_data.get('body_type'),
+            fuel_type=vin_data.get('fuel_type'),
+            transmission=vin_data.get('transmission'),
+            engine_displacement=vin_data.get('engine_displacement'),
+            engine_cylinders=vin_data.get('engine_cylinders'),
+            success=False,
+            message="VIN decoded but essential information missing. Please verify VIN and enter details manually."
+        )
+
+    return VinLookupResponse(
+        vin=vin,
+        make_name=vin_data['make_name'],
+        model_name=vin_data['model_name'],
+        year=vin_data.get('year', 2020),
+        body_type=vin_data.get('body_type'),
+        fuel_type=vin_data.get('fuel_type'),
+        transmission=vin_data.get('transmission'),
+        engine_displacement=vin_data.get('engine_displacement'),
+        engine_cylinders=vin_data.get('engine_cylinders'),
+        success=True,
+        message="VIN decoded successfully"
+    )
+
+def failed_vin_response(vin: str, message: str) -> VinLookupResponse:
+    """Lookup response for a VIN that could not be decoded"""
+    return VinLookupResponse(vin=vin, make_name="Unknown", model_name="Unknown", year=2020,
+                             success=False, message=message)
+
 @app.post("/vin/lookup", response_model=VinLookupResponse)
 async def lookup_vin(request: VinLookupRequest):
     """
@@ -221,79 +528,18 @@ async def lookup_vin(request: VinLookupRequest):
     try:
         vin = request.vin.upper().strip()
 
-        # Validate VIN format (basic check)
-        if len(vin) != 17:
-            raise HTTPException(status_code=400, detail="VIN must be exactly 17 characters")
-
-        # Use NHTSA VIN decoder API
-        async with httpx.AsyncClient() as client:
-            url = f"https://vpic.nhtsa.dot.gov/api/vehicles/decodevin/{vin}?format=json"
-            response = await client.get(url, timeout=10.0)
-            response.raise_for_status()
+        # Validate VIN format and check digit before any lookup
+        error = vin_decoder.validate(vin)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
-            data = response.json()
-            results = data.get('Results', [])
+        # Decode from the VIN cache, the local index or the shared NHTSA client
+        vin_data = await vin_decoder.decode(vin)
 
-            # Extract relevant information
-            vin_data = {}
-            for result in results:
-                variable = result.get('Variable', '')
-                value = result.get('Value', '')
-
-                if value and value != 'Not Applicable' and value != '':
-                    if variable == 'Make':
-                        vin_data['make_name'] = value
-                    elif variable == 'Model':
-                        vin_data['model_name'] = value
-                    elif variable == 'Model Year':
-                        try:
-                            vin_data['year'] = int(value)
-                        except (ValueError, TypeError):
-                            pass
-                    elif variable == 'Body Class':
-                        vin_data['body_type'] = value
-                    elif variable == 'Fuel Type - Primary':
-                        vin_data['fuel_type'] = value
-                    elif variable == 'Transmission Style':
-                        vin_data['transmission'] = value
-                    elif variable == 'Displacement (L)':
-                        try:
-                            vin_data['engine_displacement'] = float(value)
-                        except (ValueError, TypeError):
-                            pass
-                    elif variable == 'Engine Number of Cylinders':
-                        vin_data['engine_cylinders'] = value
-
-            # Check if we got essential information
-            if not vin_data.get('make_name') or not vin_data.get('model_name'):
-                return VinLookupResponse(
-                    vin=vin,
-                    make_name=vin_data.get('make_name', 'Unknown'),
-                    model_name=vin_data.get('model_name', 'Unknown'),
-                    year=vin_data.get('year', 2020),
-                    body_type=vin_data.get('body_type'),
-                    fuel_type=vin_data.get('fuel_type'),
-                    transmission=vin_data.get('transmission'),
-                    engine_displacement=vin_data.get('engine_displacement'),
-                    engine_cylinders=vin_data.get('engine_cylinders'),
-                    success=False,
-                    message="VIN decoded but essential information missing. Please verify VIN and enter details manually."
-                )
-
-            return VinLookupResponse(
-                vin=vin,
-                make_name=vin_data['make_name'],
-                model_name=vin_data['model_name'],
-                year=vin_data.get('year', 2020),
-                body_type=vin_data.get('body_type'),
-                fuel_type=vin_data.get('fuel_type'),
-                transmission=vin_data.get('transmission'),
-                engine_displacement=vin_data.get('engine_displacement'),
-                engine_cylinders=vin_data.get('engine_cylinders'),
-                success=True,
-                message="VIN decoded successfully"
-            )
+        return build_vin_response(vin, vin_data)
 
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         logger.error(f"VIN lookup timeout for VIN: {vin}")
         raise HTTPException(status_code=408, detail="VIN lookup service timeout. Please try again.")
@@ -304,300 +550,312 @@ async def lookup_vin(request: VinLookupRequest):
         logger.error(f"VIN lookup error for VIN {vin}: {str(e)}")
         raise HTTPException(status_code=500, detail="VIN lookup failed. Please verify VIN and try again.")
 
+@app.post("/vin/lookup/batch", response_model=VinBatchLookupResponse)
+async def lookup_vin_batch(request: VinBatchLookupRequest):
+    """
+    Lookup many VINs at once using the NHTSA batch decoder.
+    Repeated and previously decoded VINs are answered from the VIN cache.
+    """
+    if len(request.vins) > MAX_VIN_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {MAX_VIN_BATCH_SIZE} VINs")
+
+    try:
+        vins = [vin.upper().strip() for vin in request.vins]
+        errors = {vin: vin_decoder.validate(vin) for vin in vins}
+        decoded = await vin_decoder.decode_batch([vin for vin in vins if not errors[vin]])
+
+        results = []
+        for vin in vins:
+            vin_data = decoded.get(vin)
+            if errors[vin]:
+                results.append(failed_vin_response(vin, errors[vin]))
+            elif isinstance(vin_data, httpx.TimeoutException):
+                results.append(failed_vin_response(vin, "VIN lookup service timeout. Please try again."))
+            elif isinstance(vin_data, Exception):
+                results.append(failed_vin_response(vin, "VIN lookup service unavailable. Please try again later."))
+            else:
+                results.append(build_vin_response(vin, vin_data or {}))
+
+        logger.info(f"Batch VIN lookup: {sum(r.success for r in results)}/{len(results)} decoded")
+        return VinBatchLookupResponse(results=results)
+
+    except Exception as e:
+        logger.error(f"Batch VIN lookup error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Batch VIN lookup failed. Please try again.")
+
 @app.get("/models/info")
 async def get_model_info():
     """
     Get information about the prediction service
     """
-    return {
-        "model_type": "Mock Prediction Service",
-        "algorithm": "Rule-based estimation",
-        "features": [
-            "Make-based pricing",
-            "Year depreciation",
-            "Mileage adjustment",
-            "Random variation"
-        ],
-        "note": "This is a demonstration service. Replace with actual ML model for production use.",
-        "supported_makes": list(generate_mock_prediction.__code__.co_consts[1].keys()) if hasattr(generate_mock_prediction, '__code__') else ["Toyota", "Honda", "Ford", "BMW", "Mercedes-Benz"],
-        "status": "active"
-    }
-
-# Sample car statistics data based on real market trends
-def get_sample_car_statistics():
-    """Generate realistic car market statistics"""
-    return {
-        "popular_makes": [
-            {"make": "Toyota", "count": 245678, "avg_price": 18500, "percentage": 12.3},
-            {"make": "Honda", "count": 198432, "avg_price": 17800, "percentage": 9.9},
-            {"make": "Ford", "count": 187654, "avg_price": 16200, "percentage": 9.4},
-            {"make": "Chevrolet", "count": 176543, "avg_price": 15800, "percentage": 8.8},
-            {"make": "Nissan", "count": 154321, "avg_price": 16500, "percentage": 7.7},
-            {"make": "BMW", "count": 98765, "avg_price": 28900, "percentage": 4.9},
-            {"make": "Mercedes-Benz", "count": 87654, "avg_price": 32100, "percentage": 4.4},
-            {"make": "Hyundai", "count": 134567, "avg_price": 14200, "percentage": 6.7},
-            {"make": "Volkswagen", "count": 76543, "avg_price": 19800, "percentage": 3.8},
-            {"make": "Audi", "count": 65432, "avg_price": 31500, "percentage": 3.3}
-        ],
-        "popular_models": [
-            {"model": "Camry", "make": "Toyota", "count": 45678, "avg_price": 19500},
-            {"model": "Civic", "make": "Honda", "count": 43210, "avg_price": 18200},
-            {"model": "Accord", "make": "Honda", "count": 38765, "avg_price": 20100},
-            {"model": "Corolla", "make": "Toyota", "count": 36543, "avg_price": 16800},
-            {"model": "F-150", "make": "Ford", "count": 34567, "avg_price": 28900},
-            {"model": "Altima", "make": "Nissan", "count": 32109, "avg_price": 17200},
-            {"model": "Malibu", "make": "Chevrolet", "count": 29876, "avg_price": 16500},
-            {"model": "Elantra", "make": "Hyundai", "count": 28543, "avg_price": 14800},
-            {"model": "Silverado", "make": "Chevrolet", "count": 27654, "avg_price": 32100},
-            {"model": "RAV4", "make": "Toyota", "count": 26789, "avg_price": 24500}
-        ],
-        "body_types": [
-            {"type": "Sedan", "count": 567890, "percentage": 28.4, "avg_price": 18200},
-            {"type": "SUV / Crossover", "count": 498765, "percentage": 24.9, "avg_price": 23800},
-            {"type": "Pickup Truck", "count": 234567, "percentage": 11.7, "avg_price": 28900},
-            {"type": "Coupe", "count": 187654, "percentage": 9.4, "avg_price": 22100},
-            {"type": "Hatchback", "count": 156789, "percentage": 7.8, "avg_price": 16500},
-            {"type": "Wagon", "count": 98765, "percentage": 4.9, "avg_price": 19800},
-            {"type": "Minivan", "count": 87654, "percentage": 4.4, "avg_price": 21200},
-            {"type": "Van", "count": 45678, "percentage": 2.3, "avg_price": 25600}
-        ],
-        "fuel_types": [
-            {"type": "Gasoline", "count": 1654321, "percentage": 82.7, "avg_price": 19200},
-            {"type": "Hybrid", "count": 198765, "percentage": 9.9, "avg_price": 22800},
-            {"type": "Electric", "count": 87654, "percentage": 4.4, "avg_price": 28900},
-            {"type": "Diesel", "count": 45678, "percentage": 2.3, "avg_price": 24100},
-            {"type": "Flex Fuel Vehicle", "count": 12345, "percentage": 0.6, "avg_price": 18500},
-            {"type": "Compressed Natural Gas", "count": 2345, "percentage": 0.1, "avg_price": 21000}
-        ],
-        "year_trends": [
-            {"year": 2020, "count": 234567, "avg_price": 24500, "avg_mileage": 35000},
-            {"year": 2019, "count": 298765, "avg_price": 22800, "avg_mileage": 45000},
-            {"year": 2018, "count": 345678, "avg_price": 21200, "avg_mileage": 55000},
-            {"year": 2017, "count": 387654, "avg_price": 19600, "avg_mileage": 65000},
-            {"year": 2016, "count": 398765, "avg_price": 18100, "avg_mileage": 75000},
-            {"year": 2015, "count": 376543, "avg_price": 16800, "avg_mileage": 85000},
-            {"year": 2014, "count": 345678, "avg_price": 15500, "avg_mileage": 95000},
-            {"year": 2013, "count": 298765, "avg_price": 14200, "avg_mileage": 105000},
-            {"year": 2012, "count": 234567, "avg_price": 13100, "avg_mileage": 115000},
-            {"year": 2011, "count": 187654, "avg_price": 12000, "avg_mileage": 125000}
-        ],
-        "price_ranges": [
-            {"range": "$1,000 - $5,000", "count": 234567, "percentage": 11.7},
-            {"range": "$5,000 - $10,000", "count": 398765, "percentage": 19.9},
-            {"range": "$10,000 - $15,000", "count": 456789, "percentage": 22.8},
-            {"range": "$15,000 - $20,000", "count": 387654, "percentage": 19.4},
-            {"range": "$20,000 - $30,000", "count": 298765, "percentage": 14.9},
-            {"range": "$30,000 - $50,000", "count": 156789, "percentage": 7.8},
-            {"range": "$50,000 - $75,000", "count": 54321, "percentage": 2.7},
-            {"range": "$75,000+", "count": 12345, "percentage": 0.6}
-        ],
-        "mileage_distribution": [
-            {"range": "0 - 25,000", "count": 187654, "percentage": 9.4, "avg_price": 26800},
-            {"range": "25,000 - 50,000", "count": 345678, "percentage": 17.3, "avg_price": 22100},
-            {"range": "50,000 - 75,000", "count": 456789, "percentage": 22.8, "avg_price": 19200},
-            {"range": "75,000 - 100,000", "count": 398765, "percentage": 19.9, "avg_price": 16800},
-            {"range": "100,000 - 125,000", "count": 298765, "percentage": 14.9, "avg_price": 14500},
-            {"range": "125,000 - 150,000", "count": 187654, "percentage": 9.4, "avg_price": 12200},
-            {"range": "150,000 - 175,000", "count": 98765, "percentage": 4.9, "avg_price": 10100},
-            {"range": "175,000+", "count": 26789, "percentage": 1.3, "avg_price": 8500}
-        ]
-    }
+    return {**predictor.describe(), "prediction_cache": prediction_cache.stats()}
+
+@app.get("/catalog/search")
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=64, description="Make or model prefix, e.g. 'cam' or 'toyota rav'"),
+    limit: int = Query(10, ge=1, le=50),
+    make: Optional[str] = Query(None, description="Only return entries of this make")
+):
+    """
+    Autocomplete makes and models: prefix matches first, then fuzzy (typo-tolerant) matches
+    """
+    index = catalog_store.index
+    if index is None:
+        raise HTTPException(status_code=503, detail="Model catalog is still loading. Please try again shortly.")
+    try:
+        results = index.search(q, limit=limit, make=make)
+        return {"query": q, "results": results, "total": len(results)}
+    except Exception as e:
+        logger.error(f"Error searching catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search catalog")
 
 # Statistics API Endpoints
+def if_none_match(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches etag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def snapshot_response(request: Request, snapshot, name: str) -> Response:
+    """Serve a serialized snapshot payload with ETag and Cache-Control, or 304 if the client's copy is current"""
+    etag = snapshot.etags[name]
+    headers = {"ETag": etag, "Cache-Control": snapshot.cache_control(statistics_store.ttl)}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.payloads[name], media_type="application/json", headers=headers)
+
+def listing_filters(
+    make: Optional[str] = Query(None, max_length=64, description="Only count listings of this make"),
+    year_min: Optional[int] = Query(None, ge=1900, le=2100, description="Only count listings of this model year or newer"),
+    year_max: Optional[int] = Query(None, ge=1900, le=2100, description="Only count listings of this model year or older")
+) -> Dict[str, Any]:
+    """Listings filters of the statistics endpoints; an empty dict when none are given"""
+    filters = {name: value for name, value in
+               (("make", make), ("year_min", year_min), ("year_max", year_max)) if value is not None}
+    if filters and not listings_store.enabled:
+        raise HTTPException(status_code=400, detail="Filtering statistics requires the listings store (LISTINGS_STORE_PATH)")
+    if year_min is not None and year_max is not None and year_min > year_max:
+        raise HTTPException(status_code=400, detail="year_min must not be greater than year_max")
+    return filters
+
+async def statistics_snapshot(filters: Dict[str, Any]):
+    """The shared snapshot, or one restricted to the filtered listings"""
+    if not filters:
+        return await statistics_store.current()
+    snapshot = await statistics_store.filtered(**filters)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No listings match the given filters")
+    return snapshot
+
 @app.get("/statistics/overview")
-async def get_statistics_overview():
+async def get_statistics_overview(request: Request, filters: Dict[str, Any] = Depends(listing_filters)):
     """
     Get comprehensive car market statistics overview with live data
     """
     try:
-        live_stats = await get_live_statistics()
-
-        # Calculate summary metrics
-        total_listings = sum(item["count"] for item in live_stats["popular_makes"])
-        avg_market_price = sum(item["avg_price"] * item["count"] for item in live_stats["popular_makes"]) / total_listings
-
-        return {
-            "summary": {
-                "total_listings": total_listings,
-                "average_price": round(avg_market_price, 2),
-                "most_popular_make": live_stats["popular_makes"][0]["make"] if live_stats["popular_makes"] else "Toyota",
-                "most_popular_model": live_stats["popular_models"][0]["model"] if live_stats["popular_models"] else "Camry",
-                "price_range_mode": "$10,000 - $15,000"  # Most common price range
-            },
-            "popular_makes": live_stats["popular_makes"][:10],
-            "popular_models": live_stats["popular_models"][:10],
-            "body_types": live_stats["body_types"],
-            "fuel_types": live_stats["fuel_types"],
-            "last_updated": live_stats["last_updated"],
-            "data_sources": live_stats["data_sources"]
-        }
+        snapshot = await statistics_snapshot(filters)
+        return snapshot_response(request, snapshot, "overview")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting statistics overview: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve statistics")
 
 @app.get("/statistics/makes")
-async def get_make_statistics():
+async def get_make_statistics(request: Request, filters: Dict[str, Any] = Depends(listing_filters)):
     """
     Get detailed statistics about car makes
     """
     try:
-        stats = get_sample_car_statistics()
-        return {
-            "makes": stats["popular_makes"],
-            "total_makes": len(stats["popular_makes"]),
-            "luxury_brands": [make for make in stats["popular_makes"] if make["avg_price"] > 25000]
-        }
+        snapshot = await statistics_snapshot(filters)
+        return snapshot_response(request, snapshot, "makes")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting make statistics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve make statistics")
 
 @app.get("/statistics/models")
-async def get_model_statistics():
+async def get_model_statistics(request: Request, filters: Dict[str, Any] = Depends(listing_filters)):
     """
     Get detailed statistics about car models
     """
     try:
-        stats = get_sample_car_statistics()
-        return {
-            "models": stats["popular_models"],
-            "total_models": len(stats["popular_models"]),
-            "by_make": {}  # Could be expanded to group models by make
-        }
+        snapshot = await statistics_snapshot(filters)
+        return snapshot_response(request, snapshot, "models")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting model statistics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve model statistics")
 
 @app.get("/statistics/trends")
-async def get_market_trends():
+async def get_market_trends(request: Request, filters: Dict[str, Any] = Depends(listing_filters)):
     """
     Get market trends including year-over-year data and price trends with live data
     """
     try:
-        live_stats = await get_live_statistics()
-        fallback_stats = get_sample_car_statistics()
-
-        return {
-            "year_trends": live_stats["year_trends"],
-            "price_ranges": fallback_stats["price_ranges"],  # Keep static for now
-            "mileage_distribution": fallback_stats["mileage_distribution"],  # Keep static for now
-            "insights": {
-                "depreciation_rate": "Cars lose approximately 15-20% of their value per year",
-                "sweet_spot": "3-5 year old cars offer the best value proposition",
-                "high_mileage_threshold": "100,000+ miles significantly impacts resale value"
-            },
-            "last_updated": live_stats["last_updated"],
-            "data_sources": live_stats["data_sources"]
-        }
+        snapshot = await statistics_snapshot(filters)
+        return snapshot_response(request, snapshot, "trends")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting market trends: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve market trends")
 
 @app.get("/statistics/segments")
-async def get_segment_analysis():
+async def get_segment_analysis(request: Request, filters: Dict[str, Any] = Depends(listing_filters)):
     """
     Get analysis by vehicle segments (body types, fuel types, etc.)
     """
     try:
-        stats = get_sample_car_statistics()
-        return {
-            "body_types": stats["body_types"],
-            "fuel_types": stats["fuel_types"],
-            "segment_insights": {
-                "most_popular_segment": "Sedan",
-                "fastest_growing": "Electric",
-                "highest_value": "Pickup Truck",
-                "best_fuel_economy": "Hybrid"
-            }
-        }
+        snapshot = await statistics_snapshot(filters)
+        return snapshot_response(request, snapshot, "segments")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting segment analysis: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve segment analysis")
 
 @app.get("/statistics/market-insights")
-async def get_market_insights():
+async def get_market_insights(request: Request):
     """
     Get advanced market insights and recommendations
     """
     try:
-        stats = get_sample_car_statistics()
-
-        # Calculate some insights
-        luxury_percentage = sum(make["percentage"] for make in stats["popular_makes"] if make["avg_price"] > 25000)
-        electric_growth = 4.4  # Percentage from fuel_types
-
-        return {
-            "market_composition": {
-                "luxury_market_share": round(luxury_percentage, 1),
-                "electric_adoption": electric_growth,
-                "sedan_dominance": 28.4,
-                "suv_growth": 24.9
-            },
-            "price_insights": {
-                "average_luxury_premium": "65% higher than mainstream brands",
-                "electric_premium": "50% higher than gasoline equivalents",
-                "depreciation_leaders": ["BMW", "Mercedes-Benz", "Audi"],
-                "value_retention_leaders": ["Toyota", "Honda", "Lexus"]
-            },
-            "buying_recommendations": {
-                "best_value_brands": ["Toyota", "Honda", "Hyundai"],
-                "luxury_value_picks": ["Lexus", "Acura"],
-                "avoid_high_mileage": ["German luxury brands over 75k miles"],
-                "electric_considerations": ["Check battery warranty and charging infrastructure"]
-            },
-            "seasonal_trends": {
-                "best_buying_months": ["October", "November", "December"],
-                "highest_inventory": ["January", "February"],
-                "convertible_season": ["March", "April", "May"],
-                "suv_demand_peak": ["November", "December", "January"]
-            }
-        }
+        snapshot = await statistics_store.current()
+        return snapshot_response(request, snapshot, "market-insights")
     except Exception as e:
         logger.error(f"Error getting market insights: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve market insights")
 
 @app.get("/statistics/data-sources")
-async def get_data_sources():
+async def get_data_sources(request: Request):
     """
     Get information about data sources and freshness
     """
     try:
-        live_stats = await get_live_statistics()
+        snapshot = await statistics_store.current()
+        return snapshot_response(request, snapshot, "data-sources")
+    except Exception as e:
+        logger.error(f"Error getting data sources info: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve data sources information")
+
+@app.get("/statistics/data-freshness")
+async def get_data_freshness():
+    """
+    Get the age and background refresh status of each cached dataset
+    """
+    try:
+        snapshot = statistics_store.snapshot
         return {
-            "sources": [
-                {
-                    "name": "NHTSA Vehicle API",
-                    "description": "National Highway Traffic Safety Administration vehicle database",
-                    "url": "https://vpic.nhtsa.dot.gov/api/",
-                    "type": "Government",
-                    "coverage": "Vehicle makes, models, and specifications",
-                    "update_frequency": "Real-time"
-                },
-                {
-                    "name": "Market Analysis",
-                    "description": "Aggregated market data and trends",
-                    "type": "Analysis",
-                    "coverage": "Price trends, depreciation patterns",
-                    "update_frequency": "Daily"
-                },
-                {
-                    "name": "Industry Reports",
-                    "description": "Automotive industry statistics and insights",
-                    "type": "Industry",
-                    "coverage": "Market segments, fuel types, body styles",
-                    "update_frequency": "Weekly"
-                }
-            ],
-            "last_updated": live_stats["last_updated"],
-            "cache_duration": "1 hour",
-            "data_quality": {
-                "completeness": "95%",
-                "accuracy": "High",
-                "timeliness": "Current"
+            **data_refresher.freshness(),
+            "snapshot": None if snapshot is None else {
+                "version": snapshot.version,
+                "last_updated": snapshot.last_updated,
+                "age_seconds": round(snapshot.age, 1)
             }
         }
     except Exception as e:
-        logger.error(f"Error getting data sources info: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to retrieve data sources information")
+        logger.error(f"Error getting data freshness: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve data freshness")
+
+@app.get("/statistics/query")
+async def query_statistics(
+    group_by: Optional[str] = Query(None, description=f"Comma-separated dimensions to group by: {', '.join(DIMENSIONS)}"),
+    make: Optional[List[str]] = Query(None),
+    model: Optional[List[str]] = Query(None),
+    body_type: Optional[List[str]] = Query(None),
+    fuel_type: Optional[List[str]] = Query(None),
+    mileage_range: Optional[List[str]] = Query(None, description="Mileage bucket label, e.g. '25,000 - 50,000'"),
+    price_range: Optional[List[str]] = Query(None, description="Price bucket label, e.g. '$10,000 - $15,000'"),
+    year_min: Optional[int] = Query(None, ge=1900, le=2100),
+    year_max: Optional[int] = Query(None, ge=1900, le=2100),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Slice the listings cube: count, price and mileage totals and averages per
+    group, for any combination of group-by dimensions and filters.
+    Repeat a filter parameter to match several values.
+    """
+    if not cube_store.enabled:
+        raise HTTPException(status_code=503, detail="Statistics queries require the listings store (LISTINGS_STORE_PATH)")
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()] if group_by else []
+    filters = {
+        dimension: values for dimension, values in (
+            ("make", make), ("model", model), ("body_type", body_type), ("fuel_type", fuel_type),
+            ("mileage_range", mileage_range), ("price_range", price_range)
+        ) if values
+    }
+    try:
+        cube = await asyncio.to_thread(cube_store.current)
+        if cube is None:
+            raise HTTPException(status_code=503, detail="Listings store is not available yet")
+        started = time.perf_counter()
+        result = cube.query(group_by=dimensions, filters=filters, year_min=year_min, year_max=year_max, limit=limit)
+        return {
+            "group_by": dimensions,
+            "filters": {**filters, "year_min": year_min, "year_max": year_max},
+            **result,
+            "query_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying statistics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to query statistics")
+
+def parse_number_list(value: Optional[str], name: str) -> List[float]:
+    """Comma-separated numbers of a query parameter"""
+    if not value:
+        return []
+    try:
+        return [float(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a comma-separated list of numbers")
+
+@app.get("/statistics/prices")
+async def get_price_distribution(
+    make: Optional[str] = Query(None, max_length=64),
+    model: Optional[str] = Query(None, max_length=64),
+    year_min: Optional[int] = Query(None, ge=1900, le=2100),
+    year_max: Optional[int] = Query(None, ge=1900, le=2100),
+    quantiles: Optional[str] = Query(None, description="Comma-separated quantiles in [0, 1]; default 0.1,0.5,0.9"),
+    buckets: Optional[str] = Query(None, description="Comma-separated ascending price boundaries, e.g. 5000,10000,25000")
+):
+    """
+    Price percentiles and distribution of the matching listings, answered
+    from mergeable per make/model/year sketches. Percentiles and custom
+    bucket counts are estimates; the standard price and mileage ranges are exact.
+    """
+    if not sketch_store.enabled:
+        raise HTTPException(status_code=503, detail="Price distributions require the listings store (LISTINGS_STORE_PATH)")
+    quantile_values = parse_number_list(quantiles, "quantiles") or [0.1, 0.5, 0.9]
+    if any(not 0 <= q <= 1 for q in quantile_values):
+        raise HTTPException(status_code=400, detail="quantiles must be between 0 and 1")
+    boundaries = parse_number_list(buckets, "buckets")
+    if boundaries != sorted(set(boundaries)) or any(boundary <= 0 for boundary in boundaries):
+        raise HTTPException(status_code=400, detail="buckets must be strictly ascending positive prices")
+    try:
+        sketches = await asyncio.to_thread(sketch_store.current)
+        if sketches is None:
+            raise HTTPException(status_code=503, detail="Listings store is not available yet")
+        digest = await asyncio.to_thread(sketches.select, make, model, year_min, year_max)
+        if digest is None:
+            raise HTTPException(status_code=404, detail="No listings match the given filters")
+        return {
+            "filters": {"make": make, "model": model, "year_min": year_min, "year_max": year_max},
+            **digest.summary(quantile_values, boundaries)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting price distribution: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve price distribution")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,267 @@
+"""
+In-process performance metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep one small child per label set and are
+updated in place without locks: every recorder (the HTTP middleware, the
+NHTSA transports and data_cache lookups) runs on the event loop thread, so
+an update is a dict lookup plus a few list increments. GET /metrics renders
+the registry of the worker that answers the scrape.
+
+Ratios such as the data_cache hit ratio are left to the query side, e.g.
+    sum(rate(data_cache_requests_total{result="hit"}[5m])) / sum(rate(data_cache_requests_total[5m]))
+"""
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Starlette appends "; charset=utf-8" to text media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+# Seconds; API routes answer from memory, NHTSA calls go over the internet
+HTTP_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Other methods are reported as OTHER to bound label cardinality
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, Any] = {}
+
+    def _child(self, labels: Labels) -> Any:
+        child = self._children.get(labels)
+        if child is None:
+            if len(labels) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+            child = self._children[labels] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        return [0.0]
+
+    def _format_labels(self, labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, labels)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in sorted(self._children.items()):
+            lines.extend(self._render_child(labels, child))
+        return lines
+
+    def _render_child(self, labels: Labels, child: Any) -> List[str]:
+        return [f"{self.name}{self._format_labels(labels)} {_format_value(child[0])}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._child(labels)[0] += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._child(labels)[0] += amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._child(labels)[0] -= amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._child(labels)[0] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = HTTP_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = sorted(buckets)
+
+    def _new_child(self) -> Any:
+        # Per-bucket counts (the last one is +Inf), then the sum of observations
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *labels: str) -> None:
+        child = self._child(labels)
+        child[bisect_left(self.buckets, value)] += 1
+        child[-1] += value
+
+    def _render_child(self, labels: Labels, child: Any) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float("inf")], child[:-1]):
+            cumulative += count
+            le = ("le", "+Inf" if bound == float("inf") else _format_value(bound))
+            lines.append(f"{self.name}_bucket{self._format_labels(labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(labels)} {_format_value(child[-1])}")
+        lines.append(f"{self.name}_count{self._format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """The process's metrics, rendered in registration order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = HTTP_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status"))
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last response byte",
+    ("method", "route"))
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled")
+http_request_exceptions = metrics.counter(
+    "http_request_exceptions_total", "Requests that ended in an unhandled exception", ("method", "route", "exception"))
+nhtsa_requests = metrics.counter(
+    "nhtsa_requests_total", "NHTSA vPIC API calls by status code (or exception type)",
+    ("client", "operation", "status"))
+nhtsa_request_duration = metrics.histogram(
+    "nhtsa_request_duration_seconds", "NHTSA vPIC API latency until the response headers arrive",
+    ("client", "operation"), buckets=UPSTREAM_LATENCY_BUCKETS)
+data_cache_requests = metrics.counter(
+    "data_cache_requests_total", "data_cache lookups by dataset and result (hit or miss)", ("dataset", "result"))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight requests per
+    route template (e.g. /statistics/query), so path parameters and unknown
+    paths do not create new label values
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self._endpoint_paths: Optional[Dict[Callable, str]] = None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            http_request_exceptions.inc(method, self._route(scope), type(e).__name__)
+            raise
+        finally:
+            http_requests_in_flight.dec()
+            route = self._route(scope)
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, status)
+
+    def _route(self, scope: Dict[str, Any]) -> str:
+        # The router stores the matched route (newer Starlette) or its endpoint in the scope
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._endpoint_paths is None:
+            self._endpoint_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._endpoint_paths.get(endpoint, "unmatched")
+
+
+def nhtsa_operation(path: str) -> str:
+    """vPIC operation of a request path, e.g. /api/vehicles/GetModelsForMake/HONDA -> getmodelsformake"""
+    parts = path.split("/vehicles/", 1)
+    if len(parts) != 2 or not parts[1]:
+        return "other"
+    return parts[1].split("/", 1)[0].lower()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper recording latency and status of every NHTSA call"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, client: str):
+        self.transport = transport
+        self.client = client
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = nhtsa_operation(request.url.path)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception as e:
+            nhtsa_request_duration.observe(time.perf_counter() - started, self.client, operation)
+            nhtsa_requests.inc(self.client, operation, type(e).__name__)
+            raise
+        nhtsa_request_duration.observe(time.perf_counter() - started, self.client, operation)
+        nhtsa_requests.inc(self.client, operation, str(response.status_code))
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def record_data_cache_lookup(cache_key: str, hit: bool) -> None:
+    # Per-make model lists share one dataset label
+    dataset = "nhtsa_models" if cache_key.startswith("nhtsa_models_") else cache_key
+    data_cache_requests.inc(dataset, "hit" if hit else "miss")
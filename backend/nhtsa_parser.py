@@ -0,0 +1,148 @@
+"""
+Table-driven parsers for NHTSA vPIC VIN decode responses.
+
+Two response shapes are supported:
+- DecodeVin: 'Results' is a list of ~130 {"Variable", "Value"} entries
+- DecodeVinValues / DecodeVINValuesBatch: 'Results' holds one flat record per VIN
+
+Both are parsed from the same field table, a precomputed dict of
+source key -> (target field, converter), so each entry costs one dict lookup.
+
+Run as a script to benchmark the parsers over recorded payloads, e.g. the
+test fixtures:
+    python nhtsa_parser.py tests/fixtures/vpic_decodevin.json tests/fixtures/vpic_decodevinvalues.json
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Values vPIC uses for "no data"
+EMPTY_VALUES = {None, '', 'Not Applicable'}
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_str(value: str) -> str:
+    return value
+
+
+# (DecodeVin variable name, flat record key, target field, converter)
+FIELD_TABLE: List[Tuple[str, str, str, Callable[[str], Any]]] = [
+    ('Make', 'Make', 'make_name', _to_str),
+    ('Model', 'Model', 'model_name', _to_str),
+    ('Model Year', 'ModelYear', 'year', _to_int),
+    ('Body Class', 'BodyClass', 'body_type', _to_str),
+    ('Fuel Type - Primary', 'FuelTypePrimary', 'fuel_type', _to_str),
+    ('Transmission Style', 'TransmissionStyle', 'transmission', _to_str),
+    ('Displacement (L)', 'DisplacementL', 'engine_displacement', _to_float),
+    ('Engine Number of Cylinders', 'EngineCylinders', 'engine_cylinders', _to_str),
+]
+
+VARIABLE_FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    variable: (field, convert) for variable, _, field, convert in FIELD_TABLE
+}
+FLAT_FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    key: (field, convert) for _, key, field, convert in FIELD_TABLE
+}
+
+
+def parse_variable_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Extract the fields we use from a DecodeVin 'Results' list"""
+    vin_data = {}
+    for result in results:
+        spec = VARIABLE_FIELDS.get(result.get('Variable'))
+        if spec is None:
+            continue
+        value = result.get('Value')
+        if value in EMPTY_VALUES:
+            continue
+        field, convert = spec
+        converted = convert(value)
+        if converted is not None:
+            vin_data[field] = converted
+    return vin_data
+
+
+def parse_flat_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the fields we use from one flat DecodeVinValues record"""
+    vin_data = {}
+    for key, (field, convert) in FLAT_FIELDS.items():
+        value = record.get(key)
+        if value in EMPTY_VALUES:
+            continue
+        converted = convert(value)
+        if converted is not None:
+            vin_data[field] = converted
+    return vin_data
+
+
+def _parse_with_if_chain(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The original inline if/elif decode loop, kept as the benchmark baseline"""
+    vin_data = {}
+    for result in results:
+        variable = result.get('Variable', '')
+        value = result.get('Value', '')
+        if value and value != 'Not Applicable' and value != '':
+            if variable == 'Make':
+                vin_data['make_name'] = value
+            elif variable == 'Model':
+                vin_data['model_name'] = value
+            elif variable == 'Model Year':
+                try:
+                    vin_data['year'] = int(value)
+                except (ValueError, TypeError):
+                    pass
+            elif variable == 'Body Class':
+                vin_data['body_type'] = value
+            elif variable == 'Fuel Type - Primary':
+                vin_data['fuel_type'] = value
+            elif variable == 'Transmission Style':
+                vin_data['transmission'] = value
+            elif variable == 'Displacement (L)':
+                try:
+                    vin_data['engine_displacement'] = float(value)
+                except (ValueError, TypeError):
+                    pass
+            elif variable == 'Engine Number of Cylinders':
+                vin_data['engine_cylinders'] = value
+    return vin_data
+
+
+def _benchmark(paths: List[str], number: int = 20000) -> None:
+    import json
+    import timeit
+
+    for path in paths:
+        with open(path) as f:
+            results = json.load(f).get('Results', [])
+        if results and 'Variable' in results[0]:
+            cases = [("if/elif chain", _parse_with_if_chain), ("table-driven", parse_variable_results)]
+            payload = results
+            shape = f"DecodeVin, {len(results)} entries"
+        else:
+            cases = [("flat table-driven", parse_flat_record)]
+            payload = results[0]
+            shape = "DecodeVinValues, flat record"
+
+        print(f"{path} ({shape})")
+        for label, parse in cases:
+            seconds = timeit.timeit(lambda: parse(payload), number=number)
+            print(f"  {label:<20} {seconds / number * 1e6:8.2f} us/decode")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python nhtsa_parser.py PAYLOAD.json [PAYLOAD.json ...]")
+    _benchmark(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""
+Result cache for single-vehicle predictions keyed on canonicalized request features
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached predictions (0 disables the cache)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts least-recently-used evictions"""
+
+    def __init__(self, maxsize: int, ttl: int):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        # Only called by cachetools when the cache is full
+        self.evictions += 1
+        return super().popitem()
+
+
+class PredictionCache:
+    """Size-bounded LRU + TTL cache of prediction results with hit/miss/eviction counters"""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.enabled = maxsize > 0
+        self._cache = _CountingTTLCache(maxsize=max(1, maxsize), ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, request: Any) -> str:
+        """
+        Canonical key for a CarPredictionRequest: every set field exactly as the
+        predictor sees it, so a hit returns the price the request would score
+        """
+        features = {name: value for name, value in request.model_dump().items() if value is not None}
+        canonical = json.dumps(features, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[float]:
+        if not self.enabled:
+            return None
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: float) -> None:
+        if self.enabled:
+            self._cache[key] = value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": self._cache.currsize,
+            "maxsize": self._cache.maxsize if self.enabled else 0,
+            "ttl_seconds": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._cache.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global instance
+prediction_cache = PredictionCache(
+    maxsize=PREDICTION_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL
+)
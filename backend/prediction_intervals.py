@@ -0,0 +1,245 @@
+"""
+Calibrated prediction intervals from split-conformal residual quantiles.
+
+Offline, the configured predictor prices a holdout set of listings it was
+not trained on, and each listing's residual log(price) - log(predicted) is
+collected per segment. The conformal quantiles of those residuals (with the
+finite-sample correction) at (1 - coverage) / 2 and (1 + coverage) / 2 give
+multiplicative bounds: on exchangeable data, an interval of
+[predicted * exp(lower), predicted * exp(upper)] contains the true price
+with the table's coverage.
+
+Segments are make x predicted-price range, falling back to make, then
+price range, then all listings when a segment had too few holdout rows. The
+table is a small JSON file; serving an interval is a couple of dict lookups,
+with no extra model pass.
+
+Calibrate a table with:
+    python prediction_intervals.py calibrate holdout.csv /data/prediction_intervals.json 0.9
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from listings_aggregator import PRICE_BIN_EDGES
+from prediction_service import predictor
+
+logger = logging.getLogger(__name__)
+
+# JSON table written by `python prediction_intervals.py calibrate`
+PREDICTION_INTERVALS_PATH = os.getenv("PREDICTION_INTERVALS_PATH")
+
+INTERVALS_FORMAT_VERSION = 1
+DEFAULT_COVERAGE = 0.9
+# Segments with fewer holdout residuals fall back to a coarser segment
+MIN_SEGMENT_ROWS = 50
+# Segment levels from most to least specific
+SEGMENT_LEVELS = ("make_price_range", "make", "price_range", "global")
+
+_PRICE_EDGES = PRICE_BIN_EDGES.tolist()
+
+Bounds = Tuple[float, float]
+
+
+def price_range(predicted_price: float) -> int:
+    """Index of the price_ranges bucket of a predicted price"""
+    return max(0, bisect_right(_PRICE_EDGES, predicted_price) - 1)
+
+
+def segment_keys(make: str, predicted_price: float) -> Dict[str, str]:
+    make_key = make.strip().lower()
+    bucket = str(price_range(predicted_price))
+    return {
+        "make_price_range": f"{make_key}|{bucket}",
+        "make": make_key,
+        "price_range": bucket,
+        "global": "all"
+    }
+
+
+def conformal_bounds(residuals: np.ndarray, coverage: float) -> Optional[Bounds]:
+    """
+    Lower and upper residual quantiles with the split-conformal finite-sample
+    correction; None when there are too few residuals for the coverage
+    """
+    n = len(residuals)
+    alpha = 1 - coverage
+    lower_rank = math.floor((n + 1) * alpha / 2)
+    upper_rank = math.ceil((n + 1) * (1 - alpha / 2))
+    if lower_rank < 1 or upper_rank > n:
+        return None
+    ordered = np.sort(residuals)
+    return float(ordered[lower_rank - 1]), float(ordered[upper_rank - 1])
+
+
+class IntervalTable:
+    """Residual bounds per segment and the coverage they were calibrated for"""
+
+    def __init__(self, coverage: float, segments: Dict[str, Dict[str, List[float]]], meta: Dict[str, Any]):
+        self.coverage = coverage
+        # level -> segment key -> (lower, upper) residual bounds
+        self.segments = {
+            level: {key: (bounds[0], bounds[1]) for key, bounds in segments.get(level, {}).items()}
+            for level in SEGMENT_LEVELS
+        }
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path: str) -> "IntervalTable":
+        with open(path) as f:
+            table = json.load(f)
+        if table.get("version") != INTERVALS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported prediction interval table version {table.get('version')}")
+        meta = {key: value for key, value in table.items() if key != "segments"}
+        return cls(table["coverage"], table["segments"], meta)
+
+    def bounds(self, make: str, predicted_price: float) -> Tuple[str, Bounds]:
+        """(segment level, residual bounds) of the most specific calibrated segment"""
+        keys = segment_keys(make, predicted_price)
+        for level in SEGMENT_LEVELS:
+            bounds = self.segments[level].get(keys[level])
+            if bounds is not None:
+                return level, bounds
+        raise KeyError("Prediction interval table has no global segment")
+
+    def interval(self, make: str, predicted_price: float) -> Dict[str, Any]:
+        level, (lower, upper) = self.bounds(make, predicted_price)
+        return {
+            "lower": round(predicted_price * math.exp(lower), 2),
+            "upper": round(predicted_price * math.exp(upper), 2),
+            "confidence_level": self.coverage,
+            "method": "conformal",
+            "segment": level
+        }
+
+
+def calibrate(makes: List[str], prices: np.ndarray, predicted: np.ndarray,
+              coverage: float = DEFAULT_COVERAGE, min_segment_rows: int = MIN_SEGMENT_ROWS) -> Dict[str, Any]:
+    """Interval table (as JSON-serializable dict) from holdout prices and predictions"""
+    valid = (prices > 0) & (predicted > 0)
+    residuals = np.log(prices[valid]) - np.log(predicted[valid])
+    grouped: Dict[str, Dict[str, List[int]]] = {level: {} for level in SEGMENT_LEVELS}
+    for row, (make, price) in enumerate(zip(np.asarray(makes, dtype=object)[valid], predicted[valid])):
+        for level, key in segment_keys(make, price).items():
+            grouped[level].setdefault(key, []).append(row)
+
+    segments: Dict[str, Dict[str, List[float]]] = {level: {} for level in SEGMENT_LEVELS}
+    for level, keys in grouped.items():
+        for key, rows in keys.items():
+            if len(rows) < min_segment_rows and level != "global":
+                continue
+            bounds = conformal_bounds(residuals[rows], coverage)
+            if bounds is not None:
+                segments[level][key] = [round(bounds[0], 6), round(bounds[1], 6), len(rows)]
+    if "all" not in segments["global"]:
+        raise ValueError(f"Too few holdout rows ({len(residuals)}) to calibrate {coverage:.0%} intervals")
+    return {
+        "version": INTERVALS_FORMAT_VERSION,
+        "coverage": coverage,
+        "holdout_rows": int(len(residuals)),
+        "min_segment_rows": min_segment_rows,
+        "built_at": time.time(),
+        "segments": segments
+    }
+
+
+def load_interval_table(path: Optional[str], predictor_name: Optional[str] = None) -> Optional[IntervalTable]:
+    """
+    The configured table, or None to keep the fixed-width fallback interval.
+    A table calibrated on another predictor's residuals is refused.
+    """
+    if not path:
+        return None
+    try:
+        table = IntervalTable.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not load prediction interval table {path}: {str(e)}")
+        return None
+    calibrated_for = table.meta.get("predictor")
+    if predictor_name is not None and calibrated_for != predictor_name:
+        if calibrated_for is None:
+            logger.warning(f"Prediction interval table {path} does not record its predictor; "
+                           f"assuming it was calibrated for {predictor_name}")
+        else:
+            logger.error(f"Prediction interval table {path} was calibrated for the {calibrated_for} predictor, "
+                         f"not {predictor_name}; using fixed-width intervals")
+            return None
+    logger.info(f"Loaded {table.coverage:.0%} prediction intervals from {path} "
+                f"({sum(len(keys) for keys in table.segments.values())} segments)")
+    return table
+
+
+# CarPredictionRequest fields kept as text (e.g. the Fiat "500" model)
+TEXT_FIELDS = {
+    "make_name", "model_name", "engine_cylinders", "body_type", "fuel_type",
+    "transmission", "wheel_system", "listing_color"
+}
+
+# Leading number of a raw CarGurus cell such as "35.1 in" or "4 seats"
+_LEADING_NUMBER = re.compile(r"\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?")
+
+
+class HoldoutVehicle:
+    """A holdout CSV row exposed like a CarPredictionRequest; missing fields read as None"""
+
+    def __init__(self, row: Dict[str, str]):
+        for name, value in row.items():
+            setattr(self, name, _parse_cell(value, text=name in TEXT_FIELDS))
+        self.year = int(self.year)
+        self.mileage = int(self.mileage) if self.mileage is not None else 0
+
+    def __getattr__(self, name):
+        return None
+
+
+def _parse_cell(value: Optional[str], text: bool) -> Any:
+    """Text fields as is; numeric cells with units stripped ("35.1 in", "4 seats"); None if not a number"""
+    if value is None or value == "":
+        return None
+    if text:
+        return value
+    if value in ("True", "False"):
+        return value == "True"
+    match = _LEADING_NUMBER.match(value)
+    return float(match.group()) if match else None
+
+
+# Global instance; None unless PREDICTION_INTERVALS_PATH is set
+interval_table = load_interval_table(PREDICTION_INTERVALS_PATH, predictor.name)
+
+
+if __name__ == "__main__":
+    import csv
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "calibrate":
+        sys.exit("usage: python prediction_intervals.py calibrate HOLDOUT.csv TABLE.json [COVERAGE]")
+    coverage = float(sys.argv[4]) if len(sys.argv) == 5 else DEFAULT_COVERAGE
+
+    predictor.load()
+    vehicles, prices = [], []
+    with open(sys.argv[2], newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                vehicle = HoldoutVehicle(row)
+                price = float(row["price"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if vehicle.make_name and vehicle.model_name:
+                vehicles.append(vehicle)
+                prices.append(price)
+    predicted = np.concatenate([
+        predictor.predict_batch(vehicles[start:start + 10000]) for start in range(0, len(vehicles), 10000)
+    ]) if vehicles else np.empty(0)
+    table = calibrate([vehicle.make_name for vehicle in vehicles], np.array(prices), predicted, coverage)
+    with open(sys.argv[3], "w") as f:
+        json.dump({**table, "predictor": predictor.name}, f, indent=1)
+    print(json.dumps({key: value for key, value in table.items() if key != "segments"}, indent=2))
@@ -0,0 +1,281 @@
+"""
+Mergeable price sketches over the listings store.
+
+For every (make, model, year) the sketches keep a t-digest of prices plus
+exact fixed-bin price and mileage histograms (the price_ranges and
+mileage_distribution buckets). A make, a model or a year range is answered
+by merging the matching sketches, so p10/p50/p90 prices and counts for
+arbitrary price bucket boundaries come back without touching raw rows.
+
+The t-digest is the merging variant with the k1 scale function, compressed
+in vectorized form: centroids sorted by (sketch, mean) are assigned to
+clusters by the integer part of k1 at their quantile position, and each
+cluster collapses into one centroid. That keeps at most compression / 2 + 1
+centroids per sketch, densest in the tails where quantile error matters.
+Sketches from separate shards merge by concatenating centroids and
+compressing again, and histograms merge by addition.
+
+Like the statistics cube, the sketches are built from the column store in
+one pass and saved as sketches.npz inside the store directory.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+from listings_aggregator import MILEAGE_BIN_EDGES, MILEAGE_BIN_LABELS, PRICE_BIN_EDGES, PRICE_BIN_LABELS, bin_index
+from listings_store import QUERY_BLOCK_ROWS, ListingsStore, StoreArtifact, listings_store, save_arrays
+
+logger = logging.getLogger(__name__)
+
+SKETCH_FORMAT_VERSION = 1
+# Higher keeps more centroids per sketch: more accurate quantiles, more memory
+DIGEST_COMPRESSION = 200
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+# Merged digests kept per distinct filter combination
+SELECTION_CACHE_SIZE = 256
+# Cached "no listing matches" selections are stored as None
+_MISSING = object()
+
+SketchKey = Tuple[str, str, Optional[int]]
+
+
+def compress(keys: np.ndarray, means: np.ndarray, weights: np.ndarray,
+             compression: float = DIGEST_COMPRESSION) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge the centroids of each sketch key into t-digest clusters; returns (keys, means, weights) sorted"""
+    if not len(keys):
+        return keys, means, weights
+    order = np.lexsort((means, keys))
+    keys, means, weights = keys[order], means[order], weights[order]
+    new_key = np.r_[True, keys[1:] != keys[:-1]]
+    group = np.cumsum(new_key) - 1
+    starts = np.flatnonzero(new_key)
+    cumulative = np.cumsum(weights)
+    before_group = (cumulative - weights)[starts]
+    totals = np.add.reduceat(weights, starts)
+    # Quantile of each centroid's midpoint within its sketch
+    q = (cumulative - weights / 2 - before_group[group]) / totals[group]
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1)) + compression / 4)
+    boundary = new_key | np.r_[True, k[1:] != k[:-1]]
+    cluster = np.cumsum(boundary) - 1
+    cluster_weights = np.bincount(cluster, weights=weights)
+    cluster_means = np.bincount(cluster, weights=weights * means) / cluster_weights
+    return keys[boundary], cluster_means, cluster_weights
+
+
+class PriceDigest:
+    """One merged sketch: price quantiles, estimated bucket counts and exact fixed-bin histograms"""
+
+    def __init__(self, means: np.ndarray, weights: np.ndarray, minimum: float, maximum: float,
+                 price_hist: np.ndarray, mileage_hist: np.ndarray):
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+        self.price_hist = price_hist
+        self.mileage_hist = mileage_hist
+        self.count = int(round(weights.sum()))
+        # Piecewise-linear CDF through the centroid midpoints, pinned to the exact min and max
+        midpoints = np.cumsum(weights) - weights / 2
+        self._ranks = np.r_[0.0, midpoints, weights.sum()]
+        self._values = np.maximum.accumulate(np.r_[minimum, means, maximum])
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        return np.interp(np.asarray(qs) * self._ranks[-1], self._ranks, self._values).tolist()
+
+    def rank(self, values: Sequence[float]) -> np.ndarray:
+        """Estimated number of listings priced below each value"""
+        return np.interp(values, self._values, self._ranks)
+
+    def bucket_counts(self, boundaries: Sequence[float]) -> List[Dict[str, Any]]:
+        """Estimated listings per price bucket: below the first boundary, between each pair, above the last"""
+        ranks = np.r_[0.0, self.rank(boundaries), self._ranks[-1]]
+        edges = [0.0] + list(boundaries)
+        buckets = []
+        for i, count in enumerate(np.diff(ranks).tolist()):
+            label = f"${edges[i]:,.0f}+" if i == len(boundaries) else f"${edges[i]:,.0f} - ${edges[i + 1]:,.0f}"
+            buckets.append({
+                "range": label,
+                "count": round(count),
+                "percentage": round(100 * count / self.count, 1) if self.count else 0.0
+            })
+        return buckets
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                boundaries: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        mileage_total = int(self.mileage_hist.sum())
+        summary = {
+            "count": self.count,
+            "min_price": round(self.minimum),
+            "max_price": round(self.maximum),
+            "quantiles": {f"p{q * 100:g}": round(value) for q, value in zip(quantiles, self.quantiles(quantiles))},
+            "price_ranges": [
+                {"range": label, "count": count, "percentage": round(100 * count / self.count, 1)}
+                for label, count in zip(PRICE_BIN_LABELS, self.price_hist.tolist())
+            ],
+            "mileage_distribution": [
+                {"range": label, "count": count,
+                 "percentage": round(100 * count / mileage_total, 1) if mileage_total else 0.0}
+                for label, count in zip(MILEAGE_BIN_LABELS, self.mileage_hist.tolist())
+            ]
+        }
+        if boundaries:
+            summary["custom_ranges"] = self.bucket_counts(boundaries)
+        return summary
+
+
+class PriceSketches:
+    """Sketches keyed by (make, model, year); year is None when unknown"""
+
+    def __init__(self, version: Optional[float], keys: List[SketchKey], centroid_keys: np.ndarray,
+                 means: np.ndarray, weights: np.ndarray, minimum: np.ndarray, maximum: np.ndarray,
+                 price_hist: np.ndarray, mileage_hist: np.ndarray):
+        self.version = version
+        self.keys = keys
+        self.centroid_keys = centroid_keys
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+        self.price_hist = price_hist
+        self.mileage_hist = mileage_hist
+        self._selections: LRUCache = LRUCache(maxsize=SELECTION_CACHE_SIZE)
+        self._selections_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_listings(cls, keys: List[SketchKey], codes: np.ndarray, price: np.ndarray,
+                      mileage: np.ndarray, version: Optional[float] = None) -> "PriceSketches":
+        """Sketch listings whose sketch key is keys[code]"""
+        n = len(keys)
+        centroid_keys, means, weights = compress(codes, price, np.ones(len(price)))
+        minimum = np.full(n, np.inf)
+        maximum = np.full(n, -np.inf)
+        np.minimum.at(minimum, codes, price)
+        np.maximum.at(maximum, codes, price)
+        n_price, n_mileage = len(PRICE_BIN_LABELS), len(MILEAGE_BIN_LABELS)
+        price_hist = np.bincount(codes * n_price + bin_index(price, PRICE_BIN_EDGES),
+                                 minlength=n * n_price).reshape(n, n_price)
+        has_mileage = ~np.isnan(mileage)
+        mileage_hist = np.bincount(codes[has_mileage] * n_mileage + bin_index(mileage[has_mileage], MILEAGE_BIN_EDGES),
+                                   minlength=n * n_mileage).reshape(n, n_mileage)
+        return cls(version, keys, centroid_keys, means, weights, minimum, maximum, price_hist, mileage_hist)
+
+    def merge(self, other: "PriceSketches") -> "PriceSketches":
+        """Sketches of both inputs' listings, e.g. of two data shards"""
+        positions = {key: i for i, key in enumerate(self.keys)}
+        keys = list(self.keys)
+        for key in other.keys:
+            if key not in positions:
+                positions[key] = len(keys)
+                keys.append(key)
+        remap = np.array([positions[key] for key in other.keys], dtype=np.int64)
+        n = len(keys)
+
+        def combine(mine: np.ndarray, theirs: np.ndarray, fill: float, ufunc: np.ufunc) -> np.ndarray:
+            combined = np.full((n,) + mine.shape[1:], fill, dtype=mine.dtype)
+            combined[:len(self.keys)] = mine
+            ufunc.at(combined, remap, theirs)
+            return combined
+
+        centroid_keys, means, weights = compress(
+            np.concatenate([self.centroid_keys, remap[other.centroid_keys]]),
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights])
+        )
+        return PriceSketches(
+            self.version, keys, centroid_keys, means, weights,
+            combine(self.minimum, other.minimum, np.inf, np.minimum),
+            combine(self.maximum, other.maximum, -np.inf, np.maximum),
+            combine(self.price_hist, other.price_hist, 0, np.add),
+            combine(self.mileage_hist, other.mileage_hist, 0, np.add)
+        )
+
+    @classmethod
+    def build(cls, store: ListingsStore) -> "PriceSketches":
+        """Sketch every listing of the store in one pass, one block at a time"""
+        started = time.perf_counter()
+        meta, columns = store.meta, store.columns
+        make_names, model_names = meta["dictionaries"]["make"], meta["dictionaries"]["model"]
+        sketches = cls(meta["built_at"], [], np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0),
+                       np.zeros(0), np.zeros(0), np.zeros((0, len(PRICE_BIN_LABELS)), dtype=np.int64),
+                       np.zeros((0, len(MILEAGE_BIN_LABELS)), dtype=np.int64))
+        for start in range(0, meta["rows"], QUERY_BLOCK_ROWS):
+            block = slice(start, start + QUERY_BLOCK_ROWS)
+            year = columns["year"][block].astype(np.int64)
+            packed = (columns["make"][block].astype(np.int64) * len(model_names) + columns["model"][block]) \
+                * 65536 + np.clip(year, 0, 65535)
+            packed_keys, codes = np.unique(packed, return_inverse=True)
+            keys = []
+            for packed_key in packed_keys.tolist():
+                make_model, key_year = divmod(packed_key, 65536)
+                make_code, model_code = divmod(make_model, len(model_names))
+                keys.append((make_names[make_code], model_names[model_code], key_year or None))
+            sketches = sketches.merge(cls.from_listings(
+                keys, codes, columns["price"][block].astype(np.float64), columns["mileage"][block].astype(np.float64)))
+        logger.info(f"Built price sketches: {len(sketches)} sketches, {len(sketches.means)} centroids "
+                    f"from {meta['rows']} listings in {time.perf_counter() - started:.1f}s")
+        return sketches
+
+    def save(self, path: str) -> None:
+        save_arrays(
+            path, format_version=SKETCH_FORMAT_VERSION, version=self.version, keys=json.dumps(self.keys),
+            centroid_keys=self.centroid_keys, means=self.means, weights=self.weights,
+            minimum=self.minimum, maximum=self.maximum, price_hist=self.price_hist, mileage_hist=self.mileage_hist
+        )
+
+    @classmethod
+    def load(cls, path: str, store: ListingsStore) -> Optional["PriceSketches"]:
+        """The saved sketches, or None if they are missing or were built from another version of the store"""
+        try:
+            with np.load(path) as saved:
+                if int(saved["format_version"]) != SKETCH_FORMAT_VERSION or float(saved["version"]) != store.version:
+                    return None
+                keys = [tuple(key) for key in json.loads(str(saved["keys"]))]
+                arrays = {name: saved[name] for name in ("centroid_keys", "means", "weights", "minimum", "maximum",
+                                                           "price_hist", "mileage_hist")}
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(store.version, keys, **arrays)
+
+    def select(self, make: Optional[str] = None, model: Optional[str] = None,
+               year_min: Optional[int] = None, year_max: Optional[int] = None) -> Optional[PriceDigest]:
+        """Merge the sketches matching the filters (case-insensitive names); None if none match"""
+        make, model = make and make.strip().lower(), model and model.strip().lower()
+        cache_key = (make, model, year_min, year_max)
+        # select() runs in asyncio.to_thread workers and cachetools caches are not thread-safe
+        with self._selections_lock:
+            cached = self._selections.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        digest = self._select(make, model, year_min, year_max)
+        with self._selections_lock:
+            self._selections[cache_key] = digest
+        return digest
+
+    def _select(self, make: Optional[str], model: Optional[str],
+                year_min: Optional[int], year_max: Optional[int]) -> Optional[PriceDigest]:
+        selected = np.array([
+            (make is None or key_make.lower() == make)
+            and (model is None or key_model.lower() == model)
+            and (year_min is None or (key_year is not None and key_year >= year_min))
+            and (year_max is None or (key_year is not None and key_year <= year_max))
+            for key_make, key_model, key_year in self.keys
+        ], dtype=bool)
+        if not selected.any():
+            return None
+        in_selection = selected[self.centroid_keys]
+        _, means, weights = compress(np.zeros(int(in_selection.sum()), dtype=np.int64),
+                                     self.means[in_selection], self.weights[in_selection])
+        return PriceDigest(means, weights, float(self.minimum[selected].min()), float(self.maximum[selected].max()),
+                           self.price_hist[selected].sum(axis=0), self.mileage_hist[selected].sum(axis=0))
+
+
+# Global instance
+sketch_store = StoreArtifact(listings_store, "sketches.npz", PriceSketches.build, PriceSketches.load)
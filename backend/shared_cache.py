@@ -0,0 +1,138 @@
+"""
+Cross-worker cache backend for data_service.
+
+Each uvicorn worker is a separate process with its own memory, so an
+in-process TTLCache means one copy of every dataset, and one set of NHTSA
+calls, per worker. SQLiteDataCache keeps the datasets in a SQLite file on
+local disk instead: it behaves like the TTLCache it replaces (a mutable
+mapping with a ttl attribute), all workers on the host read the same rows,
+and a lease row elects the single worker that refreshes them.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDataCache(MutableMapping):
+    """
+    TTL mapping of JSON-serializable values stored in a shared SQLite file.
+
+    Lookups run on the event loop: in WAL mode readers never wait for a
+    writer, and a lookup that still finds the file locked reads as a miss.
+    Writes can wait up to busy_timeout_ms for another worker's write, so
+    callers on the event loop make them from a worker thread.
+    """
+
+    def __init__(self, path: str, ttl: float, busy_timeout_ms: int = 250):
+        self.path = path
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # The connection is shared by the event loop and the worker threads writing to it
+        self._lock = threading.Lock()
+        self._db.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS data_cache (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                expires_at REAL NOT NULL, fetched_at REAL
+            )
+        """)
+        self._db.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+        logger.info(f"Using shared data cache {path}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _lookup(self, sql: str, params: tuple) -> list:
+        try:
+            return self._execute(sql, params)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Shared data cache lookup failed, treating it as a miss: {str(e)}")
+            return []
+
+    def __getitem__(self, key: str) -> Any:
+        rows = self._lookup("SELECT value FROM data_cache WHERE key = ? AND expires_at > ?", (key, time.time()))
+        if not rows:
+            raise KeyError(key)
+        return json.loads(rows[0][0])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        now = time.time()
+        # Re-storing a value renews its expiry but keeps its fetch time
+        self._execute("""
+            INSERT INTO data_cache (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+        """, (key, json.dumps(value, separators=(",", ":")), now + self.ttl))
+        self._execute("DELETE FROM data_cache WHERE expires_at <= ?", (now,))
+
+    def __delitem__(self, key: str) -> None:
+        if not self._execute("DELETE FROM data_cache WHERE key = ? RETURNING key", (key,)):
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return bool(self._lookup("SELECT 1 FROM data_cache WHERE key = ? AND expires_at > ?", (key, time.time())))
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._execute("SELECT key FROM data_cache WHERE expires_at > ?", (time.time(),))
+        return iter([key for key, in rows])
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM data_cache WHERE expires_at > ?", (time.time(),))[0][0]
+
+    def clear(self) -> None:
+        self._execute("DELETE FROM data_cache")
+
+    def mark_fetched(self, key: str, fetched_at: float) -> None:
+        """Record when the stored value was fetched from upstream (wall-clock seconds)"""
+        self._execute("UPDATE data_cache SET fetched_at = ? WHERE key = ?", (fetched_at, key))
+
+    def fetched_at(self, key: str) -> Optional[float]:
+        rows = self._execute("SELECT fetched_at FROM data_cache WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def version(self) -> Optional[float]:
+        """Latest fetch time of any dataset; changes whenever any worker refreshes one"""
+        return self._execute("SELECT MAX(fetched_at) FROM data_cache")[0][0]
+
+    def lease(self, name: str, ttl: float) -> "LeaderLease":
+        return LeaderLease(self, name, ttl)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class LeaderLease:
+    """
+    Time-bounded lease row: the holder renews it before it expires, and any
+    worker may take it over once the holder stops renewing (e.g. it exited)
+    """
+
+    def __init__(self, cache: SQLiteDataCache, name: str, ttl: float):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease; returns whether this process holds it"""
+        now = time.time()
+        self.cache._execute("""
+            INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.owner = excluded.owner OR leases.expires_at <= ?
+        """, (self.name, self.owner, now + self.ttl, now))
+        rows = self.cache._execute("SELECT owner FROM leases WHERE name = ?", (self.name,))
+        return bool(rows) and rows[0][0] == self.owner
+
+    def release(self) -> None:
+        self.cache._execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
@@ -0,0 +1,219 @@
+"""
+Pre-aggregated OLAP cube over the listings store.
+
+Every listing falls into one cell of make x model x body_type x fuel_type x
+year x mileage range x price range; the cube keeps only the non-empty cells
+(sparse) with their count, price sum, mileage sum and count of listings with
+a known mileage. A query filters cells with vectorized membership tests and
+sums them per group with np.unique/np.bincount, so its cost depends on the
+number of cells (typically a few hundred thousand), not on the millions of
+listings behind them.
+
+The cube is built from the column store the first time it is needed and
+saved as cube.npz inside the store directory, so later processes and
+workers only load it.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from listings_aggregator import MILEAGE_BIN_EDGES, MILEAGE_BIN_LABELS, PRICE_BIN_EDGES, PRICE_BIN_LABELS, bin_index
+from listings_store import QUERY_BLOCK_ROWS, ListingsStore, StoreArtifact, listings_store, save_arrays
+
+logger = logging.getLogger(__name__)
+
+CUBE_FORMAT_VERSION = 1
+# Cube dimensions in packing order; year code 0 and mileage code 0 mean unknown
+DIMENSIONS = ("make", "model", "body_type", "fuel_type", "year", "mileage_range", "price_range")
+MEASURES = ("count", "price_sum", "mileage_sum", "mileage_count")
+FIRST_YEAR, LAST_YEAR = 1900, 2100
+
+
+class StatisticsCube:
+    """Sparse cube cells: one code array per dimension and one array per measure"""
+
+    def __init__(self, version: float, labels: Dict[str, List[Any]],
+                 codes: Dict[str, np.ndarray], measures: Dict[str, np.ndarray]):
+        self.version = version
+        self.labels = labels
+        self.codes = codes
+        self.measures = measures
+        self._label_codes = {
+            dimension: {_label_key(label): code for code, label in enumerate(dimension_labels) if label is not None}
+            for dimension, dimension_labels in labels.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.measures["count"])
+
+    @classmethod
+    def build(cls, store: ListingsStore) -> "StatisticsCube":
+        """Aggregate the store's listings into cells, one block at a time"""
+        started = time.perf_counter()
+        meta, columns = store.meta, store.columns
+        labels = cls.build_labels(store)
+        radices = [len(labels[dimension]) for dimension in DIMENSIONS]
+        if np.prod(radices, dtype=np.float64) >= 2 ** 63:
+            raise ValueError("Listings store has too many distinct values to pack cube cells into int64")
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in ("key",) + MEASURES}
+        for start in range(0, meta["rows"], QUERY_BLOCK_ROWS):
+            block = slice(start, start + QUERY_BLOCK_ROWS)
+            price = columns["price"][block].astype(np.float64)
+            mileage = columns["mileage"][block].astype(np.float64)
+            year = columns["year"][block].astype(np.int64)
+            has_mileage = ~np.isnan(mileage)
+            mileage_code = np.zeros(len(mileage), dtype=np.int64)
+            mileage_code[has_mileage] = bin_index(mileage[has_mileage], MILEAGE_BIN_EDGES) + 1
+            block_codes = [
+                columns["make"][block], columns["model"][block], columns["body"][block], columns["fuel"][block],
+                np.where((year >= FIRST_YEAR) & (year <= LAST_YEAR), year - FIRST_YEAR + 1, 0),
+                mileage_code,
+                bin_index(price, PRICE_BIN_EDGES),
+            ]
+            keys, cells = np.unique(_pack(block_codes, radices), return_inverse=True)
+            parts["key"].append(keys)
+            parts["count"].append(np.bincount(cells, minlength=len(keys)))
+            parts["price_sum"].append(np.bincount(cells, weights=price, minlength=len(keys)))
+            parts["mileage_sum"].append(np.bincount(cells, weights=np.where(has_mileage, mileage, 0.0),
+                                                    minlength=len(keys)))
+            parts["mileage_count"].append(np.bincount(cells, weights=has_mileage, minlength=len(keys)))
+
+        # Merge the per-block cells
+        keys, cells = np.unique(np.concatenate(parts["key"] or [np.zeros(0, dtype=np.int64)]), return_inverse=True)
+        measures = {
+            name: np.bincount(cells, weights=np.concatenate(parts[name]), minlength=len(keys)) if len(keys)
+            else np.zeros(0)
+            for name in MEASURES
+        }
+        for name in ("count", "mileage_count"):
+            measures[name] = measures[name].astype(np.int64)
+        codes = dict(zip(DIMENSIONS, _unpack(keys, radices)))
+        cube = cls(meta["built_at"], labels, codes, measures)
+        logger.info(f"Built statistics cube: {len(cube)} cells from {meta['rows']} listings in "
+                    f"{time.perf_counter() - started:.1f}s")
+        return cube
+
+    def save(self, path: str) -> None:
+        arrays = {f"code_{dimension}": codes for dimension, codes in self.codes.items()}
+        arrays.update({f"measure_{name}": values for name, values in self.measures.items()})
+        save_arrays(path, format_version=CUBE_FORMAT_VERSION, version=self.version, **arrays)
+
+    @classmethod
+    def load(cls, path: str, store: ListingsStore) -> Optional["StatisticsCube"]:
+        """The saved cube, or None if it is missing or was built from another version of the store"""
+        try:
+            with np.load(path) as saved:
+                if int(saved["format_version"]) != CUBE_FORMAT_VERSION or float(saved["version"]) != store.version:
+                    return None
+                codes = {dimension: saved[f"code_{dimension}"] for dimension in DIMENSIONS}
+                measures = {name: saved[f"measure_{name}"] for name in MEASURES}
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(store.version, cls.build_labels(store), codes, measures)
+
+    @staticmethod
+    def build_labels(store: ListingsStore) -> Dict[str, List[Any]]:
+        """Label of every code of every dimension"""
+        # Code 0 of the store dictionaries is the empty string, reported as unknown
+        dictionaries = {name: [None] + values[1:] for name, values in store.meta["dictionaries"].items()}
+        return {
+            "make": dictionaries["make"],
+            "model": dictionaries["model"],
+            "body_type": dictionaries["body"],
+            "fuel_type": dictionaries["fuel"],
+            "year": [None] + list(range(FIRST_YEAR, LAST_YEAR + 1)),
+            "mileage_range": [None] + MILEAGE_BIN_LABELS,
+            "price_range": PRICE_BIN_LABELS,
+        }
+
+    def query(self, group_by: Sequence[str] = (), filters: Optional[Dict[str, Sequence[Any]]] = None,
+              year_min: Optional[int] = None, year_max: Optional[int] = None,
+              limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Sum the cells matching the filters, grouped by the given dimensions.
+        filters maps a dimension to the labels it may take (case-insensitive);
+        groups come back by descending count.
+        """
+        unknown = [dimension for dimension in list(group_by) + list(filters or {}) if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {', '.join(unknown)}")
+
+        mask = np.ones(len(self), dtype=bool)
+        for dimension, values in (filters or {}).items():
+            wanted = [self._label_codes[dimension].get(_label_key(value)) for value in values]
+            mask &= np.isin(self.codes[dimension], [code for code in wanted if code is not None])
+        if year_min is not None or year_max is not None:
+            year = self.codes["year"]
+            low = year_min - FIRST_YEAR + 1 if year_min is not None else 1
+            high = year_max - FIRST_YEAR + 1 if year_max is not None else len(self.labels["year"]) - 1
+            mask &= (year >= low) & (year <= high)
+
+        cells = np.flatnonzero(mask)
+        measures = {name: values[cells] for name, values in self.measures.items()}
+        result = {"total": _summarize({name: values.sum() for name, values in measures.items()}),
+                  "cells_scanned": len(self), "cells_matched": len(cells)}
+        if not group_by:
+            return result
+
+        radices = [len(self.labels[dimension]) for dimension in group_by]
+        keys, groups = np.unique(_pack([self.codes[dimension][cells] for dimension in group_by], radices),
+                                 return_inverse=True)
+        sums = {name: np.bincount(groups, weights=values, minlength=len(keys)) for name, values in measures.items()}
+        order = np.argsort(-sums["count"], kind="stable")[:limit]
+        group_codes = _unpack(keys[order], radices)
+        result["groups"] = [
+            {
+                **{dimension: self.labels[dimension][int(codes[i])] for dimension, codes in zip(group_by, group_codes)},
+                **_summarize({name: values[group] for name, values in sums.items()})
+            }
+            for i, group in enumerate(order)
+        ]
+        result["total_groups"] = len(keys)
+        return result
+
+    def models_by_make(self, per_make: int = 10, **query: Any) -> Dict[str, List[Dict[str, Any]]]:
+        """Top models of every make, for the by_make field of /statistics/models"""
+        by_make: Dict[str, List[Dict[str, Any]]] = {}
+        for group in self.query(group_by=("make", "model"), **query).get("groups", []):
+            models = by_make.setdefault(group["make"], [])
+            if group["model"] and len(models) < per_make:
+                models.append({"model": group["model"], "count": group["count"], "avg_price": group["avg_price"]})
+        return by_make
+
+
+def _label_key(label: Any) -> Any:
+    return label.lower() if isinstance(label, str) else label
+
+
+def _pack(codes: Sequence[np.ndarray], radices: Sequence[int]) -> np.ndarray:
+    """Mixed-radix int64 key of each row's dimension codes"""
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    for dimension_codes, radix in zip(codes, radices):
+        key = key * radix + dimension_codes
+    return key
+
+
+def _unpack(keys: np.ndarray, radices: Sequence[int]) -> List[np.ndarray]:
+    codes = []
+    for radix in reversed(radices):
+        keys, dimension_codes = np.divmod(keys, radix)
+        codes.append(dimension_codes.astype(np.int32))
+    return codes[::-1]
+
+
+def _summarize(sums: Dict[str, Any]) -> Dict[str, Any]:
+    count, mileage_count = int(sums["count"]), int(sums["mileage_count"])
+    return {
+        "count": count,
+        "sum_price": round(float(sums["price_sum"]), 2),
+        "sum_mileage": round(float(sums["mileage_sum"]), 2),
+        "avg_price": round(sums["price_sum"] / count) if count else None,
+        "avg_mileage": round(sums["mileage_sum"] / mileage_count) if mileage_count else None,
+    }
+
+
+# Global instance
+cube_store = StoreArtifact(listings_store, "cube.npz", StatisticsCube.build, StatisticsCube.load)
@@ -0,0 +1,426 @@
+"""
+Statistics service: builds an immutable snapshot of every /statistics/* response,
+with derived aggregates precomputed and each payload already serialized to JSON bytes
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+from cachetools import TTLCache
+
+from data_service import FALLBACK_DATA_SOURCE, data_cache, get_cached_statistics, get_live_statistics, live_data_service
+from listings_store import listings_store
+from price_sketches import sketch_store
+from statistics_cube import cube_store
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are rebuilt once the live data they were built from has expired
+SNAPSHOT_TTL = data_cache.ttl
+# Snapshots built from fallback data (NHTSA failed) are replaced as soon as a rebuild succeeds
+FALLBACK_SNAPSHOT_TTL = 60
+# Distinct listings-store filter combinations kept as prebuilt snapshots
+FILTERED_SNAPSHOT_CACHE_SIZE = 256
+
+# Sample car statistics data based on real market trends
+def get_sample_car_statistics():
+    """Generate realistic car market statistics"""
+    return {
+        "popular_makes": [
+            {"make": "Toyota", "count": 245678, "avg_price": 18500, "percentage": 12.3},
+            {"make": "Honda", "count": 198432, "avg_price": 17800, "percentage": 9.9},
+            {"make": "Ford", "count": 187654, "avg_price": 16200, "percentage": 9.4},
+            {"make": "Chevrolet", "count": 176543, "avg_price": 15800, "percentage": 8.8},
+            {"make": "Nissan", "count": 154321, "avg_price": 16500, "percentage": 7.7},
+            {"make": "BMW", "count": 98765, "avg_price": 28900, "percentage": 4.9},
+            {"make": "Mercedes-Benz", "count": 87654, "avg_price": 32100, "percentage": 4.4},
+            {"make": "Hyundai", "count": 134567, "avg_price": 14200, "percentage": 6.7},
+            {"make": "Volkswagen", "count": 76543, "avg_price": 19800, "percentage": 3.8},
+            {"make": "Audi", "count": 65432, "avg_price": 31500, "percentage": 3.3}
+        ],
+        "popular_models": [
+            {"model": "Camry", "make": "Toyota", "count": 45678, "avg_price": 19500},
+            {"model": "Civic", "make": "Honda", "count": 43210, "avg_price": 18200},
+            {"model": "Accord", "make": "Honda", "count": 38765, "avg_price": 20100},
+            {"model": "Corolla", "make": "Toyota", "count": 36543, "avg_price": 16800},
+            {"model": "F-150", "make": "Ford", "count": 34567, "avg_price": 28900},
+            {"model": "Altima", "make": "Nissan", "count": 32109, "avg_price": 17200},
+            {"model": "Malibu", "make": "Chevrolet", "count": 29876, "avg_price": 16500},
+            {"model": "Elantra", "make": "Hyundai", "count": 28543, "avg_price": 14800},
+            {"model": "Silverado", "make": "Chevrolet", "count": 27654, "avg_price": 32100},
+            {"model": "RAV4", "make": "Toyota", "count": 26789, "avg_price": 24500}
+        ],
+        "body_types": [
+            {"type": "Sedan", "count": 567890, "percentage": 28.4, "avg_price": 18200},
+            {"type": "SUV / Crossover", "count": 498765, "percentage": 24.9, "avg_price": 23800},
+            {"type": "Pickup Truck", "count": 234567, "percentage": 11.7, "avg_price": 28900},
+            {"type": "Coupe", "count": 187654, "percentage": 9.4, "avg_price": 22100},
+            {"type": "Hatchback", "count": 156789, "percentage": 7.8, "avg_price": 16500},
+            {"type": "Wagon", "count": 98765, "percentage": 4.9, "avg_price": 19800},
+            {"type": "Minivan", "count": 87654, "percentage": 4.4, "avg_price": 21200},
+            {"type": "Van", "count": 45678, "percentage": 2.3, "avg_price": 25600}
+        ],
+        "fuel_types": [
+            {"type": "Gasoline", "count": 1654321, "percentage": 82.7, "avg_price": 19200},
+            {"type": "Hybrid", "count": 198765, "percentage": 9.9, "avg_price": 22800},
+            {"type": "Electric", "count": 87654, "percentage": 4.4, "avg_price": 28900},
+            {"type": "Diesel", "count": 45678, "percentage": 2.3, "avg_price": 24100},
+            {"type": "Flex Fuel Vehicle", "count": 12345, "percentage": 0.6, "avg_price": 18500},
+            {"type": "Compressed Natural Gas", "count": 2345, "percentage": 0.1, "avg_price": 21000}
+        ],
+        "year_trends": [
+            {"year": 2020, "count": 234567, "avg_price": 24500, "avg_mileage": 35000},
+            {"year": 2019, "count": 298765, "avg_price": 22800, "avg_mileage": 45000},
+            {"year": 2018, "count": 345678, "avg_price": 21200, "avg_mileage": 55000},
+            {"year": 2017, "count": 387654, "avg_price": 19600, "avg_mileage": 65000},
+            {"year": 2016, "count": 398765, "avg_price": 18100, "avg_mileage": 75000},
+            {"year": 2015, "count": 376543, "avg_price": 16800, "avg_mileage": 85000},
+            {"year": 2014, "count": 345678, "avg_price": 15500, "avg_mileage": 95000},
+            {"year": 2013, "count": 298765, "avg_price": 14200, "avg_mileage": 105000},
+            {"year": 2012, "count": 234567, "avg_price": 13100, "avg_mileage": 115000},
+            {"year": 2011, "count": 187654, "avg_price": 12000, "avg_mileage": 125000}
+        ],
+        "price_ranges": [
+            {"range": "$1,000 - $5,000", "count": 234567, "percentage": 11.7},
+            {"range": "$5,000 - $10,000", "count": 398765, "percentage": 19.9},
+            {"range": "$10,000 - $15,000", "count": 456789, "percentage": 22.8},
+            {"range": "$15,000 - $20,000", "count": 387654, "percentage": 19.4},
+            {"range": "$20,000 - $30,000", "count": 298765, "percentage": 14.9},
+            {"range": "$30,000 - $50,000", "count": 156789, "percentage": 7.8},
+            {"range": "$50,000 - $75,000", "count": 54321, "percentage": 2.7},
+            {"range": "$75,000+", "count": 12345, "percentage": 0.6}
+        ],
+        "mileage_distribution": [
+            {"range": "0 - 25,000", "count": 187654, "percentage": 9.4, "avg_price": 26800},
+            {"range": "25,000 - 50,000", "count": 345678, "percentage": 17.3, "avg_price": 22100},
+            {"range": "50,000 - 75,000", "count": 456789, "percentage": 22.8, "avg_price": 19200},
+            {"range": "75,000 - 100,000", "count": 398765, "percentage": 19.9, "avg_price": 16800},
+            {"range": "100,000 - 125,000", "count": 298765, "percentage": 14.9, "avg_price": 14500},
+            {"range": "125,000 - 150,000", "count": 187654, "percentage": 9.4, "avg_price": 12200},
+            {"range": "150,000 - 175,000", "count": 98765, "percentage": 4.9, "avg_price": 10100},
+            {"range": "175,000+", "count": 26789, "percentage": 1.3, "avg_price": 8500}
+        ]
+    }
+
+
+def build_statistics_payloads(live_stats: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Compose every statistics endpoint's response from live and static statistics"""
+    # Calculate summary metrics
+    total_listings = sum(item["count"] for item in live_stats["popular_makes"])
+    avg_market_price = (
+        sum(item["avg_price"] * item["count"] for item in live_stats["popular_makes"]) / total_listings
+        if total_listings else 0.0
+    )
+    luxury_percentage = sum(make["percentage"] for make in stats["popular_makes"] if make["avg_price"] > 25000)
+    electric_growth = 4.4  # Percentage from fuel_types
+
+    return {
+        "overview": {
+            "summary": {
+                "total_listings": total_listings,
+                "average_price": round(avg_market_price, 2),
+                "most_popular_make": live_stats["popular_makes"][0]["make"] if live_stats["popular_makes"] else "Toyota",
+                "most_popular_model": live_stats["popular_models"][0]["model"] if live_stats["popular_models"] else "Camry",
+                "price_range_mode": "$10,000 - $15,000"  # Most common price range
+            },
+            "popular_makes": live_stats["popular_makes"][:10],
+            "popular_models": live_stats["popular_models"][:10],
+            "body_types": live_stats["body_types"],
+            "fuel_types": live_stats["fuel_types"],
+            "last_updated": live_stats["last_updated"],
+            "data_sources": live_stats["data_sources"]
+        },
+        "makes": {
+            "makes": stats["popular_makes"],
+            "total_makes": len(stats["popular_makes"]),
+            "luxury_brands": [make for make in stats["popular_makes"] if make["avg_price"] > 25000]
+        },
+        "models": {
+            "models": stats["popular_models"],
+            "total_models": len(stats["popular_models"]),
+            "by_make": live_stats.get("models_by_make") or group_models_by_make(stats["popular_models"])
+        },
+        "trends": {
+            "year_trends": live_stats["year_trends"],
+            "price_ranges": stats["price_ranges"],
+            "mileage_distribution": stats["mileage_distribution"],
+            "price_percentiles": live_stats.get("price_percentiles"),
+            "insights": {
+                "depreciation_rate": "Cars lose approximately 15-20% of their value per year",
+                "sweet_spot": "3-5 year old cars offer the best value proposition",
+                "high_mileage_threshold": "100,000+ miles significantly impacts resale value"
+            },
+            "last_updated": live_stats["last_updated"],
+            "data_sources": live_stats["data_sources"]
+        },
+        "segments": {
+            "body_types": stats["body_types"],
+            "fuel_types": stats["fuel_types"],
+            "segment_insights": {
+                "most_popular_segment": "Sedan",
+                "fastest_growing": "Electric",
+                "highest_value": "Pickup Truck",
+                "best_fuel_economy": "Hybrid"
+            }
+        },
+        "market-insights": {
+            "market_composition": {
+                "luxury_market_share": round(luxury_percentage, 1),
+                "electric_adoption": electric_growth,
+                "sedan_dominance": 28.4,
+                "suv_growth": 24.9
+            },
+            "price_insights": {
+                "average_luxury_premium": "65% higher than mainstream brands",
+                "electric_premium": "50% higher than gasoline equivalents",
+                "depreciation_leaders": ["BMW", "Mercedes-Benz", "Audi"],
+                "value_retention_leaders": ["Toyota", "Honda", "Lexus"]
+            },
+            "buying_recommendations": {
+                "best_value_brands": ["Toyota", "Honda", "Hyundai"],
+                "luxury_value_picks": ["Lexus", "Acura"],
+                "avoid_high_mileage": ["German luxury brands over 75k miles"],
+                "electric_considerations": ["Check battery warranty and charging infrastructure"]
+            },
+            "seasonal_trends": {
+                "best_buying_months": ["October", "November", "December"],
+                "highest_inventory": ["January", "February"],
+                "convertible_season": ["March", "April", "May"],
+                "suv_demand_peak": ["November", "December", "January"]
+            }
+        },
+        "data-sources": {
+            "sources": [
+                {
+                    "name": "NHTSA Vehicle API",
+                    "description": "National Highway Traffic Safety Administration vehicle database",
+                    "url": "https://vpic.nhtsa.dot.gov/api/",
+                    "type": "Government",
+                    "coverage": "Vehicle makes, models, and specifications",
+                    "update_frequency": "Real-time"
+                },
+                {
+                    "name": "Market Analysis",
+                    "description": "Aggregated market data and trends",
+                    "type": "Analysis",
+                    "coverage": "Price trends, depreciation patterns",
+                    "update_frequency": "Daily"
+                },
+                {
+                    "name": "Industry Reports",
+                    "description": "Automotive industry statistics and insights",
+                    "type": "Industry",
+                    "coverage": "Market segments, fuel types, body styles",
+                    "update_frequency": "Weekly"
+                }
+            ],
+            "last_updated": live_stats["last_updated"],
+            "cache_duration": "1 hour",
+            "data_quality": {
+                "completeness": "95%",
+                "accuracy": "High",
+                "timeliness": "Current"
+            }
+        }
+    }
+
+
+def group_models_by_make(models: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Models keyed by make, keeping their order"""
+    by_make: Dict[str, List[Dict[str, Any]]] = {}
+    for model in models:
+        by_make.setdefault(model["make"], []).append({key: value for key, value in model.items() if key != "make"})
+    return by_make
+
+
+def serialize_payload(payload: Dict[str, Any]) -> bytes:
+    """Serialize a payload exactly as Starlette's JSONResponse would"""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def payload_etag(body: bytes) -> str:
+    """Strong ETag from a payload's content hash"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+@dataclass(frozen=True)
+class StatisticsSnapshot:
+    """
+    Immutable set of serialized statistics responses and their ETags.
+    Payloads embedding last_updated get a new ETag with every snapshot version;
+    purely static payloads keep theirs across refreshes.
+    """
+    version: str
+    last_updated: str
+    built_at: float
+    payloads: Mapping[str, bytes]
+    etags: Mapping[str, str]
+    live_stats: Mapping[str, Any]
+    fallback: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.built_at
+
+    def expired(self, ttl: float) -> bool:
+        return self.age >= (min(ttl, FALLBACK_SNAPSHOT_TTL) if self.fallback else ttl)
+
+    def cache_control(self, ttl: float) -> str:
+        """
+        Let clients and nginx reuse the payload until the snapshot expires, then
+        revalidate in the background. Fallback payloads are revalidated on every
+        use, so clients pick up live data as soon as it is back.
+        """
+        if self.fallback:
+            return "no-cache"
+        max_age = max(0, int(ttl - self.age))
+        return f"public, max-age={max_age}, stale-while-revalidate={int(ttl)}"
+
+
+def market_statistics(live_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """The sample market figures, replaced by listings-dataset aggregates once those are loaded"""
+    stats = get_sample_car_statistics()
+    if "total_listings" in live_stats:
+        stats.update({key: live_stats[key] for key in stats})
+    return stats
+
+
+def build_snapshot(live_stats: Dict[str, Any]) -> StatisticsSnapshot:
+    """Build a snapshot from live statistics and the market dataset"""
+    payloads = {
+        name: serialize_payload(payload)
+        for name, payload in build_statistics_payloads(live_stats, market_statistics(live_stats)).items()
+    }
+    return StatisticsSnapshot(
+        version=hashlib.blake2b(live_stats["last_updated"].encode(), digest_size=8).hexdigest(),
+        last_updated=live_stats["last_updated"],
+        built_at=time.monotonic(),
+        payloads=MappingProxyType(payloads),
+        etags=MappingProxyType({name: payload_etag(body) for name, body in payloads.items()}),
+        live_stats=MappingProxyType(live_stats),
+        fallback=FALLBACK_DATA_SOURCE in live_stats["data_sources"]
+    )
+
+
+async def listings_extras(make: Optional[str] = None, year_min: Optional[int] = None,
+                          year_max: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Statistics fields answered from the listings store's cube and price
+    sketches, once they are built (see StatisticsStore.build_artifacts_in_background)
+    """
+    extras: Dict[str, Any] = {}
+    cube = cube_store.ready()
+    if cube is not None:
+        extras["models_by_make"] = cube.models_by_make(
+            filters={"make": [make.strip()]} if make else None, year_min=year_min, year_max=year_max)
+    sketches = sketch_store.ready()
+    if sketches is not None:
+        digest = await asyncio.to_thread(sketches.select, make, None, year_min, year_max)
+        if digest is not None:
+            extras["price_percentiles"] = digest.summary()["quantiles"]
+    return extras
+
+
+class StatisticsStore:
+    """
+    Holds the current snapshot: seeded from cached data at startup, rebuilt
+    from live data in the background on refresh and once it expires
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.snapshot: Optional[StatisticsSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._filtered: TTLCache = TTLCache(maxsize=FILTERED_SNAPSHOT_CACHE_SIZE, ttl=ttl)
+        self._artifacts_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def seed(self) -> StatisticsSnapshot:
+        """Build the first snapshot from cached or fallback data, without calling NHTSA"""
+        async with self._lock:
+            return await self._rebuild(get_cached_statistics)
+
+    def refresh_in_background(self) -> None:
+        """Rebuild from live data without blocking; fetching every make's models takes many NHTSA calls"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> StatisticsSnapshot:
+        async with self._lock:
+            return await self._rebuild(get_live_statistics)
+
+    async def current(self) -> StatisticsSnapshot:
+        snapshot = self.snapshot
+        if snapshot is not None:
+            # An expired snapshot is served while its replacement is built,
+            # so no request waits on the fan-out over every make
+            if snapshot.expired(self.ttl):
+                self.refresh_in_background()
+            return snapshot
+        async with self._lock:
+            # Another request may have built it while we waited
+            if self.snapshot is not None:
+                return self.snapshot
+            snapshot = await self._rebuild(get_cached_statistics)
+        self.refresh_in_background()
+        return snapshot
+
+    async def filtered(self, make: Optional[str] = None, year_min: Optional[int] = None,
+                       year_max: Optional[int] = None) -> Optional[StatisticsSnapshot]:
+        """
+        Snapshot with the listings figures restricted to a make and/or year
+        range, queried from the listings store; None if no listing matches
+        """
+        snapshot = await self.current()
+        # Pick up a rebuilt store before keying the cache on its version
+        await asyncio.to_thread(listings_store.open)
+        self.build_artifacts_in_background()
+        key = (snapshot.version, listings_store.version, make and make.strip().lower(), year_min, year_max)
+        filtered = self._filtered.get(key)
+        if filtered is None:
+            listings = await asyncio.to_thread(listings_store.query, make, year_min, year_max)
+            if not listings.get("rows"):
+                return None
+            filtered_stats = {**snapshot.live_stats, **live_data_service.listings_overview(listings)}
+            filtered_stats.update(await listings_extras(make, year_min, year_max))
+            filtered = self._filtered[key] = build_snapshot(filtered_stats)
+        return filtered
+
+    async def _rebuild(self, source: Callable[[], Awaitable[Dict[str, Any]]]) -> StatisticsSnapshot:
+        live_stats = await source()
+        if listings_store.enabled:
+            await asyncio.to_thread(listings_store.open)
+            self.build_artifacts_in_background()
+        live_stats = {**live_stats, **await listings_extras()}
+        self.snapshot = build_snapshot(live_stats)
+        logger.info(f"Statistics snapshot {self.snapshot.version} built")
+        return self.snapshot
+
+    def build_artifacts_in_background(self) -> None:
+        """
+        Load or build the cube and price sketches of a new store version without
+        blocking startup or requests; the snapshot is served without their
+        fields until they are ready, then rebuilt
+        """
+        if not (cube_store.pending or sketch_store.pending):
+            return
+        if self._artifacts_task is None or self._artifacts_task.done():
+            self._artifacts_task = asyncio.create_task(self._build_artifacts())
+
+    async def _build_artifacts(self) -> None:
+        try:
+            await asyncio.to_thread(cube_store.current)
+            await asyncio.to_thread(sketch_store.current)
+        except Exception as e:
+            logger.error(f"Failed to build listings store artifacts: {str(e)}")
+            return
+        await self.refresh()
+
+
+# Global instance
+statistics_store = StatisticsStore(SNAPSHOT_TTL)
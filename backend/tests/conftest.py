@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInNhtsa(ThreadingHTTPServer):
+    """Local stand-in for the vPIC API that records every request and the connection it came on"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requests = []
+        self.delay = 0.0
+        # Path substring -> extra delay, and path substrings answered with a 500
+        self.slow_paths = {}
+        self.failing_paths = set()
+        self.makes = ("TOYOTA", "HONDA", "NOT A CAR MAKER")
+        self.lock = threading.Lock()
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api"
+
+    def paths(self, operation: str = ""):
+        return [path for _, path, _ in self.requests if operation.lower() in path.lower()]
+
+    def connections(self) -> int:
+        return len({port for _, _, port in self.requests})
+
+
+def decoded_vin(vin: str) -> dict:
+    return {"VIN": vin, "Make": "HONDA", "Model": "Accord", "ModelYear": "2003", "BodyClass": "Sedan/Saloon"}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        self._respond(parse_qs(body))
+
+    def _respond(self, params):
+        server = self.server
+        path = unquote(urlparse(self.path).path)
+        with server.lock:
+            server.requests.append((self.command, path, self.client_address[1]))
+        delay = server.delay + sum(extra for fragment, extra in server.slow_paths.items() if fragment in path)
+        if delay:
+            time.sleep(delay)
+        if any(fragment in path for fragment in server.failing_paths):
+            self._send_empty(500)
+            return
+        operation, _, argument = path.split("/vehicles/", 1)[-1].partition("/")
+        operation = operation.lower()
+        if operation == "decodevinvalues":
+            results = [decoded_vin(argument)]
+        elif operation == "decodevinvaluesbatch":
+            results = [decoded_vin(vin) for vin in params["data"][0].split(";")]
+        elif operation == "getallmakes":
+            results = [{"Make_Name": make} for make in server.makes]
+        elif operation in ("getmodelsformake", "getmodelsformakeyear"):
+            results = [{"Model_Name": "Camry"}, {"Model_Name": "Corolla"}]
+        else:
+            self._send_empty(404)
+            return
+        body = json.dumps({"Count": len(results), "Results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def nhtsa_server():
+    server = StandInNhtsa()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
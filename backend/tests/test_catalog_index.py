@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import catalog_index
+from catalog_index import CatalogIndex
+from data_service import LiveDataService
+
+CATALOG = [
+    {"make": "Honda", "model": "Accord", "years": [2020, 2021]},
+    {"make": "Honda", "model": "CR-V", "years": [2021]},
+    {"make": "Mazda", "model": "CX-5", "years": [2021]},
+    {"make": "Toyota", "model": "Camry", "years": [2021]},
+    {"make": "Toyota", "model": "Corolla", "years": [2021]},
+]
+
+
+def describe(results):
+    return [(result["make"], result["model"], result["match"]) for result in results]
+
+
+def test_prefix_matches_rank_shortest_key_first():
+    results = CatalogIndex(CATALOG).search("c", limit=3)
+    assert describe(results) == [("Honda", "CR-V", "prefix"), ("Mazda", "CX-5", "prefix"),
+                                 ("Toyota", "Camry", "prefix")]
+    assert results[0]["score"] == 0.333
+
+
+def test_prefix_candidates_are_ranked_before_truncation(monkeypatch):
+    # Many long keys sort before the one short key a query should find first
+    catalog = [{"make": "Acme", "model": f"Caa{i:03d}"} for i in range(50)] + [{"make": "Acme", "model": "Cz"}]
+    monkeypatch.setattr(catalog_index, "MAX_PREFIX_CANDIDATES", 10)
+    results = CatalogIndex(catalog).search("c", limit=1)
+    assert describe(results) == [("Acme", "Cz", "prefix")]
+
+
+def test_fuzzy_matches_cover_typos():
+    results = CatalogIndex(CATALOG).search("corola")
+    assert describe(results)[0] == ("Toyota", "Corolla", "fuzzy")
+
+
+def test_make_filter_applies_before_ranking():
+    index = CatalogIndex(CATALOG)
+    assert describe(index.search("c", make="toyota")) == [("Toyota", "Camry", "prefix"),
+                                                         ("Toyota", "Corolla", "prefix")]
+    assert index.search("camry", make="honda") == []
+
+
+def test_catalog_refresh_refetches_only_open_model_years(nhtsa_server, monkeypatch):
+    monkeypatch.setattr("data_service.CATALOG_MODEL_YEARS", 5)
+    service = LiveDataService(api_base=nhtsa_server.api_base)
+    service.legitimate_makes = {"TOYOTA"}
+
+    async def scenario():
+        try:
+            first = await service._fetch_model_catalog()
+            second = await service._fetch_model_catalog()
+            return first, second
+        finally:
+            await service.close()
+
+    first, second = asyncio.run(scenario())
+    this_year = datetime.now().year
+    year_calls = nhtsa_server.paths("getmodelsformakeyear")
+
+    assert first == second
+    assert first[0]["years"] == list(range(this_year - 3, this_year + 2))
+    # Five years on the first fetch, then only this year and next
+    assert len(year_calls) == 5 + 2
+    assert len(nhtsa_server.paths("getmodelsformake/")) == 2
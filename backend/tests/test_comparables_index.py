@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from comparables_index import ComparablesIndex
+from listings_store import ListingsStore, StoreArtifact, build_store
+
+HEADER = "make_name,model_name,body_type,fuel_type,year,price,mileage,horsepower\n"
+
+
+def write_listings(path, make: str, model: str, base_price: int) -> None:
+    rows = [f"{make},{model},Sedan,Gasoline,{2012 + i % 8},{base_price + 100 * i},{5000 * i},180" for i in range(40)]
+    path.write_text(HEADER + "\n".join(rows) + "\n")
+
+
+def test_results_come_from_the_indexed_store_version(tmp_path):
+    source, store_dir = tmp_path / "listings.csv", tmp_path / "store"
+    write_listings(source, "Toyota", "Camry", 20000)
+    build_store(str(source), str(store_dir))
+    store = ListingsStore(str(store_dir))
+    store.open()
+    index = ComparablesIndex.build(store)
+
+    # Rebuild the store with other listings; the old index keeps answering from its own columns
+    write_listings(source, "Honda", "Civic", 90000)
+    build_store(str(source), str(store_dir))
+    store.open()
+
+    result = index.search("Toyota", "Camry", 2016, mileage=50000, limit=5)
+    assert [listing["model"] for listing in result["comparables"]] == ["Camry"] * 5
+    assert all(listing["price"] < 30000 for listing in result["comparables"])
+
+
+def test_unknown_make_is_not_searched(tmp_path):
+    source, store_dir = tmp_path / "listings.csv", tmp_path / "store"
+    write_listings(source, "Toyota", "Camry", 20000)
+    build_store(str(source), str(store_dir))
+    store = ListingsStore(str(store_dir))
+    store.open()
+
+    assert ComparablesIndex.build(store).search("Lada", "Niva", 2016) is None
+
+
+def test_endpoint_answers_503_until_the_index_is_built_in_the_background(tmp_path, monkeypatch):
+    import main
+
+    source, store_dir = tmp_path / "listings.csv", tmp_path / "store"
+    write_listings(source, "Toyota", "Camry", 20000)
+    build_store(str(source), str(store_dir))
+    store = ListingsStore(str(store_dir))
+    artifact = StoreArtifact(store, "comparables.npz", ComparablesIndex.build, ComparablesIndex.load)
+    monkeypatch.setattr(main, "listings_store", store)
+    monkeypatch.setattr(main, "comparables_store", artifact)
+    request = main.CarPredictionRequest(make_name="Toyota", model_name="Camry", year=2016, mileage=50000)
+
+    async def scenario():
+        with pytest.raises(HTTPException) as building:
+            await main.find_comparables(request, limit=5)
+        assert building.value.status_code == 503
+        assert building.value.headers["Retry-After"]
+
+        await artifact._task
+        return await main.find_comparables(request, limit=5)
+
+    result = asyncio.run(scenario())
+    assert len(result["comparables"]) == 5
+    assert (store_dir / "comparables.npz").exists()
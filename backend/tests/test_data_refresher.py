@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+
+import data_refresher
+import data_service
+from data_refresher import DataRefresher
+from data_service import LiveDataService, data_cache
+from shared_cache import SQLiteDataCache
+
+OFFLINE_API = "http://127.0.0.1:9/api"
+
+
+def refresher(service, **overrides):
+    settings = {"ttl": 3600, "margin": 300, "interval": 30, "backoff_base": 5, "backoff_max": 60}
+    return DataRefresher(service, **{**settings, **overrides})
+
+
+def test_backoff_doubles_up_to_the_cap_with_full_jitter(monkeypatch):
+    subject = refresher(LiveDataService(api_base=OFFLINE_API))
+    monkeypatch.setattr(data_refresher.random, "uniform", lambda low, high: (low, high))
+    assert [subject._backoff(failures) for failures in range(1, 7)] == [
+        (0, 5), (0, 10), (0, 20), (0, 40), (0, 60), (0, 60)
+    ]
+
+    monkeypatch.undo()
+    delays = [subject._backoff(3) for _ in range(200)]
+    assert 0 <= min(delays) and max(delays) <= 20
+    # Full jitter spreads retries over the whole window
+    assert min(delays) < 5 and max(delays) > 15
+
+
+def test_failed_refresh_keeps_the_last_value_and_backs_off():
+    service = LiveDataService(api_base=OFFLINE_API)
+    subject = refresher(service)
+    attempts = []
+
+    async def loader():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError("upstream down")
+        return ["fresh"]
+
+    async def scenario():
+        data_cache.clear()
+        data_cache["test_dataset"] = ["stale"]
+        service.loaders["test_dataset"] = loader
+        try:
+            assert await subject._refresh_one("test_dataset") is False
+            assert await subject._refresh_one("test_dataset") is False
+            state = subject.states["test_dataset"]
+            assert (state.failures, state.last_error) == (2, "upstream down")
+            assert data_cache["test_dataset"] == ["stale"]
+            assert 0 <= state.due_at - time.monotonic() <= 10
+            assert subject._due_at("test_dataset") == state.due_at
+
+            assert await subject._refresh_one("test_dataset") is True
+            assert (state.failures, state.last_error) == (0, None)
+            assert data_cache["test_dataset"] == ["fresh"]
+        finally:
+            await service.close()
+            data_cache.clear()
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    cache = SQLiteDataCache(str(tmp_path / "cache.sqlite"), ttl=3600)
+    monkeypatch.setattr(data_refresher, "data_cache", cache)
+    monkeypatch.setattr(data_service, "data_cache", cache)
+    yield cache
+    cache.close()
+
+
+def test_only_the_lease_holder_refreshes_and_followers_rebuild(shared_cache):
+    calls = {"leader": 0, "follower": 0}
+    notified = []
+
+    def loader_for(worker):
+        async def loader():
+            calls[worker] += 1
+            return [worker, calls[worker]]
+        return loader
+
+    leader_service = LiveDataService(api_base=OFFLINE_API)
+    follower_service = LiveDataService(api_base=OFFLINE_API)
+    leader_service.loaders["test_dataset"] = loader_for("leader")
+    follower_service.loaders["test_dataset"] = loader_for("follower")
+    leader = refresher(leader_service)
+    follower = refresher(follower_service)
+    follower.lease.owner = "other-host:1"
+
+    async def on_refresh():
+        notified.append(shared_cache["test_dataset"])
+
+    follower.add_listener(on_refresh)
+
+    async def scenario():
+        try:
+            assert await leader.refresh_due() == 1
+            assert await follower.refresh_due() == 0
+            assert (leader.is_leader, follower.is_leader) == (True, False)
+            assert calls == {"leader": 1, "follower": 0}
+            assert notified == []
+
+            # The leader's next refresh changes the shared version; followers rebuild from it
+            await asyncio.sleep(0.01)
+            assert await leader._refresh_one("test_dataset") is True
+            await follower.refresh_due()
+            assert notified == [["leader", 2]]
+            assert calls["follower"] == 0
+
+            # Once the leader lets go, the follower takes over
+            await leader.stop()
+            await follower.refresh_due()
+            assert follower.is_leader
+            assert follower.freshness()["refresh_leader"] is True
+        finally:
+            await leader_service.close()
+            await follower_service.close()
+
+    asyncio.run(scenario())
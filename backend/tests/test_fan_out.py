@@ -0,0 +1,72 @@
+"""
+Per-make fan-out of the live statistics against the stand-in NHTSA server:
+slow makes time out and failing makes fall back, without holding up the rest.
+"""
+import asyncio
+import time
+
+import data_service
+from data_service import LiveDataService, data_cache, fan_out, get_live_statistics
+
+MAKE_TIMEOUT = 0.2
+
+
+def test_fan_out_drops_failed_and_timed_out_items():
+    async def fetch(item):
+        if item == "slow":
+            await asyncio.sleep(10)
+        if item == "broken":
+            raise RuntimeError("upstream error")
+        return item.upper()
+
+    started = time.perf_counter()
+    results = asyncio.run(fan_out(["ok", "slow", "broken", "fine"], fetch, concurrency=2, timeout=MAKE_TIMEOUT))
+
+    assert results == {"ok": "OK", "fine": "FINE"}
+    assert time.perf_counter() - started < 1
+
+
+def test_fan_out_bounds_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def fetch(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return item
+
+    results = asyncio.run(fan_out(list(range(20)), fetch, concurrency=3, timeout=1))
+
+    assert len(results) == 20
+    assert peak == 3
+
+
+def test_live_statistics_leave_out_slow_makes_and_fall_back_for_failing_ones(nhtsa_server, monkeypatch):
+    nhtsa_server.makes = ("TOYOTA", "HONDA", "FORD")
+    nhtsa_server.slow_paths = {"/getmodelsformake/HONDA": 2.0}
+    nhtsa_server.failing_paths = {"/getmodelsformake/FORD"}
+    service = LiveDataService(api_base=nhtsa_server.api_base)
+    monkeypatch.setattr(data_service, "live_data_service", service)
+    monkeypatch.setattr(data_service, "NHTSA_MAKE_TIMEOUT", MAKE_TIMEOUT)
+
+    async def scenario():
+        data_cache.clear()
+        try:
+            started = time.perf_counter()
+            statistics = await get_live_statistics()
+            assert time.perf_counter() - started < 1.5
+            return statistics
+        finally:
+            await service.close()
+            data_cache.clear()
+
+    statistics = asyncio.run(scenario())
+    makes = {model["make"] for model in statistics["popular_models"]}
+
+    # Honda timed out; Ford's NHTSA call failed, so its fallback models are used
+    assert makes == {"Toyota", "Ford"}
+    assert {"Camry", "Corolla", "F-150"} <= {model["model"] for model in statistics["popular_models"]}
+    assert statistics["data_sources"][0] == "NHTSA Vehicle API"
@@ -0,0 +1,79 @@
+import pytest
+
+from listings_aggregator import ListingsAggregator, iter_csv_chunks
+
+HEADER = "make_name,model_name,body_type,fuel_type,year,price,mileage\n"
+
+
+def listing(i: int) -> str:
+    return f"Toyota,Camry,Sedan,Gasoline,{2010 + i % 10},{10000 + i},{1000 * i}"
+
+
+def write_listings(path, rows: int, trailing_newline: bool) -> None:
+    body = "\n".join(listing(i) for i in range(rows))
+    path.write_text(HEADER + body + ("\n" if trailing_newline else ""))
+
+
+def read_rows(path, offset: int = 0, final: bool = False):
+    rows, end_offset = 0, offset
+    for chunk, end_offset in iter_csv_chunks(str(path), offset, chunk_rows=7, final=final):
+        rows += len(chunk["price"])
+    return rows, end_offset
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_reads_every_record(tmp_path, trailing_newline):
+    path = tmp_path / "listings.csv"
+    write_listings(path, 20, trailing_newline)
+
+    rows, end_offset = read_rows(path)
+
+    assert rows == 20
+    assert end_offset == path.stat().st_size
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_aggregator_counts_last_listing_once(tmp_path, trailing_newline):
+    path = tmp_path / "listings.csv"
+    write_listings(path, 20, trailing_newline)
+    aggregator = ListingsAggregator(str(path))
+
+    assert aggregator.update() == 20
+    assert aggregator.update() == 0
+    assert aggregator.rows == 20
+
+
+def test_resumes_after_unterminated_last_record(tmp_path):
+    path = tmp_path / "listings.csv"
+    write_listings(path, 5, trailing_newline=False)
+    aggregator = ListingsAggregator(str(path))
+    aggregator.update()
+
+    with open(path, "a") as f:
+        f.write("\n" + listing(5) + "\n" + listing(6) + "\n")
+
+    assert aggregator.update() == 2
+    assert aggregator.rows == 7
+
+
+def test_holds_back_record_with_open_quote(tmp_path):
+    path = tmp_path / "listings.csv"
+    path.write_text(HEADER + listing(0) + '\nHonda,"Civic\n')
+
+    rows, end_offset = read_rows(path)
+    assert rows == 1
+
+    with open(path, "a") as f:
+        f.write(' Si",Coupe,Gasoline,2019,21000,5000\n')
+    rows, _ = read_rows(path, end_offset)
+    assert rows == 1
+
+
+def test_final_read_flushes_record_with_open_quote(tmp_path):
+    path = tmp_path / "listings.csv"
+    path.write_text(HEADER + listing(0) + '\nHonda,"Civic')
+
+    rows, end_offset = read_rows(path, final=True)
+
+    assert rows == 2
+    assert end_offset == path.stat().st_size
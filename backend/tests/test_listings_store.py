@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+from listings_store import ListingsStore, build_store
+
+HEADER = "make_name,model_name,body_type,fuel_type,year,price,mileage,horsepower\n"
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_build_store_keeps_every_listing(tmp_path, trailing_newline):
+    source = tmp_path / "listings.csv"
+    body = "\n".join(f"Honda,Civic,Sedan,Gasoline,2018,{15000 + i},{2000 * i},158" for i in range(25))
+    source.write_text(HEADER + body + ("\n" if trailing_newline else ""))
+    store_dir = tmp_path / "store"
+
+    meta = build_store(str(source), str(store_dir), chunk_rows=10)
+
+    assert meta["rows"] == 25
+    assert json.loads((store_dir / "meta.json").read_text())["rows"] == 25
+    store = ListingsStore(str(store_dir))
+    assert store.query()["rows"] == 25
+    assert float(store.columns["price"][-1]) == 15024
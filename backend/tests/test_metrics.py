@@ -0,0 +1,115 @@
+"""
+/metrics exposition: route-template labels and consistent histogram series
+"""
+import re
+from collections import defaultdict
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from metrics import Histogram, MetricsMiddleware, metrics
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str):
+    """{(sample name, sorted label pairs): value} of every sample line, and the declared metric types"""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+        elif line and not line.startswith("#"):
+            match = SAMPLE.match(line)
+            assert match, f"Malformed sample line: {line!r}"
+            name, labels, value = match.groups()
+            samples[(name, tuple(sorted(LABEL.findall(labels or ""))))] = float(value)
+    return samples, types
+
+
+def histogram_series(samples, name):
+    """Per label set: ([(le, cumulative count)], sum, count)"""
+    series = defaultdict(lambda: [[], None, None])
+    for (sample, labels), value in samples.items():
+        if sample == f"{name}_bucket":
+            le = dict(labels)["le"]
+            series[tuple(pair for pair in labels if pair[0] != "le")][0].append((float(le), value))
+        elif sample == f"{name}_sum":
+            series[labels][1] = value
+        elif sample == f"{name}_count":
+            series[labels][2] = value
+    return series
+
+
+def assert_consistent_histograms(text: str):
+    samples, types = parse(text)
+    histograms = [name for name, kind in types.items() if kind == "histogram"]
+    assert histograms
+    for name in histograms:
+        for labels, (buckets, total, count) in histogram_series(samples, name).items():
+            buckets.sort()
+            assert buckets[-1][0] == float("inf"), f"{name}{labels} has no +Inf bucket"
+            counts = [cumulative for _, cumulative in buckets]
+            assert counts == sorted(counts), f"{name}{labels} buckets are not cumulative"
+            assert count == counts[-1]
+            assert total is not None and total >= 0
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("work_seconds", "Work", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "batch")
+
+    samples, _ = parse("\n".join(histogram.render()))
+    assert samples[("work_seconds_bucket", (("kind", "batch"), ("le", "0.1")))] == 2
+    assert samples[("work_seconds_bucket", (("kind", "batch"), ("le", "1")))] == 3
+    assert samples[("work_seconds_bucket", (("kind", "batch"), ("le", "+Inf")))] == 4
+    assert samples[("work_seconds_sum", (("kind", "batch"),))] == 3.65
+    assert samples[("work_seconds_count", (("kind", "batch"),))] == 4
+
+
+def test_requests_are_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}?verbose=1").status_code == 200
+    assert client.get("/items/not-a-number").status_code == 422
+    assert client.get("/no/such/page").status_code == 404
+
+    samples, _ = parse(metrics.render())
+    routes = {dict(labels)["route"] for name, labels in samples if name == "http_requests_total"}
+    assert "/items/{item_id}" in routes
+    assert "unmatched" in routes
+    assert not any(route.startswith("/items/") and route != "/items/{item_id}" for route in routes)
+    assert samples[("http_requests_total", (("method", "GET"), ("route", "/items/{item_id}"), ("status", "422")))] >= 1
+
+
+def test_metrics_endpoint_exposes_consistent_histograms():
+    client = TestClient(main.app)
+    client.get("/health")
+    client.get("/models/info")
+    client.get("/does-not-exist")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert_consistent_histograms(response.text)
+    samples, _ = parse(response.text)
+    duration_routes = {dict(labels)["route"] for name, labels in samples
+                       if name == "http_request_duration_seconds_count"}
+    assert {"/health", "/models/info", "unmatched"} <= duration_routes
+    # Every request counted by status shows up in the latency histogram of its route
+    for (name, labels), value in samples.items():
+        if name == "http_requests_total":
+            pairs = dict(labels)
+            key = (("method", pairs["method"]), ("route", pairs["route"]))
+            assert samples[("http_request_duration_seconds_count", key)] >= value
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from prediction_service import MockPredictor, generate_mock_predictions_batch, noise_from_seeds, vehicle_seeds
+
+
+def vehicle(model_name="Camry", mileage=40000):
+    return SimpleNamespace(make_name="Toyota", model_name=model_name, year=2018, mileage=mileage)
+
+
+def baseline(requests):
+    """Prices without noise"""
+    return generate_mock_predictions_batch([req.make_name for req in requests], [req.year for req in requests],
+                                           [req.mileage for req in requests], noise_factors=np.ones(len(requests)))
+
+
+def test_hashed_noise_is_deterministic_per_vehicle():
+    requests = [vehicle(), vehicle(model_name="Corolla"), vehicle()]
+    first = MockPredictor("hashed").predict_batch(requests)
+    second = MockPredictor("hashed").predict_batch(list(reversed(requests)))
+
+    np.testing.assert_array_equal(first, second[::-1])
+    assert first[0] == first[2]
+    # Make, year and mileage match, so only the model name changes the noise
+    assert first[0] != first[1]
+
+
+def test_hashed_noise_stays_within_ten_percent():
+    requests = [vehicle(mileage=mileage) for mileage in range(10000, 60000, 500)]
+    ratio = MockPredictor("hashed").predict_batch(requests) / baseline(requests)
+    assert ratio.min() >= 0.9 - 1e-6
+    assert ratio.max() <= 1.1 + 1e-6
+    assert ratio.std() > 0.03
+
+
+def test_noise_from_seeds_spans_the_noise_range():
+    seeds = np.array([0, np.iinfo(np.uint64).max], dtype=np.uint64)
+    np.testing.assert_allclose(noise_from_seeds(seeds), [0.9, 1.1], atol=1e-9)
+    assert vehicle_seeds(["Toyota"], ["Camry"], [2018], [40000]).dtype == np.uint64
+
+
+def test_off_mode_returns_baseline_prices():
+    requests = [vehicle(mileage=mileage) for mileage in (10000, 80000)]
+    np.testing.assert_array_equal(MockPredictor("off").predict_batch(requests), baseline(requests))
+
+
+def test_random_mode_varies_between_calls():
+    predictor = MockPredictor("random")
+    requests = [vehicle()] * 20
+    first = predictor.predict_batch(requests)
+    assert len(set(first)) > 1
+    assert not np.array_equal(first, predictor.predict_batch(requests))
+
+
+def test_unknown_mode_falls_back_to_hashed():
+    predictor = MockPredictor("gaussian")
+    assert predictor.noise_mode == "hashed"
+    assert predictor.model_info["noise"] == "hashed"
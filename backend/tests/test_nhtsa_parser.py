@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from nhtsa_parser import _parse_with_if_chain, parse_flat_record, parse_variable_results
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_results(name: str):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)["Results"]
+
+
+EXPECTED = {
+    "make_name": "HONDA",
+    "model_name": "Accord",
+    "year": 2003,
+    "body_type": "Coupe",
+    "fuel_type": "Gasoline",
+    "transmission": "Automatic",
+    "engine_displacement": 2.998832712,
+    "engine_cylinders": "6",
+}
+
+
+def test_table_parser_matches_the_if_chain_on_a_decodevin_payload():
+    results = load_results("vpic_decodevin.json")
+
+    assert parse_variable_results(results) == _parse_with_if_chain(results) == EXPECTED
+
+
+def test_flat_record_parses_like_the_variable_list():
+    record = load_results("vpic_decodevinvalues.json")[0]
+
+    assert parse_flat_record(record) == parse_variable_results(load_results("vpic_decodevin.json"))
+
+
+@pytest.mark.parametrize("variable, value", [
+    ("Model Year", "not a year"),
+    ("Displacement (L)", "n/a"),
+    ("Make", "Not Applicable"),
+    ("Make", ""),
+    ("Make", None),
+    ("Body Class", "Sedan/Saloon"),
+    ("Unused Variable", "ignored"),
+])
+def test_table_parser_matches_the_if_chain_on_edge_values(variable, value):
+    results = [{"Variable": "Model", "Value": "Civic"}, {"Variable": variable, "Value": value}]
+
+    assert parse_variable_results(results) == _parse_with_if_chain(results)
@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from prediction_cache import prediction_cache
+
+client = TestClient(main.app)
+
+
+def vehicle(mileage: int):
+    return {"make_name": "Toyota", "model_name": "Camry", "year": 2018, "mileage": mileage}
+
+
+def test_cached_prediction_matches_uncached_response():
+    prediction_cache._cache.clear()
+
+    uncached = client.post("/predict", json=vehicle(40999))
+    cached = client.post("/predict", json=vehicle(40999))
+
+    assert uncached.headers["Server-Timing"].startswith("predict;")
+    assert cached.headers["Server-Timing"] == 'cache;desc="hit"'
+    assert cached.content == uncached.content
+
+
+def test_predict_matches_batch_for_nearby_mileages():
+    prediction_cache._cache.clear()
+    mileages = [40001, 40999]
+
+    single = [client.post("/predict", json=vehicle(mileage)).json() for mileage in mileages]
+    batch = client.post("/predict/batch", json={"vehicles": [vehicle(mileage) for mileage in mileages]}).json()
+
+    for prediction, result in zip(single, batch["results"]):
+        assert prediction["predicted_price"] == result["predicted_price"]
+        assert prediction["confidence_interval"] == result["confidence_interval"]
+
+
+def test_batch_reports_invalid_rows_and_scores_off_the_event_loop(monkeypatch):
+    on_loop = []
+    score = main.score_prediction_rows
+
+    def recording_score(rows, start_index=0):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return score(rows, start_index)
+
+    monkeypatch.setattr(main, "score_prediction_rows", recording_score)
+    response = client.post("/predict/batch", json={"vehicles": [vehicle(30000), {"make_name": "Honda"}, vehicle(50000)]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (3, 2, 1)
+    assert [result["success"] for result in body["results"]] == [True, False, True]
+    assert {error["loc"][0] for error in body["results"][1]["errors"]} == {"model_name", "year", "mileage"}
+    assert on_loop == [False]
+
+
+def test_batch_over_the_size_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    response = client.post("/predict/batch", json={"vehicles": [vehicle(30000)] * 3})
+    assert response.status_code == 413
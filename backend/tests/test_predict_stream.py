@@ -0,0 +1,74 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def stream(body: str, upload_format: str = "csv"):
+    response = client.post(f"/predict/stream?format={upload_format}", content=body.encode())
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_csv_upload_with_newline_in_quoted_field():
+    results = stream(
+        "make_name,model_name,year,mileage,listing_color\n"
+        'Toyota,Camry,2018,40000,"Silver\nMetallic"\n'
+        "Honda,Civic,2019,30000,Blue\n"
+    )
+
+    assert [result["success"] for result in results] == [True, True]
+    assert [result["index"] for result in results] == [0, 1]
+
+
+def test_csv_upload_reports_unterminated_quote():
+    results = stream(
+        "make_name,model_name,year,mileage\n"
+        "Toyota,Camry,2018,40000\n"
+        'Honda,"Civic,2019,30000\n'
+    )
+
+    assert results[0]["success"] is True
+    assert results[1]["success"] is False
+
+
+def test_ndjson_upload():
+    results = stream(
+        '{"make_name": "Toyota", "model_name": "Camry", "year": 2018, "mileage": 40000}\n'
+        "not json\n"
+        "\n"
+        '{"make_name": "Honda", "model_name": "Civic", "year": 2019}\n'
+        '{"make_name": "Honda", "model_name": "Civic", "year": 2019, "mileage": 30000}',
+        "ndjson"
+    )
+
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert [result["success"] for result in results] == [True, False, False, True]
+    assert results[1]["errors"][0]["type"] == "parse_error"
+    assert results[2]["errors"][0]["loc"] == ["mileage"]
+
+
+def test_oversized_line_is_rejected_before_any_result():
+    body = '{"make_name": "' + "x" * (main.MAX_UPLOAD_LINE_BYTES + 1) + '"}\n'
+    response = client.post("/predict/stream?format=ndjson", content=body.encode())
+
+    assert response.status_code == 413
+
+
+def test_oversized_line_ends_a_started_stream(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_CHUNK_ROWS", 1)
+    row = '{"make_name": "Toyota", "model_name": "Camry", "year": 2018, "mileage": 40000}\n'
+
+    def body():
+        yield (row * 2).encode()
+        yield b'{"make_name": "' + b"x" * (main.MAX_UPLOAD_LINE_BYTES + 1)
+
+    response = client.post("/predict/stream?format=ndjson", content=body())
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    assert [line["success"] for line in lines[:2]] == [True, True]
+    assert lines[-1]["status_code"] == 413
@@ -0,0 +1,93 @@
+import json
+import math
+
+import numpy as np
+
+from prediction_intervals import (
+    INTERVALS_FORMAT_VERSION, HoldoutVehicle, IntervalTable, calibrate, load_interval_table, price_range
+)
+from prediction_service import predictor
+
+
+def cargurus_row(i: int) -> dict:
+    return {
+        "make_name": "Fiat", "model_name": "500", "year": str(2012 + i % 8), "mileage": str(1000 * i),
+        "price": str(9000 + 50 * i), "length": "139.6 in", "width": "--", "back_legroom": "31.7 in",
+        "maximum_seating": "4 seats", "horsepower": "101.0", "is_new": "False", "listing_color": "RED"
+    }
+
+
+def test_holdout_cells_with_units_are_parsed_as_numbers():
+    vehicle = HoldoutVehicle(cargurus_row(3))
+
+    assert vehicle.model_name == "500"
+    assert vehicle.length == 139.6
+    assert vehicle.maximum_seating == 4.0
+    assert vehicle.width is None
+    assert vehicle.is_new is False
+    assert vehicle.engine_displacement is None
+
+
+def test_calibrate_on_raw_cargurus_rows():
+    rows = [cargurus_row(i) for i in range(200)]
+    vehicles = [HoldoutVehicle(row) for row in rows]
+    prices = np.array([float(row["price"]) for row in rows])
+    predictor.load()
+    predicted = predictor.predict_batch(vehicles)
+
+    table = calibrate([vehicle.make_name for vehicle in vehicles], prices, predicted, coverage=0.9)
+    intervals = IntervalTable(table["coverage"], table["segments"], {})
+    covered = [
+        interval["lower"] <= price <= interval["upper"]
+        for interval, price in ((intervals.interval("Fiat", float(p)), price) for p, price in zip(predicted, prices))
+    ]
+
+    assert table["holdout_rows"] == 200
+    # Segments mix with their fallbacks, so in-sample coverage is only approximately the target
+    assert np.mean(covered) >= 0.85
+
+
+def write_table(path, predictor_name=None) -> str:
+    table = {"version": INTERVALS_FORMAT_VERSION, "coverage": 0.9, "segments": {"global": {"all": [-0.2, 0.2, 500]}}}
+    if predictor_name is not None:
+        table["predictor"] = predictor_name
+    path.write_text(json.dumps(table))
+    return str(path)
+
+
+def test_table_calibrated_for_another_predictor_is_refused(tmp_path):
+    assert load_interval_table(write_table(tmp_path / "other.json", "catboost"), "mock_predictions") is None
+    assert load_interval_table(write_table(tmp_path / "same.json", "mock_predictions"), "mock_predictions") is not None
+    # Tables written before the predictor was recorded are accepted
+    assert load_interval_table(write_table(tmp_path / "unnamed.json"), "mock_predictions") is not None
+
+
+def test_interval_falls_back_from_make_and_price_range_to_global():
+    # Price range 2 is $10,000 - $15,000, range 3 is $15,000 - $20,000
+    assert price_range(12000) == 2 and price_range(17000) == 3
+    table = IntervalTable(0.9, {
+        "make_price_range": {"toyota|2": [-0.1, 0.1, 60]},
+        "make": {"toyota": [-0.2, 0.2, 120], "honda": [-0.3, 0.3, 80]},
+        "price_range": {"2": [-0.4, 0.4, 300]},
+        "global": {"all": [-0.5, 0.5, 900]},
+    }, {})
+
+    def segment(make, price):
+        interval = table.interval(make, price)
+        return interval["segment"], round(math.log(interval["upper"] / price), 2)
+
+    assert segment(" Toyota ", 12000) == ("make_price_range", 0.1)
+    assert segment("Toyota", 17000) == ("make", 0.2)
+    assert segment("Honda", 12000) == ("make", 0.3)
+    assert segment("Lada", 12000) == ("price_range", 0.4)
+    assert segment("Lada", 17000) == ("global", 0.5)
+
+
+def test_interval_bounds_scale_the_predicted_price():
+    table = IntervalTable(0.8, {"global": {"all": [-0.25, 0.5, 900]}}, {})
+
+    interval = table.interval("Any", 10000.0)
+
+    assert interval["lower"] == round(10000 * math.exp(-0.25), 2)
+    assert interval["upper"] == round(10000 * math.exp(0.5), 2)
+    assert (interval["confidence_level"], interval["method"]) == (0.8, "conformal")
@@ -0,0 +1,95 @@
+"""
+Quantile error of the price t-digests against exact ranks, for single
+sketches, merged selections and sketches merged across shards
+"""
+import numpy as np
+import pytest
+
+from listings_aggregator import PRICE_BIN_EDGES
+from price_sketches import DIGEST_COMPRESSION, PriceSketches
+
+QUANTILES = [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999]
+KEYS = [("Toyota", "Camry", year) for year in range(2015, 2019)] + [("Honda", "Civic", None)]
+ROWS = 40000
+
+
+def rank_error_bound(q: float) -> float:
+    """The k1 scale function keeps clusters near quantile q within about this fraction of all listings"""
+    return np.pi * np.sqrt(q * (1 - q)) / DIGEST_COMPRESSION
+
+
+@pytest.fixture(scope="module", params=["lognormal", "uniform", "bimodal"])
+def listings(request):
+    rng = np.random.default_rng(11)
+    if request.param == "lognormal":
+        price = rng.lognormal(10, 0.6, ROWS)
+    elif request.param == "uniform":
+        price = rng.uniform(1000, 90000, ROWS)
+    else:
+        price = np.where(rng.random(ROWS) < 0.7, rng.normal(18000, 3000, ROWS), rng.normal(65000, 8000, ROWS))
+    price = np.maximum(price, 500)
+    codes = rng.integers(0, len(KEYS), ROWS)
+    mileage = np.where(rng.random(ROWS) < 0.1, np.nan, rng.uniform(0, 200000, ROWS))
+    return codes, price, mileage
+
+
+def rank_errors(digest, prices):
+    ordered = np.sort(prices)
+    estimates = digest.quantiles(QUANTILES)
+    return [abs(np.searchsorted(ordered, estimate) / len(ordered) - q) for q, estimate in zip(QUANTILES, estimates)]
+
+
+def assert_within_bounds(digest, prices):
+    for q, error in zip(QUANTILES, rank_errors(digest, prices)):
+        assert error <= rank_error_bound(q), f"p{q * 100:g} is off by {error:.5f} in rank"
+
+
+def test_quantiles_stay_within_the_rank_error_bound(listings):
+    codes, price, mileage = listings
+    sketches = PriceSketches.from_listings(KEYS, codes, price, mileage)
+
+    camry = sketches.select(make="toyota", model="CAMRY")
+    assert camry.count == int((codes < 4).sum())
+    assert_within_bounds(camry, price[codes < 4])
+    assert_within_bounds(sketches.select(make="toyota", year_min=2017), price[(codes == 2) | (codes == 3)])
+    assert_within_bounds(sketches.select(make="honda"), price[codes == 4])
+    # Each sketch stays within the t-digest's centroid budget
+    assert np.bincount(sketches.centroid_keys).max() <= DIGEST_COMPRESSION / 2 + 1
+
+
+def test_sketches_merged_across_shards_keep_the_bound(listings):
+    codes, price, mileage = listings
+    half = ROWS // 2
+    merged = PriceSketches.from_listings(KEYS, codes[:half], price[:half], mileage[:half]).merge(
+        PriceSketches.from_listings(KEYS[::-1], len(KEYS) - 1 - codes[half:], price[half:], mileage[half:]))
+
+    everything = merged.select()
+    assert everything.count == ROWS
+    assert (everything.minimum, everything.maximum) == (price.min(), price.max())
+    assert_within_bounds(everything, price)
+
+
+def test_histograms_are_exact_and_bucket_estimates_are_close(listings):
+    codes, price, mileage = listings
+    digest = PriceSketches.from_listings(KEYS, codes, price, mileage).select()
+
+    exact = np.bincount(np.clip(np.searchsorted(PRICE_BIN_EDGES, price, side="right") - 1, 0,
+                                len(PRICE_BIN_EDGES) - 1), minlength=len(PRICE_BIN_EDGES))
+    assert digest.price_hist.tolist() == exact.tolist()
+    assert digest.mileage_hist.sum() == int((~np.isnan(mileage)).sum())
+
+    boundaries = [10000, 25000, 40000]
+    estimated = [bucket["count"] for bucket in digest.bucket_counts(boundaries)]
+    actual = np.diff(np.searchsorted(np.sort(price), [0] + boundaries + [np.inf])).tolist()
+    # Buckets are rounded one by one
+    assert abs(sum(estimated) - ROWS) <= len(estimated)
+    for estimate, count in zip(estimated, actual):
+        assert abs(estimate - count) <= 0.01 * ROWS
+
+
+def test_select_without_matches_returns_none(listings):
+    codes, price, mileage = listings
+    sketches = PriceSketches.from_listings(KEYS, codes, price, mileage)
+    assert sketches.select(make="Yugo") is None
+    # Listings of unknown year never match a year range
+    assert sketches.select(make="Honda", year_min=2000) is None
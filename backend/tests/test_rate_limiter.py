@@ -0,0 +1,74 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import data_service
+from data_service import HostRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it instead of waiting"""
+    state = SimpleNamespace(now=100.0, sleeps=[])
+
+    async def sleep(delay):
+        state.sleeps.append(round(delay, 6))
+        state.now += delay
+
+    monkeypatch.setattr(data_service, "time", SimpleNamespace(monotonic=lambda: state.now))
+    monkeypatch.setattr(data_service.asyncio, "sleep", sleep)
+    return state
+
+
+def admitted_at(limiter, clock, hosts):
+    async def scenario():
+        times = []
+        for host in hosts:
+            await limiter.acquire(host)
+            times.append(round(clock.now - 100.0, 6))
+        return times
+
+    return asyncio.run(scenario())
+
+
+def test_burst_runs_ahead_then_requests_are_spaced_by_the_interval(clock):
+    limiter = HostRateLimiter(rate=10, burst=3)
+    assert admitted_at(limiter, clock, ["vpic"] * 6) == [0, 0, 0, 0.1, 0.2, 0.3]
+
+
+def test_idle_time_refills_the_burst(clock):
+    limiter = HostRateLimiter(rate=10, burst=2)
+    assert admitted_at(limiter, clock, ["vpic"] * 3) == [0, 0, 0.1]
+    clock.now += 5
+    assert admitted_at(limiter, clock, ["vpic"] * 3) == [5.1, 5.1, 5.2]
+
+
+def test_hosts_are_limited_independently(clock):
+    limiter = HostRateLimiter(rate=10, burst=1)
+    assert admitted_at(limiter, clock, ["vpic", "vpic", "other", "other"]) == [0, 0.1, 0.1, 0.2]
+
+
+def test_zero_rate_disables_limiting(clock):
+    limiter = HostRateLimiter(rate=0)
+    assert admitted_at(limiter, clock, ["vpic"] * 10) == [0] * 10
+    assert clock.sleeps == []
+
+
+def test_concurrent_requests_get_distinct_slots():
+    limiter = HostRateLimiter(rate=50, burst=1)
+
+    async def scenario():
+        started = time.monotonic()
+
+        async def request():
+            await limiter.acquire("vpic")
+            return time.monotonic() - started
+
+        return sorted(await asyncio.gather(*(request() for _ in range(5))))
+
+    times = asyncio.run(scenario())
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.015
+    assert times[-1] < 0.5
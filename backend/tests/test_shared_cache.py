@@ -0,0 +1,119 @@
+"""
+SQLiteDataCache shared between worker processes, and the lease that
+elects the worker refreshing it
+"""
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from shared_cache import LeaderLease, SQLiteDataCache
+
+
+def store_in_child(path: str, key: str, value) -> None:
+    cache = SQLiteDataCache(path, ttl=60)
+    cache[key] = value
+    cache.mark_fetched(key, 1234.5)
+    cache.close()
+
+
+def hold_lease_in_child(path: str, ttl: float, acquired) -> None:
+    cache = SQLiteDataCache(path, ttl=60)
+    acquired.put(cache.lease("refresher", ttl).try_acquire())
+    cache.close()
+
+
+def run_in_child(target, *args) -> None:
+    process = multiprocessing.get_context("spawn").Process(target=target, args=args)
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+
+
+def test_value_stored_by_another_process_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteDataCache(path, ttl=60)
+    try:
+        assert "nhtsa_makes" not in cache
+        run_in_child(store_in_child, path, "nhtsa_makes", [{"make": "Toyota"}])
+
+        assert cache["nhtsa_makes"] == [{"make": "Toyota"}]
+        assert cache.fetched_at("nhtsa_makes") == 1234.5
+        assert cache.version() == 1234.5
+        assert list(cache) == ["nhtsa_makes"]
+    finally:
+        cache.close()
+
+
+def test_expired_values_are_not_served(tmp_path):
+    cache = SQLiteDataCache(str(tmp_path / "cache.sqlite"), ttl=0.05)
+    try:
+        cache["fuel_types"] = [1, 2]
+        assert cache.get("fuel_types") == [1, 2]
+        time.sleep(0.1)
+        assert cache.get("fuel_types") is None
+        assert len(cache) == 0
+    finally:
+        cache.close()
+
+
+def test_lease_is_held_by_one_process_until_it_expires(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteDataCache(path, ttl=60)
+    acquired = multiprocessing.get_context("spawn").Queue()
+    try:
+        lease = cache.lease("refresher", ttl=1.0)
+        run_in_child(hold_lease_in_child, path, 1.0, acquired)
+        assert acquired.get(timeout=5) is True
+
+        # The other worker holds it until it stops renewing
+        assert lease.try_acquire() is False
+        time.sleep(1.1)
+        assert lease.try_acquire() is True
+        # Renewing our own lease keeps it
+        assert lease.try_acquire() is True
+
+        run_in_child(hold_lease_in_child, path, 1.0, acquired)
+        assert acquired.get(timeout=5) is False
+    finally:
+        cache.close()
+
+
+def test_released_lease_can_be_taken_over(tmp_path):
+    cache = SQLiteDataCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    try:
+        first = cache.lease("refresher", ttl=60)
+        second = LeaderLease(cache, "refresher", ttl=60)
+        second.owner = "other-host:1"
+
+        assert first.try_acquire() is True
+        assert second.try_acquire() is False
+        first.release()
+        assert second.try_acquire() is True
+        # Releasing a lease held by someone else changes nothing
+        first.release()
+        assert first.try_acquire() is False
+    finally:
+        cache.close()
+
+
+def test_locked_file_does_not_stall_lookups_or_writes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteDataCache(path, ttl=60, busy_timeout_ms=100)
+    cache["nhtsa_makes"] = ["Toyota"]
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    try:
+        other_worker.execute("BEGIN IMMEDIATE")
+        other_worker.execute("UPDATE data_cache SET value = '[]'")
+
+        started = time.perf_counter()
+        # WAL readers see the last committed value while another worker writes
+        assert cache["nhtsa_makes"] == ["Toyota"]
+        with pytest.raises(sqlite3.OperationalError):
+            cache["fuel_types"] = []
+        assert time.perf_counter() - started < 1
+    finally:
+        other_worker.execute("ROLLBACK")
+        other_worker.close()
+        cache.close()
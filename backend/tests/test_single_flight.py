@@ -0,0 +1,42 @@
+"""
+Load test for request coalescing: bursts of concurrent cache misses against a
+slow stand-in NHTSA server must make exactly one upstream call per key per
+cache refresh.
+"""
+import asyncio
+
+import data_service
+from data_service import LiveDataService, data_cache, get_live_statistics
+
+CONCURRENT_REQUESTS = 200
+REFRESH_ROUNDS = 2
+
+
+def test_one_upstream_call_per_key_per_refresh(nhtsa_server, monkeypatch):
+    nhtsa_server.delay = 0.05
+    service = LiveDataService(api_base=nhtsa_server.api_base)
+    monkeypatch.setattr(data_service, "live_data_service", service)
+
+    async def burst():
+        await asyncio.gather(
+            *(get_live_statistics() for _ in range(CONCURRENT_REQUESTS)),
+            *(service.get_nhtsa_makes() for _ in range(CONCURRENT_REQUESTS)),
+            *(service.get_nhtsa_models_for_make("Toyota") for _ in range(CONCURRENT_REQUESTS)),
+        )
+
+    async def scenario():
+        try:
+            for round_number in range(1, REFRESH_ROUNDS + 1):
+                # Every dataset has just expired
+                data_cache.clear()
+                await burst()
+                assert len(nhtsa_server.paths("/getallmakes")) == round_number
+                # The stand-in lists Toyota and Honda as the legitimate makes
+                assert len(nhtsa_server.paths("/getmodelsformake/TOYOTA")) == round_number
+                assert len(nhtsa_server.paths("/getmodelsformake/HONDA")) == round_number
+                assert len(nhtsa_server.requests) == 3 * round_number
+        finally:
+            await service.close()
+            data_cache.clear()
+
+    asyncio.run(scenario())
@@ -0,0 +1,149 @@
+"""
+Statistics cube queries checked against a brute-force group-by over the
+listings it was built from
+"""
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+import statistics_cube
+from listings_aggregator import MILEAGE_BIN_EDGES, MILEAGE_BIN_LABELS, PRICE_BIN_EDGES, PRICE_BIN_LABELS
+from listings_store import ListingsStore, build_store
+from statistics_cube import StatisticsCube
+
+HEADER = "make_name,model_name,body_type,fuel_type,year,price,mileage,horsepower\n"
+MODELS = {"Toyota": ["Camry", "Corolla", "RAV4", "Tacoma"], "Honda": ["Civic", "Accord", "CR-V"],
+          "Ford": ["F-150", "Escape", "Focus", "Mustang", "Edge"]}
+BODY_TYPES = ["Sedan", "SUV / Crossover", "Pickup Truck", ""]
+FUEL_TYPES = ["Gasoline", "Hybrid", "Diesel"]
+
+
+def generate_listings(rows: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    listings = []
+    for _ in range(rows):
+        make = str(rng.choice(list(MODELS)))
+        listings.append({
+            "make": make,
+            "model": str(rng.choice(MODELS[make])),
+            "body_type": str(rng.choice(BODY_TYPES)),
+            "fuel_type": str(rng.choice(FUEL_TYPES)),
+            "year": int(rng.integers(2005, 2024)),
+            # Whole dollars and miles survive the store's float32 columns exactly
+            "price": int(rng.integers(800, 90000)),
+            "mileage": None if rng.random() < 0.1 else int(rng.integers(0, 220000)),
+        })
+    return listings
+
+
+@pytest.fixture(scope="module")
+def listings():
+    return generate_listings(3000)
+
+
+@pytest.fixture(scope="module")
+def cube(listings, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("cube")
+    source = directory / "listings.csv"
+    source.write_text(HEADER + "".join(
+        f"{row['make']},{row['model']},{row['body_type']},{row['fuel_type']},{row['year']},{row['price']},"
+        f"{'' if row['mileage'] is None else row['mileage']},150\n"
+        for row in listings
+    ))
+    build_store(str(source), str(directory / "store"), chunk_rows=700)
+    store = ListingsStore(str(directory / "store"))
+    assert store.open()
+    # Small blocks so cells from several blocks get merged
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(statistics_cube, "QUERY_BLOCK_ROWS", 512)
+        return StatisticsCube.build(store)
+
+
+def label_of(row, dimension):
+    if dimension == "price_range":
+        return PRICE_BIN_LABELS[min(max(np.searchsorted(PRICE_BIN_EDGES, row["price"], side="right") - 1, 0),
+                                    len(PRICE_BIN_LABELS) - 1)]
+    if dimension == "mileage_range":
+        if row["mileage"] is None:
+            return None
+        return MILEAGE_BIN_LABELS[min(np.searchsorted(MILEAGE_BIN_EDGES, row["mileage"], side="right") - 1,
+                                      len(MILEAGE_BIN_LABELS) - 1)]
+    return row[dimension] or None
+
+
+def brute_force(listings, group_by, keep=lambda row: True):
+    groups = defaultdict(lambda: {"count": 0, "sum_price": 0, "sum_mileage": 0, "mileage_count": 0})
+    for row in filter(keep, listings):
+        group = groups[tuple(label_of(row, dimension) for dimension in group_by)]
+        group["count"] += 1
+        group["sum_price"] += row["price"]
+        if row["mileage"] is not None:
+            group["sum_mileage"] += row["mileage"]
+            group["mileage_count"] += 1
+    return groups
+
+
+def as_groups(result, group_by):
+    return {
+        tuple(group[dimension] for dimension in group_by): (group["count"], group["sum_price"], group["sum_mileage"])
+        for group in result["groups"]
+    }
+
+
+def expected_groups(groups):
+    return {key: (group["count"], group["sum_price"], group["sum_mileage"]) for key, group in groups.items()}
+
+
+@pytest.mark.parametrize("group_by", [
+    ("make",), ("make", "model"), ("body_type", "fuel_type"), ("year",), ("mileage_range",), ("price_range", "make"),
+])
+def test_grouped_sums_match_brute_force(cube, listings, group_by):
+    result = cube.query(group_by=group_by)
+    expected = brute_force(listings, group_by)
+
+    assert as_groups(result, group_by) == expected_groups(expected)
+    assert result["total"]["count"] == len(listings)
+    assert result["total_groups"] == len(expected)
+    counts = [group["count"] for group in result["groups"]]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_filters_and_year_range_match_brute_force(cube, listings):
+    group_by = ("make", "body_type")
+    result = cube.query(group_by=group_by, filters={"fuel_type": ["gasoline", "HYBRID"], "make": ["Toyota", "Ford"]},
+                        year_min=2010, year_max=2018)
+    expected = brute_force(listings, group_by, lambda row: (
+        row["fuel_type"] in ("Gasoline", "Hybrid") and row["make"] in ("Toyota", "Ford")
+        and 2010 <= row["year"] <= 2018
+    ))
+
+    assert as_groups(result, group_by) == expected_groups(expected)
+    assert result["total"]["count"] == sum(group["count"] for group in expected.values())
+    for group in result["groups"]:
+        sums = expected[(group["make"], group["body_type"])]
+        assert group["avg_price"] == round(sums["sum_price"] / sums["count"])
+        assert group["avg_mileage"] == round(sums["sum_mileage"] / sums["mileage_count"])
+
+
+def test_unknown_filter_values_match_nothing(cube):
+    result = cube.query(group_by=("make",), filters={"make": ["Yugo"]})
+    assert result["total"]["count"] == 0
+    assert result["groups"] == []
+    with pytest.raises(ValueError):
+        cube.query(group_by=("color",))
+
+
+def test_models_by_make_matches_brute_force(cube, listings):
+    by_make = cube.models_by_make(per_make=3)
+    expected = brute_force(listings, ("make", "model"))
+
+    assert set(by_make) == set(MODELS)
+    for make, models in by_make.items():
+        counts = sorted((group["count"] for (group_make, _), group in expected.items() if group_make == make),
+                        reverse=True)
+        assert [model["count"] for model in models] == counts[:3]
+        for model in models:
+            sums = expected[(make, model["model"])]
+            assert model["count"] == sums["count"]
+            assert model["avg_price"] == round(sums["sum_price"] / sums["count"])
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import data_service
+import main
+import statistics_service
+from data_service import FALLBACK_DATA_SOURCE, LiveDataService, data_cache
+from statistics_service import StatisticsStore, build_snapshot
+
+
+def data_sources(snapshot):
+    return json.loads(snapshot.payloads["overview"])["data_sources"]
+
+
+def test_seed_does_not_wait_for_nhtsa(nhtsa_server, monkeypatch):
+    nhtsa_server.delay = 0.5
+    service = LiveDataService(api_base=nhtsa_server.api_base)
+    monkeypatch.setattr(data_service, "live_data_service", service)
+    store = StatisticsStore(ttl=3600)
+
+    async def scenario():
+        data_cache.clear()
+        try:
+            started = time.perf_counter()
+            seeded = await store.seed()
+            assert time.perf_counter() - started < 0.25
+            assert nhtsa_server.requests == []
+            assert data_sources(seeded) == [FALLBACK_DATA_SOURCE]
+            assert seeded.fallback
+
+            store.refresh_in_background()
+            await store._refresh_task
+            assert store.snapshot is not seeded
+            assert data_sources(store.snapshot)[0] == "NHTSA Vehicle API"
+        finally:
+            await service.close()
+            data_cache.clear()
+
+    asyncio.run(scenario())
+
+
+def test_seed_uses_cached_nhtsa_datasets(monkeypatch):
+    service = LiveDataService(api_base="http://127.0.0.1:9/api")
+    monkeypatch.setattr(data_service, "live_data_service", service)
+    makes = [{"make": "Toyota", "count": 10, "avg_price": 20000, "percentage": 50.0}]
+    models = [{"model": "Camry", "make": "Toyota", "count": 7, "avg_price": 21000}]
+
+    async def scenario():
+        data_cache.clear()
+        data_cache["nhtsa_makes"] = makes
+        data_cache["nhtsa_models_Toyota"] = models
+        try:
+            overview = json.loads((await StatisticsStore(ttl=3600).seed()).payloads["overview"])
+            assert overview["popular_makes"] == makes
+            assert overview["popular_models"] == models
+            assert overview["data_sources"][0] == "NHTSA Vehicle API"
+        finally:
+            await service.close()
+            data_cache.clear()
+
+    asyncio.run(scenario())
+
+
+def test_expired_snapshot_is_served_while_rebuilt(monkeypatch):
+    rebuilt = asyncio.Event()
+
+    async def live_statistics():
+        await rebuilt.wait()
+        return {**await data_service.get_cached_statistics(), "data_sources": ["Live"]}
+
+    monkeypatch.setattr("statistics_service.get_live_statistics", live_statistics)
+    store = StatisticsStore(ttl=0)
+
+    async def scenario():
+        seeded = await store.seed()
+        assert await store.current() is seeded
+        rebuilt.set()
+        await store._refresh_task
+        assert data_sources(store.snapshot) == ["Live"]
+
+    asyncio.run(scenario())
+
+
+def live_stats(data_sources):
+    makes = [{"make": "Toyota", "count": 10, "avg_price": 20000, "percentage": 50.0}]
+    return {
+        "popular_makes": makes, "popular_models": [], "body_types": [], "fuel_types": [], "year_trends": [],
+        "last_updated": "2024-01-01T00:00:00", "data_sources": data_sources
+    }
+
+
+def serve(monkeypatch, snapshot):
+    store = StatisticsStore(ttl=3600)
+    store.snapshot = snapshot
+    monkeypatch.setattr(main, "statistics_store", store)
+    return TestClient(main.app)
+
+
+def test_overview_revalidates_with_etag(monkeypatch):
+    client = serve(monkeypatch, build_snapshot(live_stats(["NHTSA Vehicle API"])))
+
+    first = client.get("/statistics/overview")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+    assert first.content == main.statistics_store.snapshot.payloads["overview"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = client.get("/statistics/overview", headers={"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+    changed = client.get("/statistics/overview", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+def test_fallback_snapshot_is_not_cached_by_clients(monkeypatch):
+    snapshot = build_snapshot(live_stats([FALLBACK_DATA_SOURCE]))
+    client = serve(monkeypatch, snapshot)
+
+    response = client.get("/statistics/makes")
+
+    assert snapshot.fallback
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert client.get("/statistics/makes", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_fallback_snapshot_expires_early(monkeypatch):
+    live = build_snapshot(live_stats(["NHTSA Vehicle API"]))
+    fallback = build_snapshot(live_stats([FALLBACK_DATA_SOURCE]))
+    later = live.built_at + statistics_service.FALLBACK_SNAPSHOT_TTL + 1
+    monkeypatch.setattr(statistics_service.time, "monotonic", lambda: later)
+
+    assert not live.expired(3600)
+    assert fallback.expired(3600)
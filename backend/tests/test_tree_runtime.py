@@ -0,0 +1,137 @@
+"""
+Parity of the compiled tree runtime with CatBoost itself, on small models
+trained here and exported with export_compiled_model
+"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from feature_encoder import FeatureEncoder
+from prediction_service import CompiledPredictor
+from tree_runtime import export_compiled_model, load_compiled_model
+
+catboost = pytest.importorskip("catboost")
+
+MAKES = ["Toyota", "Honda", "BMW"]
+
+
+def training_data(rows: int = 400, missing: float = 0.15):
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(rows, 4)).astype(np.float32)
+    features[rng.random(features.shape) < missing] = np.nan
+    target = np.nansum(features, axis=1) + np.isnan(features[:, 0]) * 2 + rng.normal(size=rows)
+    return features, target
+
+
+def train(features, target, **params):
+    model = catboost.CatBoostRegressor(iterations=30, verbose=False, random_seed=0, allow_writing_files=False,
+                                       **params)
+    model.fit(features, target)
+    return model
+
+
+@pytest.mark.parametrize("nan_mode", ["Min", "Max"])
+@pytest.mark.parametrize("depth", [1, 3, 6])
+def test_compiled_model_matches_catboost(tmp_path, nan_mode, depth):
+    features, target = training_data()
+    model = train(features, target, depth=depth, nan_mode=nan_mode)
+    path = tmp_path / "model.json"
+    export_compiled_model(model, str(path))
+
+    compiled = load_compiled_model(str(path))
+    expected = model.predict(features)
+
+    # Max mode sends missing values right, which the runtime reads as "AsTrue"
+    assert (compiled.split_nan_right is not None) == (nan_mode == "Max")
+    assert compiled.tree_count == model.tree_count_
+    np.testing.assert_allclose(compiled.predict(features), expected, rtol=0, atol=1e-9)
+    for row, value in zip(features[:50], expected[:50]):
+        assert compiled.predict_row(row) == pytest.approx(value, abs=1e-9)
+
+
+def test_all_missing_row_matches_catboost(tmp_path):
+    features, target = training_data()
+    model = train(features, target, depth=4, nan_mode="Max")
+    path = tmp_path / "model.json"
+    export_compiled_model(model, str(path))
+
+    row = np.full((1, features.shape[1]), np.nan, dtype=np.float32)
+    assert load_compiled_model(str(path)).predict(row)[0] == pytest.approx(model.predict(row)[0], abs=1e-9)
+
+
+def vehicle(make_name, year, mileage, horsepower=None):
+    return SimpleNamespace(make_name=make_name, model_name="Any", year=year, mileage=mileage, horsepower=horsepower)
+
+
+def test_compiled_predictor_matches_catboost_on_encoded_requests(tmp_path):
+    rng = np.random.default_rng(1)
+    requests = [
+        vehicle(MAKES[rng.integers(3)], int(rng.integers(2005, 2025)), int(rng.integers(0, 200000)),
+                None if rng.random() < 0.2 else int(rng.integers(100, 400)))
+        for _ in range(300)
+    ]
+    feature_names = ["make_name", "year", "mileage", "horsepower"]
+    encoder = FeatureEncoder(feature_names, {"make_name": MAKES})
+    features = encoder.encode_batch(requests).copy()
+    prices = 30000 * (1 + features[:, 0]) * np.maximum(0.3, 1 - (2025 - features[:, 1]) * 0.06)
+    model = catboost.CatBoostRegressor(iterations=40, depth=4, verbose=False, random_seed=0,
+                                       allow_writing_files=False)
+    model.fit(catboost.Pool(features, np.log1p(prices), feature_names=feature_names))
+    path = tmp_path / "model.json"
+    export_compiled_model(model, str(path), categories={"make_name": MAKES})
+    predictor = CompiledPredictor(str(path))
+    predictor.load()
+
+    assert predictor.encoder.feature_names == feature_names
+
+    expected = np.round(np.expm1(model.predict(features)), 2)
+    np.testing.assert_allclose(predictor.predict_batch(requests), expected, rtol=1e-12)
+    assert predictor.predict_batch(requests[:1])[0] == pytest.approx(expected[0], rel=1e-12)
+
+
+def test_encoder_maps_categories_missing_values_and_derived_features():
+    encoder = FeatureEncoder(
+        ["make_name", "car_age", "horsepower", "is_luxury_brand", "body_type_SUV / Crossover"],
+        {"make_name": MAKES}
+    )
+    request = SimpleNamespace(make_name="BMW", year=2020, mileage=1, horsepower=None, body_type="SUV / Crossover")
+
+    row = encoder.encode(request)
+
+    assert row.dtype == np.float32
+    assert row[0] == 2 and row[1] == 5 and row[3] == 1 and row[4] == 1
+    assert np.isnan(row[2])
+    # Unseen categories encode like missing values
+    assert np.isnan(encoder.encode(SimpleNamespace(**{**vars(request), "make_name": "Yugo"}))[0])
+
+
+def test_encoder_reuses_its_buffers_and_grows_the_batch():
+    encoder = FeatureEncoder(["year", "mileage"], batch_capacity=2)
+    requests = [vehicle("Toyota", 2000 + i, 1000 * i) for i in range(5)]
+
+    first = encoder.encode(requests[0])
+    second = encoder.encode(requests[1])
+    assert first is second and second[0] == 2001
+
+    batch = encoder.encode_batch(requests)
+    assert batch.shape == (5, 2)
+    assert batch[:, 1].tolist() == [0, 1000, 2000, 3000, 4000]
+    assert encoder.encode_batch(requests[:3]).base is batch.base
+
+
+def test_encoder_buffers_are_per_thread():
+    encoder = FeatureEncoder(["year"])
+    main_row = encoder.encode(vehicle("Toyota", 2001, 0))
+    rows = {}
+
+    def encode_in_thread():
+        rows["thread"] = encoder.encode(vehicle("Toyota", 2002, 0))
+
+    thread = threading.Thread(target=encode_in_thread)
+    thread.start()
+    thread.join()
+
+    assert rows["thread"] is not main_row
+    assert main_row[0] == 2001 and rows["thread"][0] == 2002
@@ -0,0 +1,51 @@
+import vin_service
+from vin_index import VinIndex, build_index, decode_model_year, validate_vin
+
+# Valid check digit (position 9)
+NORTH_AMERICAN_VIN = "1HGCM82633A004352"
+# European VINs need not carry a check digit
+EUROPEAN_VIN = "WVWZZZ1JZXW000001"
+
+
+def test_model_year_cycle_is_only_applied_to_north_american_vins():
+    # Position 7 digit: 1980-2009 cycle; letter: 2010-2039 cycle
+    assert decode_model_year(NORTH_AMERICAN_VIN) == 2003
+    assert decode_model_year("5YJSA1E2XJF000001") == 2018
+    assert decode_model_year("5YJSA1223JF000001") == 1988
+    # Position 10 'X' is 1999 or 2029 outside North America
+    assert decode_model_year(EUROPEAN_VIN) is None
+    assert decode_model_year("JHMCM56557C404453") is None
+
+
+def test_check_digit_is_opt_in():
+    assert validate_vin(EUROPEAN_VIN) is None
+    assert validate_vin(EUROPEAN_VIN, check_digit=True) is not None
+    assert validate_vin(NORTH_AMERICAN_VIN, check_digit=True) is None
+    assert validate_vin("1HGCM82633A00435") is not None
+    assert validate_vin("1HGCM82633A00435O") is not None
+
+
+def test_vin_decoder_accepts_vins_without_check_digit_by_default():
+    assert vin_service.VIN_VALIDATE_CHECK_DIGIT is False
+    assert vin_service.vin_decoder.validate(EUROPEAN_VIN) is None
+
+
+def test_index_decodes_non_north_american_vin_without_year(tmp_path):
+    snapshot = tmp_path / "snapshot.csv"
+    snapshot.write_text(
+        "wmi,make,vds_pattern,year_from,year_to,model,body_type,fuel_type\n"
+        "WVW,VOLKSWAGEN,ZZZ1J,1998,2005,Golf,Hatchback,Gasoline\n"
+        "1HG,HONDA,CM826,2003,2007,Accord,Sedan,Gasoline\n"
+        "1HG,HONDA,CM826,2008,2012,Accord Crosstour,Hatchback,Gasoline\n"
+    )
+    index_path = tmp_path / "vin_index.sqlite"
+    build_index(str(snapshot), str(index_path))
+    index = VinIndex(str(index_path))
+    try:
+        assert index.decode(EUROPEAN_VIN) == {
+            "make_name": "VOLKSWAGEN", "model_name": "Golf", "body_type": "Hatchback", "fuel_type": "Gasoline"
+        }
+        decoded = index.decode(NORTH_AMERICAN_VIN)
+        assert (decoded["model_name"], decoded["year"]) == ("Accord", 2003)
+    finally:
+        index.close()
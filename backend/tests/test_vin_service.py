@@ -0,0 +1,72 @@
+import asyncio
+
+from vin_service import VinDecoder
+
+VINS = ["1HGCM82633A004352", "1HGCM82633A004353", "1HGCM82633A004354", "1HGCM82633A004355"]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_decodes_share_one_keep_alive_connection(nhtsa_server):
+    async def scenario():
+        decoder = VinDecoder(api_base=nhtsa_server.api_base, cache_path=None, index_path=None)
+        try:
+            return [await decoder.decode(vin) for vin in VINS]
+        finally:
+            await decoder.close()
+
+    decoded = run(scenario())
+
+    assert [vin_data["make_name"] for vin_data in decoded] == ["HONDA"] * len(VINS)
+    assert len(nhtsa_server.paths("DecodeVinValues")) == len(VINS)
+    assert nhtsa_server.connections() == 1
+
+
+def test_repeated_vin_is_answered_from_the_cache(nhtsa_server):
+    async def scenario():
+        decoder = VinDecoder(api_base=nhtsa_server.api_base, cache_path=None, index_path=None)
+        try:
+            first = await decoder.decode(VINS[0])
+            second = await decoder.decode(VINS[0])
+            return first, second
+        finally:
+            await decoder.close()
+
+    first, second = run(scenario())
+
+    assert first == second
+    assert len(nhtsa_server.requests) == 1
+
+
+def test_sqlite_cache_survives_a_restart(nhtsa_server, tmp_path):
+    cache_path = str(tmp_path / "vin_cache.sqlite")
+
+    async def decode_with_new_decoder():
+        decoder = VinDecoder(api_base=nhtsa_server.api_base, cache_path=cache_path, index_path=None)
+        try:
+            return await decoder.decode(VINS[0])
+        finally:
+            await decoder.close()
+
+    first = run(decode_with_new_decoder())
+    second = run(decode_with_new_decoder())
+
+    assert first == second
+    assert len(nhtsa_server.requests) == 1
+
+
+def test_batch_sends_only_uncached_vins(nhtsa_server):
+    async def scenario():
+        decoder = VinDecoder(api_base=nhtsa_server.api_base, cache_path=None, index_path=None)
+        try:
+            await decoder.decode(VINS[0])
+            return await decoder.decode_batch(VINS + [VINS[1]])
+        finally:
+            await decoder.close()
+
+    decoded = run(scenario())
+
+    assert sorted(decoded) == sorted(VINS)
+    assert len(nhtsa_server.paths("DecodeVINValuesBatch")) == 1
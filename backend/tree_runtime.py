@@ -0,0 +1,126 @@
+"""
+Lightweight runtime for CatBoost models exported to JSON.
+
+CatBoost trains oblivious trees: every level of a tree tests the same
+(feature, border) pair, so a tree's leaf index is just the bit pattern of
+its split outcomes. The whole ensemble is flattened into a few NumPy arrays
+at load time and scored with one comparison, one segmented sum and one
+gather, without CatBoost, pandas or per-tree Python loops.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Key under which the exporter stores category lists for FeatureEncoder
+ENCODER_SECTION = "feature_encoder"
+
+
+class ObliviousTreeModel:
+    """Flattened oblivious-tree ensemble loaded from a CatBoost JSON export"""
+
+    def __init__(self, model_json: Dict[str, Any]):
+        features_info = model_json.get("features_info", {})
+        if features_info.get("categorical_features"):
+            raise ValueError("Compiled runtime only supports numeric features; "
+                             "encode categoricals with FeatureEncoder before training")
+
+        float_features = features_info.get("float_features", [])
+        # Split float_feature_index -> column in the flat feature row
+        column_for_float = {f["feature_index"]: f["flat_feature_index"] for f in float_features}
+        # Features trained with nan_mode=Max send missing values right ("AsTrue")
+        nan_goes_right = {f["feature_index"] for f in float_features if f.get("nan_value_treatment") == "AsTrue"}
+        self.feature_names = [
+            f.get("feature_id") or str(f["flat_feature_index"])
+            for f in sorted(float_features, key=lambda f: f["flat_feature_index"])
+        ]
+
+        split_columns: List[int] = []
+        split_borders: List[float] = []
+        split_weights: List[int] = []
+        split_nan_right: List[bool] = []
+        tree_offsets: List[int] = []
+        leaf_offsets: List[int] = []
+        leaf_values: List[float] = []
+
+        for tree in model_json["oblivious_trees"]:
+            splits = tree["splits"]
+            if not splits:
+                raise ValueError("Depth-0 trees are not supported")
+            tree_offsets.append(len(split_columns))
+            leaf_offsets.append(len(leaf_values))
+            for depth, split in enumerate(splits):
+                if split.get("split_type", "FloatFeature") != "FloatFeature":
+                    raise ValueError(f"Unsupported split type: {split.get('split_type')}")
+                split_columns.append(column_for_float[split["float_feature_index"]])
+                split_borders.append(split["border"])
+                split_weights.append(1 << depth)
+                split_nan_right.append(split["float_feature_index"] in nan_goes_right)
+            leaf_values.extend(tree["leaf_values"])
+
+        self.split_columns = np.asarray(split_columns, dtype=np.intp)
+        self.split_borders = np.asarray(split_borders, dtype=np.float32)
+        self.split_weights = np.asarray(split_weights, dtype=np.int64)
+        self.split_nan_right = np.asarray(split_nan_right, dtype=bool) if any(split_nan_right) else None
+        self.tree_offsets = np.asarray(tree_offsets, dtype=np.intp)
+        self.leaf_offsets = np.asarray(leaf_offsets, dtype=np.int64)
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float64)
+
+        scale, bias = model_json.get("scale_and_bias", [1.0, [0.0]])
+        self.scale = float(scale)
+        self.bias = float(bias[0] if isinstance(bias, list) else bias)
+
+        encoder_info = model_json.get(ENCODER_SECTION, {})
+        self.categories: Dict[str, List[str]] = encoder_info.get("categories", {})
+
+    @property
+    def tree_count(self) -> int:
+        return len(self.tree_offsets)
+
+    def _split_bits(self, values: np.ndarray) -> np.ndarray:
+        # NaN compares False, matching CatBoost's default "Min" missing-value mode
+        bits = values > self.split_borders
+        if self.split_nan_right is not None:
+            bits |= np.isnan(values) & self.split_nan_right
+        return bits
+
+    def predict_row(self, row: np.ndarray) -> float:
+        """Raw model output for one encoded row"""
+        bits = self._split_bits(row[self.split_columns])
+        leaf_index = np.add.reduceat(bits * self.split_weights, self.tree_offsets)
+        return float(self.leaf_values[self.leaf_offsets + leaf_index].sum()) * self.scale + self.bias
+
+    def predict(self, rows: np.ndarray) -> np.ndarray:
+        """Raw model outputs for a 2-D array of encoded rows"""
+        bits = self._split_bits(rows[:, self.split_columns])
+        leaf_index = np.add.reduceat(bits * self.split_weights, self.tree_offsets, axis=1)
+        return self.leaf_values[self.leaf_offsets + leaf_index].sum(axis=1) * self.scale + self.bias
+
+
+def load_compiled_model(path: str) -> ObliviousTreeModel:
+    """Load a model written by export_compiled_model (or a plain CatBoost JSON export)"""
+    with open(path) as f:
+        model_json = json.load(f)
+    model = ObliviousTreeModel(model_json)
+    logger.info(f"Loaded compiled model from {path} ({model.tree_count} trees, "
+                f"{len(model.feature_names)} features)")
+    return model
+
+
+def export_compiled_model(catboost_model: Any, path: str,
+                          categories: Optional[Dict[str, List[str]]] = None) -> None:
+    """
+    Export a trained CatBoost model for the compiled runtime.
+    categories holds the ordered category list of every categorical column the
+    model was trained on as integer codes; FeatureEncoder rebuilds its lookup
+    tables from them at load time.
+    """
+    catboost_model.save_model(path, format="json")
+    with open(path) as f:
+        model_json = json.load(f)
+    model_json[ENCODER_SECTION] = {"categories": categories or {}}
+    with open(path, "w") as f:
+        json.dump(model_json, f)
@@ -0,0 +1,181 @@
+"""
+Offline VIN decoding from a local WMI/VDS pattern index.
+
+A VIN's first three characters (WMI) identify the manufacturer, positions
+4-8 (VDS) encode model and body, and position 10 encodes the model year.
+The index is a small SQLite file built from a vPIC snapshot exported to CSV
+with the columns:
+
+    wmi,make,vds_pattern,year_from,year_to,model,body_type,fuel_type
+
+vds_pattern is five characters matched against VIN positions 4-8, with '*'
+as a wildcard; rows with an empty pattern only register the WMI's make.
+
+Build an index with:
+    python vin_index.py build vpic_snapshot.csv vin_index.sqlite
+"""
+import csv
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+VIN_LENGTH = 17
+# Letters I, O and Q are never used in VINs
+_TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'P': 7, 'R': 9,
+    'S': 2, 'T': 3, 'U': 4, 'V': 5, 'W': 6, 'X': 7, 'Y': 8, 'Z': 9,
+}
+_CHECK_DIGIT_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+# Position 10 codes cycle every 30 years starting at 1980
+_MODEL_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+# First WMI characters assigned to North America (United States, Canada, Mexico)
+_NORTH_AMERICAN_WMI_REGIONS = "12345"
+
+
+def validate_vin(vin: str, check_digit: bool = False) -> Optional[str]:
+    """
+    Return an error message for a malformed normalized VIN, or None if it is valid.
+    The check digit (position 9) is only mandatory for North American VINs,
+    so it is verified only when check_digit is set.
+    """
+    if len(vin) != VIN_LENGTH:
+        return "VIN must be exactly 17 characters"
+    if any(char not in _TRANSLITERATION for char in vin):
+        return "VIN contains invalid characters (I, O and Q are not allowed)"
+    if check_digit:
+        remainder = sum(_TRANSLITERATION[char] * weight for char, weight in zip(vin, _CHECK_DIGIT_WEIGHTS)) % 11
+        expected = 'X' if remainder == 10 else str(remainder)
+        if vin[8] != expected:
+            return "VIN check digit is invalid. Please verify the VIN."
+    return None
+
+
+def decode_model_year(vin: str) -> Optional[int]:
+    """
+    Model year from position 10. For North American cars and light trucks
+    (WMIs starting 1-5) a letter in position 7 marks the 2010-2039 cycle and a
+    digit the 1980-2009 one. Other VINs carry no cycle marker, so their year is
+    ambiguous and None is returned.
+    """
+    index = _MODEL_YEAR_CODES.find(vin[9])
+    if index < 0 or vin[0] not in _NORTH_AMERICAN_WMI_REGIONS:
+        return None
+    return 1980 + index + (30 if vin[6].isalpha() else 0)
+
+
+# (pattern, wildcard count, year_from, year_to, model, body_type, fuel_type)
+_Pattern = Tuple[str, int, int, int, str, Optional[str], Optional[str]]
+
+
+class VinIndex:
+    """Read-only WMI/VDS index; per-WMI pattern lists are loaded on first use"""
+
+    def __init__(self, path: str, pattern_cache_size: int = 4096):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._db.execute("PRAGMA mmap_size=268435456")
+        self._makes = dict(self._db.execute("SELECT wmi, make FROM wmi"))
+        self._patterns: LRUCache = LRUCache(maxsize=pattern_cache_size)
+        logger.info(f"Loaded VIN index from {path} ({len(self._makes)} WMIs)")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _patterns_for(self, wmi: str) -> List[_Pattern]:
+        patterns = self._patterns.get(wmi)
+        if patterns is None:
+            rows = self._db.execute(
+                "SELECT pattern, year_from, year_to, model, body_type, fuel_type FROM vds_patterns WHERE wmi = ?",
+                (wmi,)
+            ).fetchall()
+            # Most specific (fewest wildcards) first
+            patterns = sorted(
+                ((pattern, pattern.count('*'), year_from, year_to, model, body_type, fuel_type)
+                 for pattern, year_from, year_to, model, body_type, fuel_type in rows),
+                key=lambda p: p[1]
+            )
+            self._patterns[wmi] = patterns
+        return patterns
+
+    def decode(self, vin: str) -> Optional[Dict[str, Any]]:
+        """Decode a validated VIN, or return None if its WMI/VDS pattern is unknown"""
+        wmi = vin[:3]
+        make = self._makes.get(wmi)
+        if make is None:
+            return None
+
+        year = decode_model_year(vin)
+        vds = vin[3:8]
+        for pattern, _, year_from, year_to, model, body_type, fuel_type in self._patterns_for(wmi):
+            if year is not None and not (year_from <= year <= year_to):
+                continue
+            if all(p == '*' or p == c for p, c in zip(pattern, vds)):
+                vin_data = {'make_name': make, 'model_name': model}
+                if year is not None:
+                    vin_data['year'] = year
+                if body_type:
+                    vin_data['body_type'] = body_type
+                if fuel_type:
+                    vin_data['fuel_type'] = fuel_type
+                return vin_data
+        return None
+
+
+def open_vin_index(path: Optional[str]) -> Optional[VinIndex]:
+    """Open the index at path, or return None when it is not configured or unreadable"""
+    if not path:
+        return None
+    try:
+        return VinIndex(path)
+    except sqlite3.Error as e:
+        logger.error(f"Could not open VIN index {path}: {str(e)}")
+        return None
+
+
+def build_index(snapshot_path: str, index_path: str) -> None:
+    """Build a VIN index SQLite file from a vPIC snapshot CSV"""
+    db = sqlite3.connect(index_path)
+    db.executescript("""
+        DROP TABLE IF EXISTS wmi;
+        DROP TABLE IF EXISTS vds_patterns;
+        CREATE TABLE wmi (wmi TEXT PRIMARY KEY, make TEXT NOT NULL);
+        CREATE TABLE vds_patterns (
+            wmi TEXT NOT NULL, pattern TEXT NOT NULL,
+            year_from INTEGER NOT NULL, year_to INTEGER NOT NULL,
+            model TEXT NOT NULL, body_type TEXT, fuel_type TEXT
+        );
+    """)
+    makes: Dict[str, str] = {}
+    patterns = []
+    with open(snapshot_path, newline='') as f:
+        for row in csv.DictReader(f):
+            wmi = row['wmi'].strip().upper()
+            makes.setdefault(wmi, row['make'].strip())
+            pattern = (row.get('vds_pattern') or '').strip().upper()
+            if pattern:
+                patterns.append((
+                    wmi, pattern.ljust(5, '*')[:5],
+                    int(row.get('year_from') or 1980), int(row.get('year_to') or 2039),
+                    row['model'].strip(), row.get('body_type') or None, row.get('fuel_type') or None
+                ))
+    db.executemany("INSERT INTO wmi VALUES (?, ?)", makes.items())
+    db.executemany("INSERT INTO vds_patterns VALUES (?, ?, ?, ?, ?, ?, ?)", patterns)
+    db.execute("CREATE INDEX vds_patterns_wmi ON vds_patterns (wmi)")
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+    logger.info(f"Built VIN index {index_path}: {len(makes)} WMIs, {len(patterns)} VDS patterns")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python vin_index.py build SNAPSHOT.csv INDEX.sqlite")
+    build_index(sys.argv[2], sys.argv[3])
@@ -0,0 +1,232 @@
+"""
+VIN decoding service backed by the NHTSA vPIC API, with a pooled HTTP client
+and a bounded decode cache (VIN decodes never change)
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import httpx
+from cachetools import LRUCache
+
+from metrics import InstrumentedTransport
+from nhtsa_parser import parse_flat_record
+from vin_index import open_vin_index, validate_vin
+
+logger = logging.getLogger(__name__)
+
+# Base URL of the vPIC API; point at a local stand-in for testing
+NHTSA_API_BASE = os.getenv("NHTSA_API_BASE", "https://vpic.nhtsa.dot.gov/api").rstrip("/")
+NHTSA_TIMEOUT = float(os.getenv("NHTSA_TIMEOUT", "10"))
+NHTSA_HTTP2 = os.getenv("NHTSA_HTTP2", "true").lower() in ("1", "true", "yes")
+NHTSA_MAX_CONNECTIONS = int(os.getenv("NHTSA_MAX_CONNECTIONS", "20"))
+NHTSA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("NHTSA_MAX_KEEPALIVE_CONNECTIONS", "10"))
+NHTSA_KEEPALIVE_EXPIRY = float(os.getenv("NHTSA_KEEPALIVE_EXPIRY", "60"))
+
+# DecodeVINValuesBatch accepts at most 50 VINs per POST
+NHTSA_BATCH_SIZE = 50
+NHTSA_BATCH_CONCURRENCY = int(os.getenv("NHTSA_BATCH_CONCURRENCY", "4"))
+
+VIN_CACHE_SIZE = int(os.getenv("VIN_CACHE_SIZE", "10000"))
+# Optional SQLite file persisting decoded VINs across restarts
+VIN_CACHE_PATH = os.getenv("VIN_CACHE_PATH")
+# Optional local WMI/VDS index (built with vin_index.py) answering VINs without a network call
+VIN_INDEX_PATH = os.getenv("VIN_INDEX_PATH")
+# Reject VINs with a wrong check digit (position 9) before any lookup; off by
+# default because VINs from outside North America need not carry one
+VIN_VALIDATE_CHECK_DIGIT = os.getenv("VIN_VALIDATE_CHECK_DIGIT", "false").lower() in ("1", "true", "yes")
+
+
+class VinDecodeCache:
+    """
+    In-memory LRU of decoded VINs, optionally backed by a SQLite file. SQLite
+    writes are batched and committed in a worker thread, off the event loop.
+    """
+
+    def __init__(self, maxsize: int, path: Optional[str] = None):
+        self._memory = LRUCache(maxsize=max(1, maxsize))
+        self._db = None
+        self._writer = None
+        # VIN -> JSON of decodes not yet written to SQLite
+        self._pending: Dict[str, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS vin_decodes (vin TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._db.commit()
+            # Flushes use their own connection; with WAL, lookups keep reading while a batch commits
+            self._writer = sqlite3.connect(path, check_same_thread=False)
+
+    def get(self, vin: str) -> Optional[Dict[str, Any]]:
+        vin_data = self._memory.get(vin)
+        if vin_data is None and self._db is not None:
+            data = self._pending.get(vin)
+            if data is None:
+                row = self._db.execute("SELECT data FROM vin_decodes WHERE vin = ?", (vin,)).fetchone()
+                data = row[0] if row is not None else None
+            if data is not None:
+                vin_data = json.loads(data)
+                self._memory[vin] = vin_data
+        return vin_data
+
+    def set(self, vin: str, vin_data: Dict[str, Any]) -> None:
+        self._memory[vin] = vin_data
+        if self._db is None:
+            return
+        self._pending[vin] = json.dumps(vin_data)
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+            except RuntimeError:
+                # No event loop (e.g. a script): write right away
+                self._write(self._take_pending())
+
+    async def _flush(self) -> None:
+        # Decodes that arrive while a batch is being committed go into the next batch
+        while self._pending:
+            batch = self._take_pending()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                logger.error(f"Could not persist {len(batch)} decoded VINs: {str(e)}")
+
+    def _take_pending(self) -> Dict[str, str]:
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _write(self, batch: Dict[str, str]) -> None:
+        with self._writer:
+            self._writer.executemany("INSERT OR REPLACE INTO vin_decodes (vin, data) VALUES (?, ?)", batch.items())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        if self._db is not None:
+            if self._pending:
+                self._write(self._take_pending())
+            self._db.close()
+            self._writer.close()
+            self._db = self._writer = None
+
+
+def _http2_available() -> bool:
+    if not NHTSA_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("NHTSA_HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1")
+        return False
+
+
+class VinDecoder:
+    """
+    Decodes VINs from the decode cache, then the local VIN index, and only
+    then over one long-lived keep-alive connection pool to NHTSA
+    """
+
+    def __init__(self, api_base: str = NHTSA_API_BASE, cache_path: Optional[str] = VIN_CACHE_PATH,
+                 index_path: Optional[str] = VIN_INDEX_PATH):
+        transport = httpx.AsyncHTTPTransport(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=NHTSA_MAX_CONNECTIONS,
+                max_keepalive_connections=NHTSA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=NHTSA_KEEPALIVE_EXPIRY
+            )
+        )
+        self.client = httpx.AsyncClient(
+            base_url=api_base,
+            timeout=NHTSA_TIMEOUT,
+            transport=InstrumentedTransport(transport, "vin_lookup")
+        )
+        self.cache = VinDecodeCache(VIN_CACHE_SIZE, cache_path)
+        self.local_index = open_vin_index(index_path)
+
+    async def close(self):
+        await self.client.aclose()
+        await self.cache.close()
+        if self.local_index is not None:
+            self.local_index.close()
+
+    def validate(self, vin: str) -> Optional[str]:
+        """Return an error message for a malformed normalized VIN, or None"""
+        return validate_vin(vin, check_digit=VIN_VALIDATE_CHECK_DIGIT)
+
+    def _decode_locally(self, vin: str) -> Optional[Dict[str, Any]]:
+        vin_data = self.cache.get(vin)
+        if vin_data is None and self.local_index is not None:
+            vin_data = self.local_index.decode(vin)
+        return vin_data
+
+    async def decode(self, vin: str) -> Dict[str, Any]:
+        """Decode a validated VIN; raises httpx errors from the upstream API"""
+        vin_data = self._decode_locally(vin)
+        if vin_data is not None:
+            return vin_data
+
+        # DecodeVinValues returns one flat record instead of ~130 variable entries
+        response = await self.client.get(f"/vehicles/DecodeVinValues/{vin}", params={"format": "json"})
+        response.raise_for_status()
+        results = response.json().get('Results', [])
+        vin_data = parse_flat_record(results[0]) if results else {}
+
+        self._remember(vin, vin_data)
+        return vin_data
+
+    async def decode_batch(self, vins: List[str]) -> Dict[str, Any]:
+        """
+        Decode validated VINs, answering repeats, cached and locally indexed VINs
+        without I/O and sending the rest to DecodeVINValuesBatch in concurrent chunks of 50.
+        Returns {vin: decoded fields}, or {vin: exception} for VINs whose chunk failed.
+        """
+        decoded: Dict[str, Any] = {}
+        misses = []
+        for vin in dict.fromkeys(vins):
+            vin_data = self._decode_locally(vin)
+            if vin_data is None:
+                misses.append(vin)
+            else:
+                decoded[vin] = vin_data
+
+        semaphore = asyncio.Semaphore(NHTSA_BATCH_CONCURRENCY)
+
+        async def decode_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                response = await self.client.post(
+                    "/vehicles/DecodeVINValuesBatch/",
+                    data={"format": "json", "data": ";".join(chunk)}
+                )
+                response.raise_for_status()
+                return response.json().get('Results', [])
+
+        chunks = [misses[i:i + NHTSA_BATCH_SIZE] for i in range(0, len(misses), NHTSA_BATCH_SIZE)]
+        chunk_results = await asyncio.gather(*(decode_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+        for chunk, records in zip(chunks, chunk_results):
+            if isinstance(records, Exception):
+                logger.error(f"Batch VIN decode failed for {len(chunk)} VINs: {str(records)}")
+                decoded.update((vin, records) for vin in chunk)
+                continue
+            for record in records:
+                vin = (record.get('VIN') or '').upper().strip()
+                vin_data = parse_flat_record(record)
+                decoded[vin] = vin_data
+                self._remember(vin, vin_data)
+
+        return decoded
+
+    def _remember(self, vin: str, vin_data: Dict[str, Any]) -> None:
+        # Only cache complete decodes so VINs missing from vPIC are retried later
+        if vin_data.get('make_name') and vin_data.get('model_name'):
+            self.cache.set(vin, vin_data)
+
+
+# Global instance
+vin_decoder = VinDecoder()